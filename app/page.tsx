@@ -5,34 +5,27 @@ import DriftTrendChart from "@/components/drift-trend-chart";
 import LandingHero from "@/components/landing-hero";
 import { DriftBadge, StatusBadge, YesNoBadge } from "@/components/status-badge";
 import { formatRelativeTime, formatScore } from "@/lib/format";
-import { getRuns } from "@/lib/supabase";
-import { toUiRuns } from "@/lib/ui-mappers";
+import { getDailyDriftSummary, getRuns } from "@/lib/supabase";
+import { toUiDailyDrift, toUiRuns } from "@/lib/ui-mappers";
 
 export default async function DashboardPage() {
-  const runs = toUiRuns(await getRuns(50).catch(() => []));
+  // Counters and the trend read the per-day summary, so they stay exact however many runs a day has.
+  const [runs, summary] = await Promise.all([
+    getRuns(1).then(toUiRuns).catch(() => []),
+    getDailyDriftSummary(20).then(toUiDailyDrift).catch(() => [])
+  ]);
   const latestRun = runs[0] ?? null;
 
-  const now = Date.now();
-  const oneDayAgo = now - 24 * 60 * 60 * 1000;
-  const sevenDaysAgo = now - 7 * 24 * 60 * 60 * 1000;
+  const today = new Date().toISOString().slice(0, 10);
+  const sevenDaysAgo = new Date(Date.now() - 6 * 24 * 60 * 60 * 1000).toISOString().slice(0, 10);
+  const todaySummary = summary.find((day) => day.day === today);
+  const redDriftRuns = summary.filter((day) => day.day >= sevenDaysAgo).reduce((total, day) => total + day.redCount, 0);
 
-  const recentRuns = runs.filter((run) => new Date(run.createdAt).getTime() > oneDayAgo);
-  const recentFailedRuns = recentRuns.filter((run) => run.status === "failed");
-  const redDriftRuns = runs.filter(
-    (run) => new Date(run.createdAt).getTime() > sevenDaysAgo && run.driftStatus === "red"
-  );
-
-  const chartData = runs
-    .slice(0, 20)
-    .reverse()
-    .map((run) => ({
-      time: new Date(run.createdAt).toLocaleTimeString("en-US", {
-        hour: "2-digit",
-        minute: "2-digit"
-      }),
-      ratio: run.driftRatio,
-      runId: run.id
-    }));
+  const chartData = summary.map((day) => ({
+    time: day.day.slice(5),
+    ratio: day.driftedShare,
+    label: `${day.runCount} runs, ${day.redCount} red`
+  }));
 
   const topDriftingFeatures = latestRun?.topFeatures.slice(0, 10) ?? [];
 
@@ -78,18 +71,18 @@ export default async function DashboardPage() {
 
         <div className="grid grid-cols-1 gap-4 md:grid-cols-2 lg:grid-cols-4">
           <div className="rounded-lg border border-[#E5E5E5] bg-white p-4">
-            <div className="mb-2 text-xs uppercase text-[#6B7280]">Runs 24h</div>
-            <div className="text-[32px] font-bold text-nordea-navy">{recentRuns.length}</div>
+            <div className="mb-2 text-xs uppercase text-[#6B7280]">Runs Today</div>
+            <div className="text-[32px] font-bold text-nordea-navy">{todaySummary?.runCount ?? 0}</div>
           </div>
           <div className="rounded-lg border border-[#E5E5E5] bg-white p-4">
-            <div className="mb-2 text-xs uppercase text-[#6B7280]">Failed 24h</div>
-            <div className={`text-[32px] font-bold ${recentFailedRuns.length ? "text-[#EF4444]" : "text-nordea-navy"}`}>
-              {recentFailedRuns.length}
+            <div className="mb-2 text-xs uppercase text-[#6B7280]">Failed Today</div>
+            <div className={`text-[32px] font-bold ${todaySummary?.failedCount ? "text-[#EF4444]" : "text-nordea-navy"}`}>
+              {todaySummary?.failedCount ?? 0}
             </div>
           </div>
           <div className="rounded-lg border border-[#E5E5E5] bg-white p-4">
             <div className="mb-2 text-xs uppercase text-[#6B7280]">Red Drift 7d</div>
-            <div className="text-[32px] font-bold text-nordea-navy">{redDriftRuns.length}</div>
+            <div className="text-[32px] font-bold text-nordea-navy">{redDriftRuns}</div>
           </div>
           <div className="rounded-lg border border-[#E5E5E5] bg-white p-4">
             <div className="mb-2 text-xs uppercase text-[#6B7280]">Source Mode</div>
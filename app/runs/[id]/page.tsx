@@ -2,7 +2,7 @@ import { notFound } from "next/navigation";
 import Link from "next/link";
 import { AlertCircle, ChevronRight, Download } from "lucide-react";
 import CollapsibleSection from "@/components/collapsible-section";
-import { getActionTicketsByRunId, getFeatureMetricsByRunId, getRunById } from "@/lib/supabase";
+import { getActionTicketsByRunId, getFeatureMetricsByRunId, getRunById, getSegmentMetricsByRunId } from "@/lib/supabase";
 import { formatAbsoluteTime, formatDuration, formatRelativeTime, formatScore } from "@/lib/format";
 import { DriftBadge, StatusBadge, YesNoBadge } from "@/components/status-badge";
 import { toUiRun } from "@/lib/ui-mappers";
@@ -61,8 +61,9 @@ export default async function RunDetailPage({ params }: RunDetailPageProps) {
   }
 
   const run = toUiRun(runRaw);
-  const [metrics, tickets] = await Promise.all([
+  const [metrics, segmentMetrics, tickets] = await Promise.all([
     getFeatureMetricsByRunId(run.id).catch(() => []),
+    getSegmentMetricsByRunId(run.id).catch(() => []),
     getActionTicketsByRunId(run.id).catch(() => [])
   ]);
 
@@ -264,6 +265,42 @@ export default async function RunDetailPage({ params }: RunDetailPageProps) {
         )}
       </CollapsibleSection>
 
+      {segmentMetrics.length ? (
+        <CollapsibleSection title="Segment Metrics" defaultOpen={false}>
+          <div className="overflow-x-auto">
+            <table className="w-full">
+              <thead className="bg-[#F4F4F4]">
+                <tr>
+                  <th className="px-4 py-3 text-left text-xs font-medium uppercase text-[#6B7280]">Segment</th>
+                  <th className="px-4 py-3 text-left text-xs font-medium uppercase text-[#6B7280]">Feature</th>
+                  <th className="px-4 py-3 text-left text-xs font-medium uppercase text-[#6B7280]">Test</th>
+                  <th className="px-4 py-3 text-left text-xs font-medium uppercase text-[#6B7280]">Score</th>
+                  <th className="px-4 py-3 text-left text-xs font-medium uppercase text-[#6B7280]">Drifted</th>
+                  <th className="px-4 py-3 text-left text-xs font-medium uppercase text-[#6B7280]">Severity</th>
+                </tr>
+              </thead>
+              <tbody>
+                {segmentMetrics.map((metric, index) => (
+                  <tr
+                    key={`${metric.segment}-${metric.feature_name}-${metric.test_name}`}
+                    className={index % 2 === 0 ? "bg-white" : "bg-[#F9F9F9]"}
+                  >
+                    <td className="px-4 py-3 font-mono text-sm text-nordea-navy">{metric.segment}</td>
+                    <td className="px-4 py-3 text-sm text-nordea-navy">{metric.feature_name}</td>
+                    <td className="px-4 py-3 text-sm text-[#6B7280]">{metric.test_name}</td>
+                    <td className="px-4 py-3 text-sm font-medium text-nordea-navy">{formatScore(metric.score)}</td>
+                    <td className="px-4 py-3">
+                      <YesNoBadge value={metric.drifted} />
+                    </td>
+                    <td className="px-4 py-3 text-sm font-medium text-[#6B7280]">{metric.severity?.toUpperCase() ?? "UNKNOWN"}</td>
+                  </tr>
+                ))}
+              </tbody>
+            </table>
+          </div>
+        </CollapsibleSection>
+      ) : null}
+
       <section className="rounded-lg border border-[#E5E5E5] bg-white p-6">
         <h2 className="mb-3 text-lg font-bold text-nordea-navy">Artifacts</h2>
         {run.htmlReportUri ? (
@@ -4,7 +4,6 @@ import {
   Area,
   AreaChart,
   CartesianGrid,
-  ReferenceLine,
   ResponsiveContainer,
   Tooltip,
   XAxis,
@@ -15,7 +14,7 @@ import { formatScore } from "@/lib/format";
 type DriftTrendPoint = {
   time: string;
   ratio: number;
-  runId: string;
+  label: string;
 };
 
 type DriftTrendChartProps = {
@@ -52,19 +51,13 @@ export default function DriftTrendChart({ data }: DriftTrendChartProps) {
               const point = payload[0]?.payload as DriftTrendPoint;
               return (
                 <div className="rounded-lg border border-[#E5E5E5] bg-white p-3 shadow-md">
-                  <p className="mb-1 text-xs text-[#6B7280]">{point.runId}</p>
-                  <p className="text-sm font-bold text-nordea-navy">Drift: {formatScore(point.ratio)}</p>
+                  <p className="mb-1 text-xs text-[#6B7280]">{point.label}</p>
+                  <p className="text-sm font-bold text-nordea-navy">Drifted runs: {formatScore(point.ratio)}</p>
                   <p className="text-xs text-[#6B7280]">{point.time}</p>
                 </div>
               );
             }}
           />
-          <ReferenceLine
-            y={0.25}
-            stroke="#EF4444"
-            strokeDasharray="5 5"
-            label={{ value: "Threshold", position: "right", fill: "#EF4444", fontSize: 12 }}
-          />
           <Area type="monotone" dataKey="ratio" stroke="#00A39B" strokeWidth={2} fill="url(#driftGradient)" />
         </AreaChart>
       </ResponsiveContainer>
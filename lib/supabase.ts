@@ -1,5 +1,5 @@
 import { publicConfig } from "@/lib/config";
-import type { ActionTicket, DomainHeartbeat, FeatureDriftMetric, MonitorRun } from "@/lib/types";
+import type { ActionTicket, DomainHeartbeat, DriftDailySummary, FeatureDriftMetric, MonitorRun } from "@/lib/types";
 
 const DEFAULT_HEADERS = {
   apikey: publicConfig.supabaseAnonKey,
@@ -46,7 +46,21 @@ export async function getRunById(id: string): Promise<MonitorRun | null> {
 export async function getFeatureMetricsByRunId(runId: string): Promise<FeatureDriftMetric[]> {
   const escapedId = encodeURIComponent(runId);
   return supabaseGet<FeatureDriftMetric[]>(
-    `feature_drift_metrics?select=feature_name,test_name,score,p_value,drifted,severity&run_id=eq.${escapedId}&order=score.desc.nullslast`
+    `feature_drift_metrics?select=feature_name,test_name,score,p_value,drifted,severity&run_id=eq.${escapedId}&segment=eq.&order=score.desc.nullslast`
+  );
+}
+
+export async function getSegmentMetricsByRunId(runId: string): Promise<FeatureDriftMetric[]> {
+  const escapedId = encodeURIComponent(runId);
+  return supabaseGet<FeatureDriftMetric[]>(
+    `feature_drift_metrics?select=feature_name,test_name,score,p_value,drifted,severity,segment&run_id=eq.${escapedId}&segment=neq.&order=segment.asc,score.desc.nullslast`
+  );
+}
+
+export async function getDailyDriftSummary(days = 14): Promise<DriftDailySummary[]> {
+  const since = new Date(Date.now() - days * 24 * 60 * 60 * 1000).toISOString().slice(0, 10);
+  return supabaseGet<DriftDailySummary[]>(
+    `drift_daily_summary?select=domain_key,baseline_version,day,run_count,completed_count,failed_count,green_count,yellow_count,red_count,mean_prediction_drift_score,max_prediction_drift_score,last_finished_at&day=gte.${since}&order=day.desc,domain_key.asc`
   );
 }
 
@@ -32,6 +32,7 @@ export type FeatureDriftMetric = {
   p_value: number | null;
   drifted: boolean;
   severity: string | null;
+  segment?: string;
 };
 
 export type ActionTicket = {
@@ -47,6 +48,21 @@ export type ActionTicket = {
   created_at: string;
 };
 
+export type DriftDailySummary = {
+  domain_key: string;
+  baseline_version: string;
+  day: string;
+  run_count: number;
+  completed_count: number;
+  failed_count: number;
+  green_count: number;
+  yellow_count: number;
+  red_count: number;
+  mean_prediction_drift_score: number | null;
+  max_prediction_drift_score: number | null;
+  last_finished_at: string | null;
+};
+
 export type DriftTopFeature = {
   feature: string;
   test: string;
@@ -76,3 +92,12 @@ export type UiRun = {
   driftRatio: number;
   topFeatures: DriftTopFeature[];
 };
+
+export type UiDailyDrift = {
+  day: string;
+  runCount: number;
+  failedCount: number;
+  redCount: number;
+  driftedShare: number;
+  maxPredictionDriftScore: number | null;
+};
@@ -1,6 +1,6 @@
 import { describe, expect, it } from "vitest";
-import { toUiRun, toUiRuns } from "./ui-mappers";
-import type { MonitorRun } from "./types";
+import { toUiDailyDrift, toUiRun, toUiRuns } from "./ui-mappers";
+import type { DriftDailySummary, MonitorRun } from "./types";
 
 function buildRun(overrides: Partial<MonitorRun> = {}): MonitorRun {
   return {
@@ -62,3 +62,49 @@ describe("toUiRuns", () => {
     expect(mapped.map((run) => run.id)).toEqual(["a", "b"]);
   });
 });
+
+function buildSummary(overrides: Partial<DriftDailySummary> = {}): DriftDailySummary {
+  return {
+    domain_key: "nordea",
+    baseline_version: "v1",
+    day: "2026-02-28",
+    run_count: 4,
+    completed_count: 4,
+    failed_count: 0,
+    green_count: 2,
+    yellow_count: 1,
+    red_count: 1,
+    mean_prediction_drift_score: 0.1,
+    max_prediction_drift_score: 0.3,
+    last_finished_at: "2026-02-28T10:01:00.000Z",
+    ...overrides
+  };
+}
+
+describe("toUiDailyDrift", () => {
+  it("sums domains per day, oldest first", () => {
+    const mapped = toUiDailyDrift([
+      buildSummary({ day: "2026-03-01", max_prediction_drift_score: null }),
+      buildSummary(),
+      buildSummary({
+        domain_key: "other",
+        run_count: 2,
+        completed_count: 1,
+        failed_count: 1,
+        green_count: 1,
+        yellow_count: 0,
+        red_count: 0
+      })
+    ]);
+    expect(mapped.map((day) => day.day)).toEqual(["2026-02-28", "2026-03-01"]);
+    expect(mapped[0]).toEqual({
+      day: "2026-02-28",
+      runCount: 6,
+      failedCount: 1,
+      redCount: 1,
+      driftedShare: 2 / 5,
+      maxPredictionDriftScore: 0.3
+    });
+    expect(mapped[1]?.maxPredictionDriftScore).toBeNull();
+  });
+});
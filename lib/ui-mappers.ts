@@ -1,4 +1,4 @@
-import type { DriftTopFeature, MonitorRun, UiRun, UiSourceMode } from "@/lib/types";
+import type { DriftDailySummary, DriftTopFeature, MonitorRun, UiDailyDrift, UiRun, UiSourceMode } from "@/lib/types";
 
 type DriftPayload = {
   drift?: {
@@ -89,3 +89,36 @@ export function toUiRun(run: MonitorRun): UiRun {
 export function toUiRuns(runs: MonitorRun[]): UiRun[] {
   return runs.map(toUiRun);
 }
+
+// Sums every domain and baseline per day, oldest first; driftedShare is the share of completed runs
+// that ended yellow or red.
+export function toUiDailyDrift(rows: DriftDailySummary[]): UiDailyDrift[] {
+  const byDay = new Map<string, UiDailyDrift & { completedCount: number; driftedCount: number }>();
+  for (const row of rows) {
+    const day = byDay.get(row.day) ?? {
+      day: row.day,
+      runCount: 0,
+      failedCount: 0,
+      redCount: 0,
+      driftedShare: 0,
+      maxPredictionDriftScore: null,
+      completedCount: 0,
+      driftedCount: 0
+    };
+    day.runCount += row.run_count;
+    day.failedCount += row.failed_count;
+    day.redCount += row.red_count;
+    day.completedCount += row.completed_count;
+    day.driftedCount += row.yellow_count + row.red_count;
+    if (row.max_prediction_drift_score !== null) {
+      day.maxPredictionDriftScore = Math.max(day.maxPredictionDriftScore ?? 0, row.max_prediction_drift_score);
+    }
+    byDay.set(row.day, day);
+  }
+  return [...byDay.values()]
+    .sort((a, b) => a.day.localeCompare(b.day))
+    .map(({ completedCount, driftedCount, ...day }) => ({
+      ...day,
+      driftedShare: completedCount ? driftedCount / completedCount : 0
+    }));
+}
@@ -0,0 +1,137 @@
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from drift_stats import compute_psi_matrix
+from feature_drift import ReferenceColumns
+from segment_drift import SEGMENT_PSI_THRESHOLD, baseline_segment_sketch, bin_matrix, grouped_histograms, proportions
+
+
+STATUS_NAMES = ("green", "yellow", "red")
+# Same bands as summarize_feature_drift (share of drifted features) and prediction_status_from_psi.
+FEATURE_STATUS_BANDS = (0.2, 0.5)
+PREDICTION_STATUS_BANDS = (0.1, 0.25)
+BOOTSTRAP_REPLICATES = 200
+TIME_STRATA = 20
+# The stopping rule bootstraps a PSI stand-in for the run status, not the configured drift engine's tests,
+# so its status is recorded as a proxy next to the run's drift_status.
+PROXY_RULE = "bootstrap PSI: share of features with PSI >= 0.2, and prediction PSI bands"
+
+
+def default_sampling_mode() -> str:
+    return os.getenv("DRIFTWATCH_SAMPLING", "full").strip().lower()
+
+
+def status_codes(values: np.ndarray, bands: Tuple[float, float]) -> np.ndarray:
+    return (values >= bands[0]).astype(np.int64) + (values >= bands[1]).astype(np.int64)
+
+
+def sampling_strata(n_rows: int, labels: Optional[pd.Series] = None, blocks: int = TIME_STRATA) -> np.ndarray:
+    # Batches are ordered by anchor day and neighbouring rows share most of their window, so contiguous
+    # blocks stratify by time; segment labels, when present, are crossed with them.
+    strata = np.arange(n_rows) * min(blocks, max(n_rows, 1)) // max(n_rows, 1)
+    if labels is not None:
+        codes, _ = pd.factorize(labels.astype(str))
+        strata = codes * blocks + strata
+    return pd.factorize(strata)[0]
+
+
+def stratified_order(strata: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Rows are shuffled within each stratum and keyed by (rank + U) / stratum size; sorting on that
+    # key interleaves the strata, so every prefix of the order is a proportional stratified sample.
+    order = rng.permutation(len(strata))
+    codes = strata[order]
+    sizes = np.bincount(codes)
+    by_stratum = np.argsort(codes, kind="stable")
+    ranks = np.empty(len(codes), dtype=np.int64)
+    ranks[by_stratum] = np.arange(len(codes)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    key = (ranks + rng.random(len(codes))) / sizes[codes]
+    return order[np.argsort(key, kind="stable")]
+
+
+def bootstrap_psi(
+    expected: np.ndarray,
+    counts: np.ndarray,
+    replicates: int,
+    rng: np.random.Generator,
+    valid: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    # Resampling n rows with replacement only changes the histogram, so each replicate is one
+    # multinomial draw over the observed bin shares, for every feature at once.
+    totals = counts.sum(axis=-1)
+    draws = rng.multinomial(totals, proportions(counts), size=(replicates,) + totals.shape)
+    return compute_psi_matrix(expected, proportions(draws), valid)
+
+
+def sequential_sample(
+    reference: ReferenceColumns,
+    current_df: pd.DataFrame,
+    confidence: float,
+    min_rows: int,
+    score: Optional[Callable[[pd.DataFrame], np.ndarray]] = None,
+    prediction_reference: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    labels: Optional[pd.Series] = None,
+    seed: int = 0,
+    growth: float = 2.0,
+    replicates: int = BOOTSTRAP_REPLICATES,
+) -> Tuple[Optional[np.ndarray], Dict[str, Any]]:
+    total = len(current_df)
+    report: Dict[str, Any] = {
+        "mode": "sequential",
+        "confidence": confidence,
+        "rows_total": total,
+        "rows_used": total,
+        "proxy_rule": PROXY_RULE,
+        "proxy_settled": False,
+        "replicates": replicates,
+        "steps": [],
+    }
+    if total <= min_rows:
+        report["reason"] = "batch not larger than the minimum sample"
+        return None, report
+
+    rng = np.random.default_rng(seed)
+    order = stratified_order(sampling_strata(total, labels), rng)
+    sketch = reference.derived(("segment_sketch", ""), lambda: baseline_segment_sketch(reference, ""))
+    columns, width = sketch["columns"], sketch["width"]
+    expected_features = proportions(sketch["overall"])
+    feature_counts = np.zeros((len(columns), width), dtype=np.int64)
+    expected_scores, score_edges = prediction_reference if prediction_reference else (None, None)
+    score_counts = np.zeros(len(expected_scores), dtype=np.int64) if expected_scores is not None else None
+
+    used = 0
+    target = min_rows
+    while True:
+        # Counts grow with each step's new rows only; nothing before `used` is binned or scored again.
+        chunk = current_df.iloc[order[used:target]]
+        feature_counts += grouped_histograms(
+            bin_matrix(chunk, columns, sketch["edges"], width), np.zeros(len(chunk), dtype=np.int64), 1, width
+        )[0]
+        statuses = np.zeros(replicates, dtype=np.int64)
+        if columns:
+            psi = bootstrap_psi(expected_features, feature_counts, replicates, rng, sketch["valid"])
+            statuses = status_codes((psi >= SEGMENT_PSI_THRESHOLD).mean(axis=1), FEATURE_STATUS_BANDS)
+        if score is not None and score_counts is not None:
+            scores = np.clip(score(chunk), score_edges[0], score_edges[-1])
+            score_counts += np.histogram(scores, bins=score_edges)[0]
+            prediction_psi = bootstrap_psi(expected_scores, score_counts, replicates, rng)
+            statuses = np.maximum(statuses, status_codes(prediction_psi, PREDICTION_STATUS_BANDS))
+        used = target
+
+        votes = np.bincount(statuses, minlength=len(STATUS_NAMES))
+        agreement = float(votes.max() / replicates)
+        status = STATUS_NAMES[int(votes.argmax())]
+        report["steps"].append({"rows": used, "proxy_status": status, "agreement": round(agreement, 4)})
+        if agreement >= confidence or used >= total:
+            break
+        target = min(int(np.ceil(used * growth)), total)
+
+    report.update(
+        rows_used=used,
+        proxy_settled=agreement >= confidence,
+        proxy_status=status,
+        proxy_agreement=round(agreement, 4),
+    )
+    return (order[:used] if used < total else None), report
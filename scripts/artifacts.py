@@ -0,0 +1,100 @@
+import gzip
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from common import file_chunks
+
+
+# The codec is recorded as the object path suffix, so readers only need the URI to decode.
+CODEC_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+CODEC_CONTENT_TYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise RuntimeError("The zstd artifact codec needs the 'zstandard' package (pip install zstandard).") from exc
+    return zstandard
+
+
+def artifact_codec(env_name: str = "DRIFTWATCH_ARTIFACT_CODEC", default: str = "gzip") -> Optional[str]:
+    codec = os.getenv(env_name, default).strip().lower()
+    if codec in {"", "none", "off", "false"}:
+        return None
+    if codec not in CODEC_SUFFIXES:
+        raise RuntimeError(f"Unknown artifact codec '{codec}'. Valid: none, {', '.join(sorted(CODEC_SUFFIXES))}")
+    return codec
+
+
+def codec_for_path(path: str) -> Optional[str]:
+    for codec, suffix in CODEC_SUFFIXES.items():
+        if path.endswith(suffix):
+            return codec
+    return None
+
+
+def encoded_path(path: str, codec: Optional[str]) -> str:
+    return f"{path}{CODEC_SUFFIXES[codec]}" if codec else path
+
+
+def compress_chunks(chunks: Iterable[bytes], codec: Optional[str]) -> Iterator[bytes]:
+    if codec is None:
+        yield from chunks
+        return
+    if codec == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            block = compressor.compress(chunk)
+            if block:
+                yield block
+        yield compressor.flush()
+        return
+    stream = _zstandard().ZstdCompressor(level=6).compressobj()
+    for chunk in chunks:
+        block = stream.compress(chunk)
+        if block:
+            yield block
+    yield stream.flush()
+
+
+def decompress_bytes(content: bytes, codec: Optional[str]) -> bytes:
+    if codec is None:
+        return content
+    if codec == "gzip":
+        return gzip.decompress(content)
+    return _zstandard().ZstdDecompressor().decompressobj().decompress(content)
+
+
+def upload_artifact(
+    supabase,
+    bucket: str,
+    path: str,
+    chunks: Iterable[bytes],
+    content_type: str,
+    codec: Optional[str] = None,
+) -> str:
+    return supabase.upload_stream(
+        bucket,
+        encoded_path(path, codec),
+        compress_chunks(chunks, codec),
+        CODEC_CONTENT_TYPES[codec] if codec else content_type,
+    )
+
+
+def upload_artifact_file(
+    supabase,
+    bucket: str,
+    path: str,
+    file_path: str,
+    content_type: str,
+    codec: Optional[str] = None,
+) -> str:
+    if codec is None:
+        return supabase.upload_file(bucket, path, file_path, content_type)
+    return upload_artifact(supabase, bucket, path, file_chunks(file_path), content_type, codec)
+
+
+def download_artifact(supabase, bucket: str, path: str) -> bytes:
+    return decompress_bytes(supabase.download_public_bytes(bucket, path), codec_for_path(path))
@@ -1,10 +1,18 @@
 import argparse
+from typing import List, Optional
 
 from common import log
-from train_model import run_training
+from feature_registry import HORIZONS_HELP, resolve_horizons
+from train_model import (
+    SEGMENT_SCENARIOS_HELP,
+    parse_baseline_matrix,
+    parse_segment_scenarios,
+    run_training,
+    run_training_matrix,
+)
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--domain", default="nordea")
     parser.add_argument("--schema-version", default="v1")
@@ -12,22 +20,47 @@ def main() -> None:
     parser.add_argument("--rows", type=int, default=200)
     parser.add_argument("--seed", type=int, default=42)
     parser.add_argument("--scenario", default="stable_salary")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--matrix",
+        default="",
+        help="Comma-separated version:scenario:seed:rows specs trained in one invocation.",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--horizons", default=None, help=HORIZONS_HELP)
+    parser.add_argument("--segment-scenarios", default="", help=SEGMENT_SCENARIOS_HELP)
+    args = parser.parse_args(argv)
+    horizons = resolve_horizons(args.horizons)
+    segment_scenarios = parse_segment_scenarios(args.segment_scenarios)
 
     _ = args.schema_version  # kept for workflow/API compatibility
 
+    if args.matrix.strip():
+        if segment_scenarios:
+            raise RuntimeError("--segment-scenarios trains a single baseline and cannot be combined with --matrix.")
+        specs = parse_baseline_matrix(args.matrix)
+        results = run_training_matrix(domain=args.domain, specs=specs, max_workers=args.workers, horizons=horizons)
+        for spec, result in zip(specs, results):
+            log(
+                "baseline refreshed "
+                f"domain={args.domain} baseline_version={spec.baseline_version} "
+                f"scenario={spec.scenario} seed={spec.seed} schema_hash={result['schema_hash']}"
+            )
+        return
+
     result = run_training(
         domain=args.domain,
         baseline_version=args.baseline_version,
         rows=args.rows,
         seed=args.seed,
         scenario=args.scenario,
+        horizons=horizons,
+        segment_scenarios=segment_scenarios,
     )
 
     log(
         "baseline refreshed "
         f"domain={args.domain} baseline_version={args.baseline_version} "
-        f"schema_hash={result['schema_hash']}"
+        f"segments={','.join(segment_scenarios) or '-'} schema_hash={result['schema_hash']}"
     )
 
 
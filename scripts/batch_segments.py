@@ -0,0 +1,158 @@
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from artifacts import artifact_codec, download_artifact, encoded_path, upload_artifact
+from common import dataframe_csv_chunks, now_iso
+from feature_schema import read_feature_csv
+
+
+# Consecutive batches share all but their newest anchor days, so rows are stored once in segments and each
+# batch is a manifest listing its rows in order. A segment holds one block of SEGMENT_DAYS calendar-aligned
+# anchor days and its path is derived from the block and its rows, so whether it exists is a check by path,
+# no shared index is read or written, and a batch of N days reassembles from about N / SEGMENT_DAYS objects.
+SEGMENT_FORMAT = "driftwatch.segments/v1"
+MANIFEST_SUFFIX = ".manifest.json"
+SEGMENT_DAYS = 7
+SEGMENT_IO_WORKERS = 8
+
+
+def segmented_batches_enabled() -> bool:
+    return os.getenv("DRIFTWATCH_SEGMENTED_BATCHES", "true").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def is_manifest_path(path: str) -> bool:
+    return path.endswith(MANIFEST_SUFFIX)
+
+
+def segment_root(domain: str) -> str:
+    return f"feature-segments/{domain}"
+
+
+def row_keys(frame: pd.DataFrame, anchor_days: Optional[Sequence[date]] = None) -> List[str]:
+    # Keys hash the column layout and the serialized row, so equal rows from any batch share a key.
+    header, *lines = frame.to_csv(index=False, lineterminator="\n").splitlines()
+    days = [day.isoformat() for day in anchor_days] if anchor_days is not None else [""] * len(lines)
+    if len(days) != len(lines):
+        raise RuntimeError(f"Got {len(days)} anchor days for a batch of {len(lines)} rows")
+    return [
+        hashlib.sha256(f"{header}|{day}|{line}".encode("utf-8")).hexdigest()[:32] for day, line in zip(days, lines)
+    ]
+
+
+def segment_block(day: Optional[date]) -> str:
+    if day is None:
+        return "rows"
+    return date.fromordinal(day.toordinal() - day.toordinal() % SEGMENT_DAYS).isoformat()
+
+
+def segment_path(domain: str, columns: Sequence[str], block: str, keys: Sequence[str]) -> str:
+    layout = hashlib.sha256(",".join(columns).encode("utf-8")).hexdigest()[:12]
+    digest = hashlib.sha256("".join(keys).encode("utf-8")).hexdigest()[:24]
+    return f"{segment_root(domain)}/{layout}/{block}-{digest}.csv"
+
+
+def write_segmented_batch(
+    supabase,
+    bucket: str,
+    domain: str,
+    batch_id: str,
+    frame: pd.DataFrame,
+    anchor_days: Optional[Sequence[date]] = None,
+    aliases: Sequence[str] = (),
+) -> Tuple[str, Dict[str, Any]]:
+    keys = row_keys(frame, anchor_days)
+    days: List[Optional[date]] = list(anchor_days) if anchor_days is not None else [None] * len(keys)
+    row_blocks = [segment_block(day) for day in days]
+    blocks: Dict[str, Dict[str, int]] = {}
+    for position, (key, block) in enumerate(zip(keys, row_blocks)):
+        blocks.setdefault(block, {}).setdefault(key, position)
+
+    codec = artifact_codec()
+    columns = list(frame.columns)
+    paths = {block: segment_path(domain, columns, block, sorted(positions)) for block, positions in blocks.items()}
+    stored_paths = {block: encoded_path(path, codec) for block, path in paths.items()}
+    # Only the blocks at the edges of the batch usually change between consecutive batches.
+    with ThreadPoolExecutor(max_workers=SEGMENT_IO_WORKERS) as pool:
+        exists = pool.map(lambda path: supabase.object_etag(bucket, path) is not None, stored_paths.values())
+        stored = dict(zip(stored_paths, exists))
+
+    new_rows = 0
+    for block, positions in blocks.items():
+        if stored[block]:
+            continue
+        ordered = sorted(positions)
+        segment = frame.iloc[[positions[key] for key in ordered]].reset_index(drop=True)
+        segment.insert(0, "row_key", ordered)
+        segment_days = [days[positions[key]] for key in ordered]
+        segment.insert(0, "anchor_day", [day.isoformat() if day else "" for day in segment_days])
+        upload_artifact(supabase, bucket, paths[block], dataframe_csv_chunks(segment), "text/csv", codec=codec)
+        new_rows += len(ordered)
+
+    manifest = {
+        "format": SEGMENT_FORMAT,
+        "batch_id": batch_id,
+        "created_at": now_iso(),
+        "columns": columns,
+        "rows": [
+            {"anchor_day": day.isoformat() if day else None, "key": key, "segment": stored_paths[block]}
+            for day, key, block in zip(days, keys, row_blocks)
+        ],
+    }
+    manifest_bytes = json.dumps(manifest, separators=(",", ":")).encode("utf-8")
+    manifest_uri = supabase.upload_stream(
+        bucket, f"feature-batches/{domain}/{batch_id}{MANIFEST_SUFFIX}", [manifest_bytes], "application/json"
+    )
+    for alias in aliases:
+        supabase.upload_stream(
+            bucket, f"feature-batches/{domain}/{alias}{MANIFEST_SUFFIX}", [manifest_bytes], "application/json"
+        )
+    stats = {"rows": len(keys), "new_rows": new_rows, "reused_rows": len(keys) - new_rows, "segments": len(blocks)}
+    return manifest_uri, stats
+
+
+def read_segmented_batch(supabase, bucket: str, manifest_bytes: bytes) -> pd.DataFrame:
+    manifest = json.loads(manifest_bytes)
+    if manifest.get("format") != SEGMENT_FORMAT:
+        raise RuntimeError(f"Unsupported batch manifest format: {manifest.get('format')}")
+
+    def read_segment(path: str) -> pd.DataFrame:
+        return read_feature_csv(io.BytesIO(download_artifact(supabase, bucket, path)), dtype={"anchor_day": str})
+
+    segment_paths = list(dict.fromkeys(row["segment"] for row in manifest["rows"]))
+    with ThreadPoolExecutor(max_workers=SEGMENT_IO_WORKERS) as pool:
+        segments = list(pool.map(read_segment, segment_paths))
+    rows = pd.concat(segments, ignore_index=True).drop_duplicates("row_key").set_index("row_key")
+    frame = rows.loc[[row["key"] for row in manifest["rows"]], manifest["columns"]]
+    return frame.reset_index(drop=True)
+
+
+def upload_feature_batch(
+    supabase,
+    bucket: str,
+    domain: str,
+    batch_id: str,
+    frame: pd.DataFrame,
+    anchor_days: Optional[Sequence[date]] = None,
+    aliases: Sequence[str] = (),
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    if segmented_batches_enabled():
+        return write_segmented_batch(supabase, bucket, domain, batch_id, frame, anchor_days, aliases)
+    storage_uri = upload_artifact(
+        supabase,
+        bucket,
+        f"feature-batches/{domain}/{batch_id}.csv",
+        dataframe_csv_chunks(frame),
+        "text/csv",
+        codec=artifact_codec(),
+    )
+    # Aliases such as current.csv serve older readers, so they stay uncompressed.
+    for alias in aliases:
+        supabase.upload_stream(bucket, f"feature-batches/{domain}/{alias}.csv", dataframe_csv_chunks(frame), "text/csv")
+    return storage_uri, None
@@ -1,13 +1,75 @@
+import base64
+import itertools
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from urllib.parse import quote
-from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote, urljoin
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
 
 import requests
 
 
+# Supabase's resumable (TUS) endpoint expects 6 MB chunks; everything but the last must be exactly this size.
+RESUMABLE_CHUNK_BYTES = 6 * 1024 * 1024
+RESUMABLE_CHUNK_RETRIES = 5
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+def postgrest_literal(value: Any) -> str:
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def with_keyset_filter(
+    filters: Dict[str, str], keys: Sequence[str], after: Dict[str, Any], operator: str
+) -> Dict[str, str]:
+    # (k1 > v1) or (k1 = v1 and k2 > v2) ... expressed as PostgREST logic trees.
+    branches = []
+    for position, key in enumerate(keys):
+        equal = [f"{previous}.eq.{postgrest_literal(after[previous])}" for previous in keys[:position]]
+        condition = f"{key}.{operator}.{postgrest_literal(after[key])}"
+        branches.append(f"and({','.join([*equal, condition])})" if equal else condition)
+    keyset = f"or({','.join(branches)})"
+
+    combined = dict(filters)
+    existing = combined.get("and")
+    combined["and"] = f"({existing.strip()[1:-1]},{keyset})" if existing else f"({keyset})"
+    return combined
+
+
+def resumable_threshold_bytes() -> int:
+    return int(os.getenv("DRIFTWATCH_RESUMABLE_THRESHOLD_BYTES", str(RESUMABLE_CHUNK_BYTES)))
+
+
+def rechunk(chunks: Iterable[bytes], size: int) -> Iterator[bytes]:
+    pending = bytearray()
+    for chunk in chunks:
+        pending.extend(chunk)
+        while len(pending) >= size:
+            yield bytes(pending[:size])
+            del pending[:size]
+    if pending:
+        yield bytes(pending)
+
+
+def file_chunks(file_path: str, size: Optional[int] = None) -> Iterator[bytes]:
+    with open(file_path, "rb") as handle:
+        while True:
+            chunk = handle.read(size or RESUMABLE_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+def dataframe_csv_chunks(frame: Any, rows_per_chunk: int = 50_000) -> Iterator[bytes]:
+    for start in range(0, max(len(frame), 1), rows_per_chunk):
+        part = frame.iloc[start : start + rows_per_chunk]
+        yield part.to_csv(index=False, header=start == 0).encode("utf-8")
+
+
 @dataclass
 class SupabaseClient:
     url: str
@@ -52,6 +114,54 @@ class SupabaseClient:
         response.raise_for_status()
         return response.json()
 
+    def select_pages(
+        self,
+        table: str,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        page_size: int = 1000,
+        keys: Sequence[str] = ("created_at", "id"),
+        descending: bool = False,
+        prefetch: bool = True,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        # Keyset pagination: each page starts after the last row's keys, so deep pages cost
+        # the same as the first and rows updated mid-scan are never skipped by a shifting OFFSET.
+        columns = select if select == "*" else ",".join([select, *(key for key in keys if key not in select.split(","))])
+        direction = "desc" if descending else "asc"
+        order = ",".join(f"{key}.{direction}" for key in keys)
+
+        def fetch(after: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            page_filters = dict(filters or {})
+            if after is not None:
+                page_filters = with_keyset_filter(page_filters, keys, after, "lt" if descending else "gt")
+            return self.select(table, select=columns, filters=page_filters, order=order, limit=page_size)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = pool.submit(fetch, None)
+            while True:
+                page = pending.result()
+                more = len(page) == page_size
+                # The next page only depends on this page's last row, so it can load while the caller works.
+                prefetched = pool.submit(fetch, page[-1]) if more and prefetch else None
+                if page:
+                    yield page
+                if not more:
+                    return
+                pending = prefetched or pool.submit(fetch, page[-1])
+
+    def select_iter(
+        self,
+        table: str,
+        select: str = "*",
+        filters: Optional[Dict[str, str]] = None,
+        page_size: int = 1000,
+        keys: Sequence[str] = ("created_at", "id"),
+        descending: bool = False,
+        prefetch: bool = True,
+    ) -> Iterator[Dict[str, Any]]:
+        for page in self.select_pages(table, select, filters, page_size, keys, descending, prefetch):
+            yield from page
+
     def insert(self, table: str, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
         payload = list(rows)
         response = requests.post(
@@ -79,37 +189,209 @@ class SupabaseClient:
         response.raise_for_status()
         return response.json()
 
-    def upload_bytes(self, bucket: str, path: str, content: bytes, content_type: str) -> str:
-        url = f"{self.storage_base}/object/{bucket}/{path}"
-        headers = {
+    def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        response = requests.post(
+            f"{self.rest_base}/rpc/{function}", headers=self.headers, data=json.dumps(params or {}), timeout=30
+        )
+        response.raise_for_status()
+        # Functions returning void answer with an empty body.
+        return response.json() if response.content else None
+
+    @property
+    def storage_headers(self) -> Dict[str, str]:
+        return {
             "apikey": self.service_key,
             "Authorization": f"Bearer {self.service_key}",
-            "Content-Type": content_type,
-            "x-upsert": "true",
         }
+
+    def upload_bytes(
+        self,
+        bucket: str,
+        path: str,
+        content: bytes,
+        content_type: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        if len(content) > resumable_threshold_bytes():
+            chunks = rechunk([content], RESUMABLE_CHUNK_BYTES)
+            return self.upload_resumable(bucket, path, chunks, content_type, len(content), progress)
+        url = f"{self.storage_base}/object/{bucket}/{path}"
+        headers = {**self.storage_headers, "Content-Type": content_type, "x-upsert": "true"}
         response = requests.post(url, headers=headers, data=content, timeout=60)
         response.raise_for_status()
+        if progress:
+            progress(len(content), len(content))
         return f"{self.storage_base}/object/public/{bucket}/{path}"
 
+    def upload_file(
+        self,
+        bucket: str,
+        path: str,
+        file_path: str,
+        content_type: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        size = os.path.getsize(file_path)
+        if size > resumable_threshold_bytes():
+            return self.upload_resumable(bucket, path, file_chunks(file_path), content_type, size, progress)
+        with open(file_path, "rb") as handle:
+            return self.upload_bytes(bucket, path, handle.read(), content_type, progress)
+
+    def upload_stream(
+        self,
+        bucket: str,
+        path: str,
+        chunks: Iterable[bytes],
+        content_type: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        # Buffer up to the threshold: small artifacts still go out as one POST, larger ones
+        # switch to the resumable protocol without knowing their final size up front.
+        threshold = resumable_threshold_bytes()
+        iterator = iter(chunks)
+        head = bytearray()
+        for chunk in iterator:
+            head.extend(chunk)
+            if len(head) > threshold:
+                body = rechunk(itertools.chain([bytes(head)], iterator), RESUMABLE_CHUNK_BYTES)
+                return self.upload_resumable(bucket, path, body, content_type, None, progress)
+        return self.upload_bytes(bucket, path, bytes(head), content_type, progress)
+
+    def upload_resumable(
+        self,
+        bucket: str,
+        path: str,
+        chunks: Iterable[bytes],
+        content_type: str,
+        size: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> str:
+        upload_url = self.create_resumable_upload(bucket, path, content_type, size)
+        offset = 0
+        iterator = iter(chunks)
+        chunk = next(iterator, b"")
+        while True:
+            following = next(iterator, None)
+            final = following is None
+            final_length = offset + len(chunk) if final and size is None else None
+            offset = self.send_resumable_chunk(upload_url, chunk, offset, final_length)
+            if progress:
+                progress(offset, size)
+            else:
+                log(f"resumable upload {bucket}/{path} sent={offset} total={size if size is not None else 'unknown'}")
+            if final:
+                break
+            chunk = following
+        if size is not None and offset != size:
+            raise RuntimeError(f"Resumable upload of {path} ended at offset {offset}, expected {size} bytes")
+        return f"{self.storage_base}/object/public/{bucket}/{path}"
+
+    def create_resumable_upload(self, bucket: str, path: str, content_type: str, size: Optional[int]) -> str:
+        metadata = {"bucketName": bucket, "objectName": path, "contentType": content_type, "cacheControl": "3600"}
+        headers = {
+            **self.storage_headers,
+            "Tus-Resumable": "1.0.0",
+            "x-upsert": "true",
+            "Upload-Metadata": ",".join(
+                f"{key} {base64.b64encode(value.encode('utf-8')).decode('ascii')}" for key, value in metadata.items()
+            ),
+        }
+        if size is None:
+            headers["Upload-Defer-Length"] = "1"
+        else:
+            headers["Upload-Length"] = str(size)
+        endpoint = f"{self.storage_base}/upload/resumable"
+        response = requests.post(endpoint, headers=headers, timeout=30)
+        response.raise_for_status()
+        location = response.headers.get("Location")
+        if not location:
+            raise RuntimeError(f"Resumable upload for {path} returned no Location header")
+        return urljoin(endpoint, location)
+
+    def resumable_offset(self, upload_url: str) -> int:
+        headers = {**self.storage_headers, "Tus-Resumable": "1.0.0"}
+        response = requests.head(upload_url, headers=headers, timeout=30)
+        response.raise_for_status()
+        return int(response.headers["Upload-Offset"])
+
+    def send_resumable_chunk(self, upload_url: str, chunk: bytes, offset: int, final_length: Optional[int]) -> int:
+        end = offset + len(chunk)
+        server_offset = offset
+        last_error: Optional[Exception] = None
+        for attempt in range(RESUMABLE_CHUNK_RETRIES):
+            if attempt:
+                # The server keeps whatever part of the chunk it received; resume from its offset.
+                time.sleep(min(2 ** (attempt - 1), 8))
+                try:
+                    server_offset = self.resumable_offset(upload_url)
+                except (requests.ConnectionError, requests.Timeout) as exc:
+                    last_error = exc
+                    continue
+                if not offset <= server_offset <= end:
+                    raise RuntimeError(f"Resumable upload offset {server_offset} is outside chunk {offset}-{end}")
+                if server_offset == end and final_length is None:
+                    return end
+            headers = {
+                **self.storage_headers,
+                "Tus-Resumable": "1.0.0",
+                "Content-Type": "application/offset+octet-stream",
+                "Upload-Offset": str(server_offset),
+            }
+            if final_length is not None:
+                headers["Upload-Length"] = str(final_length)
+            try:
+                response = requests.patch(upload_url, headers=headers, data=chunk[server_offset - offset :], timeout=120)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                last_error = exc
+                continue
+            if response.status_code >= 500 or response.status_code == 409:
+                last_error = RuntimeError(f"status={response.status_code} body={response.text[:200]}")
+                continue
+            response.raise_for_status()
+            return int(response.headers.get("Upload-Offset", end))
+        raise RuntimeError(
+            f"Resumable upload chunk at offset {offset} failed after {RESUMABLE_CHUNK_RETRIES} attempts: {last_error}"
+        )
+
     def public_object_url(self, bucket: str, path: str) -> str:
         safe_path = quote(path.lstrip("/"), safe="/")
         return f"{self.storage_base}/object/public/{bucket}/{safe_path}"
 
     def download_public_bytes(self, bucket: str, path: str) -> bytes:
         url = self.public_object_url(bucket, path)
-        headers = {
-            "apikey": self.service_key,
-            "Authorization": f"Bearer {self.service_key}",
-        }
-        response = requests.get(url, headers=headers, timeout=60)
+        response = requests.get(url, headers=self.storage_headers, timeout=60)
         response.raise_for_status()
         return response.content
 
+    def object_etag(self, bucket: str, path: str) -> Optional[str]:
+        # A cheap validator for cached downloads; None means "do not trust a cached copy".
+        try:
+            response = requests.head(self.public_object_url(bucket, path), headers=self.storage_headers, timeout=30)
+        except requests.RequestException:
+            return None
+        if response.status_code >= 400:
+            return None
+        return response.headers.get("ETag") or response.headers.get("Last-Modified")
+
 
 def now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
+def refresh_daily_summary(
+    supabase: SupabaseClient, domain_key: str, baseline_version: str, day: Optional[str] = None
+) -> None:
+    # Best effort: the run's own status is already stored, and the next finalization on the same day recomputes the row.
+    day = day or time.strftime("%Y-%m-%d", time.gmtime())
+    try:
+        supabase.rpc(
+            "refresh_drift_daily_summary",
+            {"p_domain_key": domain_key, "p_baseline_version": baseline_version, "p_day": day},
+        )
+    except requests.RequestException as exc:
+        log(f"daily summary refresh failed for {domain_key}/{baseline_version} on {day}: {exc}")
+
+
 def require_env(name: str) -> str:
     value = os.getenv(name)
     if not value:
@@ -0,0 +1,44 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def compute_psi(expected: np.ndarray, current: np.ndarray, epsilon: float = 1e-6) -> float:
+    expected_safe = np.clip(expected, epsilon, None)
+    current_safe = np.clip(current, epsilon, None)
+    expected_safe = expected_safe / expected_safe.sum()
+    current_safe = current_safe / current_safe.sum()
+    values = (current_safe - expected_safe) * np.log(current_safe / expected_safe)
+    return float(np.sum(values))
+
+
+def compute_psi_matrix(
+    expected: np.ndarray, current: np.ndarray, valid: Optional[np.ndarray] = None, epsilon: float = 1e-6
+) -> np.ndarray:
+    # compute_psi over the last axis for every leading index at once; bins outside `valid` (padding
+    # for columns with fewer edges) take no part in the normalisation or the sum.
+    mask = np.ones(expected.shape[-1], dtype=bool) if valid is None else valid
+    expected_safe = np.where(mask, np.clip(expected, epsilon, None), 0.0)
+    current_safe = np.where(mask, np.clip(current, epsilon, None), 0.0)
+    expected_safe = expected_safe / expected_safe.sum(axis=-1, keepdims=True)
+    current_safe = current_safe / current_safe.sum(axis=-1, keepdims=True)
+    ratio = np.divide(current_safe, expected_safe, out=np.ones_like(current_safe), where=mask)
+    return np.sum((current_safe - expected_safe) * np.log(ratio), axis=-1)
+
+
+# Block resampling for serially dependent rows (consecutive anchor days with overlapping windows): whole
+# blocks of rows are resampled instead of single rows, so the dependence inside a block is kept.
+def circular_blocks(rows: int, size: int, phase: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Row index and block id of consecutive `size`-row blocks starting at row `phase` and wrapping past
+    # the end, so every block has the same size. Callers re-cut at a random phase for each batch of
+    # resamples, so no row is always at a block edge.
+    positions = np.arange(-(-rows // size) * size)
+    return (phase + positions) % rows, positions // size
+
+
+def baseline_block_masks(reference_blocks: int, total_blocks: int, count: int, rng: np.random.Generator) -> np.ndarray:
+    # `count` relabellings of pooled blocks, baseline blocks first: (count, total_blocks), True for the
+    # blocks drawn into the baseline. argsort of uniform keys is a uniform permutation, so the blocks it
+    # ranks below the baseline's block count are a uniformly random baseline-sized set; as a 0/1 or
+    # signed weight matrix, every relabelling becomes one row of a single matrix product.
+    return np.argsort(rng.random((count, total_blocks)), axis=1) < reference_blocks
@@ -0,0 +1,168 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.spatial import distance
+
+
+# Mirrors Evidently's default stattest selection so native and Evidently runs
+# produce comparable drift_by_columns payloads.
+SMALL_SAMPLE_ROWS = 1000
+CATEGORICAL_MAX_UNIQUE = 5
+P_VALUE_THRESHOLD = 0.05
+DISTANCE_THRESHOLD = 0.1
+
+
+def select_stattest(reference: np.ndarray, current: np.ndarray) -> str:
+    # Evidently counts distinct values over both samples together, so a count feature whose batch has new
+    # values can move from a categorical test to a continuous one.
+    n_unique = len(np.unique(np.concatenate([reference, current])))
+    if len(reference) <= SMALL_SAMPLE_ROWS:
+        if n_unique <= 2:
+            return "z"
+        if n_unique <= CATEGORICAL_MAX_UNIQUE:
+            return "chisquare"
+        return "ks"
+    if n_unique <= CATEGORICAL_MAX_UNIQUE:
+        return "jensenshannon"
+    return "wasserstein"
+
+
+def category_frequencies(reference: np.ndarray, current: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    categories = np.union1d(reference, current)
+    ref_counts = np.array([np.count_nonzero(reference == value) for value in categories], dtype=float)
+    cur_counts = np.array([np.count_nonzero(current == value) for value in categories], dtype=float)
+    return ref_counts, cur_counts
+
+
+def z_test_p_value(reference: np.ndarray, current: np.ndarray) -> float:
+    values, counts = np.unique(reference, return_counts=True)
+    positive = values[np.argmax(counts)]
+    ref_hits = float(np.count_nonzero(reference == positive))
+    cur_hits = float(np.count_nonzero(current == positive))
+    n_ref, n_cur = len(reference), len(current)
+    pooled = (ref_hits + cur_hits) / (n_ref + n_cur)
+    spread = np.sqrt(pooled * (1 - pooled) * (1 / n_ref + 1 / n_cur))
+    if spread == 0:
+        return 1.0
+    z = (cur_hits / n_cur - ref_hits / n_ref) / spread
+    return float(2 * stats.norm.sf(abs(z)))
+
+
+def run_stattest(test: str, reference: np.ndarray, current: np.ndarray) -> Tuple[str, float, float, bool]:
+    if test == "ks":
+        score = float(stats.ks_2samp(reference, current).pvalue)
+        return "K-S p_value", score, P_VALUE_THRESHOLD, score < P_VALUE_THRESHOLD
+    if test == "z":
+        score = z_test_p_value(reference, current)
+        return "Z-test p_value", score, P_VALUE_THRESHOLD, score < P_VALUE_THRESHOLD
+    if test == "chisquare":
+        ref_counts, cur_counts = category_frequencies(reference, current)
+        expected = np.clip(ref_counts / ref_counts.sum(), 1e-6, None)
+        expected = expected / expected.sum() * cur_counts.sum()
+        score = float(stats.chisquare(cur_counts, expected).pvalue)
+        return "chi-square p_value", score, P_VALUE_THRESHOLD, score < P_VALUE_THRESHOLD
+    if test == "jensenshannon":
+        ref_counts, cur_counts = category_frequencies(reference, current)
+        score = float(distance.jensenshannon(ref_counts / ref_counts.sum(), cur_counts / cur_counts.sum()))
+        return "Jensen-Shannon distance", score, DISTANCE_THRESHOLD, score >= DISTANCE_THRESHOLD
+    norm = max(float(np.std(reference)), 0.001)
+    score = float(stats.wasserstein_distance(reference, current) / norm)
+    return "Wasserstein distance (normed)", score, DISTANCE_THRESHOLD, score >= DISTANCE_THRESHOLD
+
+
+def column_drift(name: str, reference: np.ndarray, current: np.ndarray) -> Dict[str, Any]:
+    test = select_stattest(reference, current)
+    test_name, score, threshold, detected = run_stattest(test, reference, current)
+    details: Dict[str, Any] = {
+        "column_name": name,
+        "column_type": "num",
+        "stattest_name": test_name,
+        "stattest_threshold": threshold,
+        "drift_score": score,
+        "drift_detected": bool(detected),
+    }
+    if "p_value" in test_name:
+        details["p_value"] = score
+    return details
+
+
+def _drift_for_chunk(chunk: List[Tuple[str, np.ndarray, np.ndarray]]) -> List[Dict[str, Any]]:
+    return [column_drift(name, reference, current) for name, reference, current in chunk]
+
+
+def numeric_values(series: pd.Series) -> np.ndarray:
+    # Compact columns (float32, small ints) stay float32 rather than being widened for the tests.
+    values = pd.to_numeric(series, errors="coerce").dropna()
+    compact = values.dtype == np.float32 or (values.dtype.kind in "ui" and values.dtype.itemsize <= 2)
+    return values.to_numpy(dtype=np.float32 if compact else float)
+
+
+# Reference-side arrays depend only on the baseline, so a resident worker keeps one of these next to
+# each cached baseline frame instead of re-coercing every column on every run. `labels` holds the
+# baseline's segment columns, if it has any.
+class ReferenceColumns:
+    def __init__(self, frame: pd.DataFrame, labels: Optional[pd.DataFrame] = None) -> None:
+        self.frame = frame
+        self.labels = labels
+        self._values: Dict[str, np.ndarray] = {}
+        self._derived: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def values(self, name: str) -> np.ndarray:
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = numeric_values(self.frame[name])
+            return self._values[name]
+
+    def derived(self, key: Any, build: Callable[[], Any]) -> Any:
+        # Other baseline-only summaries (segment sketches, ...) are memoised the same way.
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = build()
+            return self._derived[key]
+
+
+def default_drift_workers() -> int:
+    return int(os.getenv("DRIFTWATCH_DRIFT_WORKERS", "0")) or min(os.cpu_count() or 1, 8)
+
+
+def compute_feature_drift(
+    reference_df: pd.DataFrame,
+    current_df: pd.DataFrame,
+    columns: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    executor: str = "thread",
+    reference: Optional[ReferenceColumns] = None,
+) -> Dict[str, Any]:
+    names = list(columns) if columns is not None else list(reference_df.columns)
+    reference_values = reference.values if reference is not None else lambda name: numeric_values(reference_df[name])
+    tasks = [(name, reference_values(name), numeric_values(current_df[name])) for name in names]
+    tasks = [task for task in tasks if len(task[1]) and len(task[2])]
+
+    # Contiguous chunks keep results in column order once they are concatenated.
+    worker_count = max(1, min(workers or default_drift_workers(), len(tasks) or 1))
+    chunks = [chunk.tolist() for chunk in np.array_split(np.arange(len(tasks)), worker_count) if len(chunk)]
+    chunked_tasks = [[tasks[index] for index in chunk] for chunk in chunks]
+
+    if worker_count == 1:
+        results = [_drift_for_chunk(chunk) for chunk in chunked_tasks]
+    else:
+        pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        with pool_class(max_workers=worker_count) as pool:
+            results = list(pool.map(_drift_for_chunk, chunked_tasks))
+
+    drift_by_columns = {details["column_name"]: details for chunk in results for details in chunk}
+    drifted = sum(1 for details in drift_by_columns.values() if details["drift_detected"])
+    total = len(drift_by_columns)
+    return {
+        "number_of_columns": total,
+        "number_of_drifted_columns": drifted,
+        "share_of_drifted_columns": drifted / total if total else 0.0,
+        "dataset_drift": bool(total) and drifted / total >= 0.5,
+        "drift_by_columns": drift_by_columns,
+    }
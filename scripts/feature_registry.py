@@ -0,0 +1,298 @@
+import bisect
+import math
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+SUBSCRIPTION_HINTS = {
+    "spotify",
+    "netflix",
+    "youtube",
+    "apple",
+    "icloud",
+    "amazon prime",
+    "adobe",
+    "gym",
+    "hbo",
+    "disney",
+    "viaplay",
+    "tv4",
+}
+
+RENT_HINTS = {"rent", "hyra", "landlord", "heimstaden", "balder", "hus"}
+
+WINDOW_DAYS = 30
+RECENT_DAYS = 7
+
+# Window statistics that can also be emitted per horizon as <name>_<days>d columns.
+HORIZON_FEATURES = ("daily_spend", "daily_income", "cashflow_ratio", "merchant_diversity")
+HORIZONS_HELP = "Comma-separated extra feature horizons in days, e.g. 7,30,90 (default: DRIFTWATCH_FEATURE_HORIZONS)."
+HORIZON_COLUMN_PATTERN = re.compile(rf"^({'|'.join(HORIZON_FEATURES)})_(\d+)d$")
+
+# Values every plan starts from; everything else is a registered aggregate.
+PLAN_INPUTS = ("timeline", "anchor_day")
+
+
+def safe_entropy(counts: Iterable[float]) -> float:
+    values = [v for v in counts if v > 0]
+    total = sum(values)
+    if total <= 0:
+        return 0.0
+    entropy = 0.0
+    for value in values:
+        p = value / total
+        entropy -= p * math.log(p)
+    return entropy / math.log(7) if len(values) > 1 else 0.0
+
+
+# Transactions sorted by day once per batch, so each anchor's window is two bisections rather
+# than a scan over the full history.
+class Timeline:
+    def __init__(self, transactions: Sequence[Dict[str, Any]]) -> None:
+        self.transactions = sorted(transactions, key=lambda tx: tx["date"])
+        self.dates = [tx["date"] for tx in self.transactions]
+
+    def window(self, anchor_day: date, days: int) -> List[Dict[str, Any]]:
+        start = bisect.bisect_left(self.dates, anchor_day - timedelta(days=days - 1))
+        end = bisect.bisect_right(self.dates, anchor_day)
+        return self.transactions[start:end]
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    name: str
+    requires: Tuple[str, ...]
+    compute: Callable[[Dict[str, Any]], Any]
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    name: str
+    requires: Tuple[str, ...]
+    compute: Callable[[Dict[str, Any]], float]
+
+
+def _merchant_spend(values: Dict[str, Any]) -> Dict[str, float]:
+    spend: Dict[str, float] = defaultdict(float)
+    for tx in values["spend_tx"]:
+        spend[tx["merchant"].lower()] += abs(tx["amount"])
+    return spend
+
+
+def _weekday_spend(values: Dict[str, Any]) -> List[float]:
+    spend = [0.0] * 7
+    for tx in values["spend_tx"]:
+        spend[tx["date"].weekday()] += abs(tx["amount"])
+    return spend
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator > 0 else 0.0
+
+
+AGGREGATES: Dict[str, Aggregate] = {
+    aggregate.name: aggregate
+    for aggregate in (
+        Aggregate("window_tx", ("timeline", "anchor_day"), lambda v: v["timeline"].window(v["anchor_day"], WINDOW_DAYS)),
+        Aggregate("recent_tx", ("timeline", "anchor_day"), lambda v: v["timeline"].window(v["anchor_day"], RECENT_DAYS)),
+        Aggregate("spend_tx", ("window_tx",), lambda v: [tx for tx in v["window_tx"] if tx["amount"] < 0]),
+        Aggregate("income_tx", ("window_tx",), lambda v: [tx for tx in v["window_tx"] if tx["amount"] > 0]),
+        Aggregate("total_spend", ("spend_tx",), lambda v: sum(abs(tx["amount"]) for tx in v["spend_tx"])),
+        Aggregate("total_income", ("income_tx",), lambda v: sum(tx["amount"] for tx in v["income_tx"])),
+        Aggregate("abs_amount_total", ("window_tx",), lambda v: sum(abs(tx["amount"]) for tx in v["window_tx"])),
+        Aggregate("merchant_spend", ("spend_tx",), _merchant_spend),
+        Aggregate("weekday_spend", ("spend_tx",), _weekday_spend),
+        Aggregate(
+            "rent_spend",
+            ("spend_tx",),
+            lambda v: sum(
+                abs(tx["amount"]) for tx in v["spend_tx"] if any(hint in tx["merchant"].lower() for hint in RENT_HINTS)
+            ),
+        ),
+        Aggregate(
+            "subscription_merchants",
+            ("spend_tx",),
+            lambda v: {
+                tx["merchant"].lower()
+                for tx in v["spend_tx"]
+                if any(hint in tx["merchant"].lower() for hint in SUBSCRIPTION_HINTS)
+            },
+        ),
+        Aggregate("unique_merchants", ("window_tx",), lambda v: len({tx["merchant"].lower() for tx in v["window_tx"]})),
+    )
+}
+
+# Registry order is the batch column order.
+FEATURES: Dict[str, FeatureSpec] = {
+    spec.name: spec
+    for spec in (
+        FeatureSpec("daily_spend_30d", ("total_spend",), lambda v: v["total_spend"] / 30.0),
+        FeatureSpec("daily_income_30d", ("total_income",), lambda v: v["total_income"] / 30.0),
+        FeatureSpec("rent_ratio", ("rent_spend", "total_spend"), lambda v: _ratio(v["rent_spend"], v["total_spend"])),
+        FeatureSpec("subscription_count", ("subscription_merchants",), lambda v: len(v["subscription_merchants"])),
+        FeatureSpec(
+            "top_merchant_share",
+            ("merchant_spend", "total_spend"),
+            lambda v: _ratio(max(v["merchant_spend"].values(), default=0.0), v["total_spend"]),
+        ),
+        FeatureSpec("txn_count_7d", ("recent_tx",), lambda v: len(v["recent_tx"])),
+        FeatureSpec(
+            "avg_txn_amount_30d",
+            ("abs_amount_total", "window_tx"),
+            lambda v: _ratio(v["abs_amount_total"], len(v["window_tx"])),
+        ),
+        FeatureSpec("weekday_spend_entropy", ("weekday_spend",), lambda v: safe_entropy(v["weekday_spend"])),
+        FeatureSpec(
+            "cashflow_ratio_30d",
+            ("total_income", "total_spend"),
+            lambda v: _ratio(v["total_income"], v["total_spend"]),
+        ),
+        FeatureSpec(
+            "merchant_diversity_30d",
+            ("unique_merchants", "window_tx"),
+            lambda v: _ratio(v["unique_merchants"], len(v["window_tx"])),
+        ),
+    )
+}
+
+
+@dataclass(frozen=True)
+class FeaturePlan:
+    features: Tuple[FeatureSpec, ...]
+    aggregates: Tuple[Aggregate, ...]
+
+    @property
+    def columns(self) -> List[str]:
+        return [spec.name for spec in self.features]
+
+    def evaluate(self, timeline: Timeline, anchor_day: date) -> Dict[str, float]:
+        values: Dict[str, Any] = {"timeline": timeline, "anchor_day": anchor_day}
+        for aggregate in self.aggregates:
+            values[aggregate.name] = aggregate.compute(values)
+        return {spec.name: float(spec.compute(values)) for spec in self.features}
+
+
+def plan_features(names: Optional[Sequence[str]] = None) -> FeaturePlan:
+    requested = list(FEATURES) if names is None else list(dict.fromkeys(names))
+    unknown = [name for name in requested if name not in FEATURES]
+    if unknown:
+        raise RuntimeError(f"Unknown features {unknown}. Valid: {list(FEATURES)}")
+
+    # Depth-first over the declared requirements, so each aggregate lands after its inputs and
+    # appears once however many features share it.
+    ordered: Dict[str, Aggregate] = {}
+
+    def visit(name: str, path: Tuple[str, ...]) -> None:
+        if name in PLAN_INPUTS or name in ordered:
+            return
+        if name in path:
+            raise RuntimeError(f"Aggregate cycle: {' -> '.join(path + (name,))}")
+        if name not in AGGREGATES:
+            raise RuntimeError(f"Unknown aggregate '{name}'")
+        for requirement in AGGREGATES[name].requires:
+            visit(requirement, path + (name,))
+        ordered[name] = AGGREGATES[name]
+
+    for name in requested:
+        for requirement in FEATURES[name].requires:
+            visit(requirement, ())
+    return FeaturePlan(features=tuple(FEATURES[name] for name in requested), aggregates=tuple(ordered.values()))
+
+
+def compute_feature_rows(
+    transactions: Sequence[Dict[str, Any]],
+    anchors: Sequence[date],
+    features: Optional[Sequence[str]] = None,
+) -> List[Dict[str, float]]:
+    plan = plan_features(features)
+    timeline = Timeline(transactions)
+    return [plan.evaluate(timeline, anchor_day) for anchor_day in anchors]
+
+
+def parse_horizons(raw: str) -> Tuple[int, ...]:
+    horizons = set()
+    for entry in re.split(r"[,\s]+", raw.strip()):
+        if not entry:
+            continue
+        if not entry.isdigit() or int(entry) < 1:
+            raise RuntimeError(f"Invalid feature horizon '{entry}'. Expected a positive number of days")
+        horizons.add(int(entry))
+    return tuple(sorted(horizons))
+
+
+def default_horizons() -> Tuple[int, ...]:
+    return parse_horizons(os.getenv("DRIFTWATCH_FEATURE_HORIZONS", ""))
+
+
+def resolve_horizons(raw: Optional[str]) -> Tuple[int, ...]:
+    return default_horizons() if raw is None else parse_horizons(raw)
+
+
+def longest_window(horizons: Sequence[int] = ()) -> int:
+    return max((WINDOW_DAYS, *horizons))
+
+
+def horizon_columns(horizons: Sequence[int]) -> List[str]:
+    return [f"{name}_{days}d" for days in horizons for name in HORIZON_FEATURES]
+
+
+def is_horizon_column(column: str) -> bool:
+    return HORIZON_COLUMN_PATTERN.match(column) is not None
+
+
+def compute_horizon_features(
+    timeline: Timeline, anchors: Sequence[date], horizons: Sequence[int]
+) -> Dict[str, np.ndarray]:
+    if not anchors or not horizons:
+        return {}
+    # Daily totals are bucketed once over the span the longest horizon needs and turned into prefix
+    # sums; each (anchor, horizon) window is then the difference of two prefix rows, so extra
+    # horizons cost O(anchors) instead of another pass over the transactions.
+    first_day = min(anchors) - timedelta(days=max(horizons) - 1)
+    last_day = max(anchors)
+    span = (last_day - first_day).days + 1
+    start = bisect.bisect_left(timeline.dates, first_day)
+    end = bisect.bisect_right(timeline.dates, last_day)
+    window_tx = timeline.transactions[start:end]
+
+    offsets = np.array([(tx["date"] - first_day).days for tx in window_tx], dtype=np.int64)
+    amounts = np.array([tx["amount"] for tx in window_tx], dtype=float)
+    merchants, codes = np.unique([tx["merchant"].lower() for tx in window_tx], return_inverse=True)
+    codes = codes.astype(np.int64)
+
+    def prefix(daily: np.ndarray) -> np.ndarray:
+        return np.concatenate([np.zeros((1,) + daily.shape[1:], dtype=daily.dtype), np.cumsum(daily, axis=0)])
+
+    spend = prefix(np.bincount(offsets, weights=np.where(amounts < 0, -amounts, 0.0), minlength=span))
+    income = prefix(np.bincount(offsets, weights=np.where(amounts > 0, amounts, 0.0), minlength=span))
+    spend_count = prefix(np.bincount(offsets, weights=(amounts < 0), minlength=span).astype(np.int64))
+    tx_count = prefix(np.bincount(offsets, minlength=span))
+    presence = prefix(
+        np.bincount(offsets * len(merchants) + codes, minlength=span * len(merchants)).reshape(span, len(merchants))
+    )
+
+    ends = np.array([(anchor_day - first_day).days + 1 for anchor_day in anchors], dtype=np.int64)
+    columns: Dict[str, np.ndarray] = {}
+    for days in horizons:
+        starts = np.maximum(ends - days, 0)
+        total_spend = spend[ends] - spend[starts]
+        total_income = income[ends] - income[starts]
+        count = tx_count[ends] - tx_count[starts]
+        distinct = np.count_nonzero(presence[ends] - presence[starts], axis=1)
+        # Counts gate the ratios, so cancellation residue in an empty window never becomes a denominator.
+        has_spend = (spend_count[ends] - spend_count[starts]) > 0
+        columns[f"daily_spend_{days}d"] = np.where(has_spend, total_spend, 0.0) / days
+        columns[f"daily_income_{days}d"] = total_income / days
+        columns[f"cashflow_ratio_{days}d"] = np.divide(
+            total_income, total_spend, out=np.zeros(len(ends)), where=has_spend & (total_spend > 0)
+        )
+        columns[f"merchant_diversity_{days}d"] = np.divide(
+            distinct, count, out=np.zeros(len(ends)), where=count > 0
+        )
+    return columns
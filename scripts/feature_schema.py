@@ -0,0 +1,80 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feature_registry import is_horizon_column
+
+
+# Declared storage dtypes: amounts and ratios fit float32, counts fit uint16. Columns outside the plan
+# keep whatever pandas infers.
+FEATURE_DTYPES: Dict[str, str] = {
+    "daily_spend_30d": "float32",
+    "daily_income_30d": "float32",
+    "rent_ratio": "float32",
+    "subscription_count": "uint16",
+    "top_merchant_share": "float32",
+    "txn_count_7d": "uint16",
+    "avg_txn_amount_30d": "float32",
+    "weekday_spend_entropy": "float32",
+    "cashflow_ratio_30d": "float32",
+    "merchant_diversity_30d": "float32",
+}
+
+# Row labels (`segment`, `segment_account_type`, ...) travel with a batch but are not features: they
+# are split off before schema hashing, drift tests and scoring.
+SEGMENT_COLUMN = "segment"
+
+# Multi-horizon columns (daily_spend_90d, ...) are all amounts or ratios.
+HORIZON_DTYPE = "float32"
+
+
+def feature_dtype(column: str) -> Optional[str]:
+    if column in FEATURE_DTYPES:
+        return FEATURE_DTYPES[column]
+    return HORIZON_DTYPE if is_horizon_column(column) else None
+
+
+def apply_feature_dtypes(frame: pd.DataFrame) -> pd.DataFrame:
+    converted = {}
+    for column in frame.columns:
+        planned = feature_dtype(column)
+        if planned is None:
+            continue
+        dtype = np.dtype(planned)
+        if frame[column].dtype == dtype:
+            continue
+        values = pd.to_numeric(frame[column], errors="coerce").fillna(0)
+        if dtype.kind in "ui":
+            limits = np.iinfo(dtype)
+            values = values.round().clip(limits.min, limits.max)
+        converted[column] = values.astype(dtype)
+    return frame.assign(**converted) if converted else frame
+
+
+def read_feature_csv(source: Any, **kwargs: Any) -> pd.DataFrame:
+    # Planned columns are parsed straight to float32, which also accepts counts written as "3.0" by
+    # older artifacts, and then narrowed to their declared dtype. Horizon columns are only known once
+    # the header is read, so they are narrowed after parsing.
+    dtype = {column: "float32" for column in FEATURE_DTYPES}
+    dtype.update(kwargs.pop("dtype", None) or {})
+    return apply_feature_dtypes(pd.read_csv(source, dtype=dtype, **kwargs))
+
+
+def is_segment_column(column: str) -> bool:
+    return column == SEGMENT_COLUMN or column.startswith(f"{SEGMENT_COLUMN}_")
+
+
+def compute_schema_hash(df: pd.DataFrame) -> str:
+    # Segment labels are not features, so they never change the schema hash.
+    payload = [(column, str(dtype)) for column, dtype in zip(df.columns, df.dtypes) if not is_segment_column(column)]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def split_segment_columns(frame: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    labels = [column for column in frame.columns if is_segment_column(column)]
+    if not labels:
+        return frame, None
+    return frame.drop(columns=labels), frame[labels].astype(str)
@@ -1,13 +1,18 @@
 import argparse
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 
+from batch_segments import upload_feature_batch
 from common import get_supabase, log, now_iso
+from feature_registry import HORIZONS_HELP, resolve_horizons
+from feature_schema import compute_schema_hash
 from nordea_sync import (
     SCENARIOS,
     build_feature_batch,
-    compute_schema_hash,
+    build_segmented_synthetic_batch,
+    feature_anchor_days,
     generate_synthetic_transactions,
+    synthetic_history_days,
 )
 
 
@@ -18,15 +23,22 @@ def build_batch_id(provided: Optional[str]) -> str:
     return f"batch-{stamp}"
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--domain", default="nordea")
     parser.add_argument("--scenario", default="stable_salary", choices=sorted(SCENARIOS.keys()))
     parser.add_argument("--batch-id", default=None)
     parser.add_argument("--rows", type=int, default=100)
     parser.add_argument("--seed", type=int, default=None)
-    args = parser.parse_args()
+    parser.add_argument("--horizons", default=None, help=HORIZONS_HELP)
+    parser.add_argument(
+        "--segment-scenarios",
+        default="",
+        help="Comma-separated scenarios mixed into one batch, each labelled in the segment column.",
+    )
+    args = parser.parse_args(argv)
 
+    horizons = resolve_horizons(args.horizons)
     batch_id = build_batch_id(args.batch_id)
     supabase = get_supabase()
 
@@ -35,21 +47,28 @@ def main() -> None:
         raise RuntimeError(f"Domain '{args.domain}' not found")
     domain_id = domains[0]["id"]
 
-    transactions = generate_synthetic_transactions(
-        scenario=args.scenario,
-        seed=args.seed,
-        days=max(args.rows + 45, 90),
-    )
-    frame = build_feature_batch(transactions, rows=args.rows)
+    segment_scenarios = [entry.strip() for entry in args.segment_scenarios.split(",") if entry.strip()]
+    if segment_scenarios:
+        scenario = "+".join(segment_scenarios)
+        frame, anchor_days = build_segmented_synthetic_batch(segment_scenarios, args.rows, args.seed, horizons)
+    else:
+        scenario = args.scenario
+        transactions = generate_synthetic_transactions(
+            scenario=args.scenario,
+            seed=args.seed,
+            days=synthetic_history_days(args.rows, horizons),
+        )
+        frame = build_feature_batch(transactions, rows=args.rows, horizons=horizons)
+        anchor_days = feature_anchor_days(transactions, rows=args.rows)
     schema_hash = compute_schema_hash(frame)
 
-    bucket = "driftwatch-artifacts"
-    storage_path = f"feature-batches/{args.domain}/{batch_id}.csv"
-    storage_uri = supabase.upload_bytes(
-        bucket,
-        storage_path,
-        frame.to_csv(index=False).encode("utf-8"),
-        "text/csv",
+    storage_uri, segment_stats = upload_feature_batch(
+        supabase,
+        "driftwatch-artifacts",
+        args.domain,
+        batch_id,
+        frame,
+        anchor_days=anchor_days,
     )
 
     supabase.upsert(
@@ -58,7 +77,7 @@ def main() -> None:
             {
                 "domain_id": domain_id,
                 "batch_id": batch_id,
-                "scenario": args.scenario,
+                "scenario": scenario,
                 "row_count": len(frame),
                 "storage_uri": storage_uri,
                 "schema_hash": schema_hash,
@@ -76,7 +95,8 @@ def main() -> None:
 
     log(
         "generate_batch completed "
-        f"domain={args.domain} scenario={args.scenario} batch_id={batch_id} rows={len(frame)}"
+        f"domain={args.domain} scenario={scenario} batch_id={batch_id} rows={len(frame)} "
+        f"new_rows={segment_stats['new_rows'] if segment_stats else len(frame)}"
     )
 
 
@@ -0,0 +1,160 @@
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Union
+
+
+PathElement = Union[str, int]
+
+WHITESPACE = " \t\n\r"
+PAGINATION_KEYS = ("_links", "links", "continuation_key", "continuationKey")
+
+
+class JsonPathNotFound(RuntimeError):
+    pass
+
+
+# Yields the items of the array at `path` while the body is read in chunks, so only one
+# item (or one skipped sibling value) is decoded at a time. Pagination keys met on the way
+# are kept in `skeleton`, shaped like the payload so next_page_request can read it.
+class JsonArrayStream:
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        path: Sequence[PathElement],
+        capture_keys: Sequence[str] = PAGINATION_KEYS,
+    ) -> None:
+        self.path = list(path)
+        self.capture_keys = set(capture_keys)
+        self.skeleton: Dict[str, Any] = {}
+        self.found = False
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        self._skip_ws()
+        yield from self._walk(0, self.skeleton)
+        self._skip_ws()
+        if not self.found:
+            raise JsonPathNotFound(f"JSON path {self.path} not found in payload")
+
+    def _read_more(self) -> bool:
+        if self._eof:
+            return False
+        if self._pos > 65536:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        while self._pos >= len(self._buffer):
+            if not self._read_more():
+                raise json.JSONDecodeError("Unexpected end of JSON stream", self._buffer, self._pos)
+        return self._buffer[self._pos]
+
+    def _skip_ws(self) -> None:
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._read_more():
+                return
+
+    def _expect(self, chars: str) -> str:
+        self._skip_ws()
+        char = self._peek()
+        if char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self._buffer, self._pos)
+        self._pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        self._skip_ws()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._grow()
+                continue
+            # A number or literal that touches the end of the buffer may continue in the next chunk.
+            if end >= len(self._buffer) and not self._eof:
+                self._grow()
+                continue
+            self._pos = end
+            return value
+
+    def _grow(self) -> None:
+        # Read until the unread tail doubles so retries on a large value stay linear overall.
+        target = max(2 * (len(self._buffer) - self._pos), 1)
+        start = len(self._buffer) - self._pos
+        while len(self._buffer) - self._pos - start < target:
+            if not self._read_more():
+                return
+
+    def _walk(self, depth: int, skeleton: Optional[Dict[str, Any]]) -> Iterator[Any]:
+        self._skip_ws()
+        if depth == len(self.path):
+            if self._peek() != "[":
+                raise JsonPathNotFound(f"JSON path {self.path} does not point at an array")
+            self.found = True
+            self._pos += 1
+            self._skip_ws()
+            if self._peek() == "]":
+                self._pos += 1
+                return
+            while True:
+                yield self._decode_value()
+                if self._expect(",]") == "]":
+                    return
+
+        target = self.path[depth]
+        opener = self._peek()
+        if opener == "{":
+            self._pos += 1
+            self._skip_ws()
+            if self._peek() == "}":
+                self._pos += 1
+                return
+            while True:
+                key = self._decode_value()
+                self._expect(":")
+                if key == target and not self.found:
+                    child: Optional[Dict[str, Any]] = None
+                    if skeleton is not None and depth + 1 < len(self.path):
+                        child = skeleton.setdefault(key, {})
+                    yield from self._walk(depth + 1, child)
+                elif key in self.capture_keys and skeleton is not None:
+                    skeleton[key] = self._decode_value()
+                else:
+                    self._decode_value()
+                if self._expect(",}") == "}":
+                    return
+        elif opener == "[":
+            self._pos += 1
+            self._skip_ws()
+            if self._peek() == "]":
+                self._pos += 1
+                return
+            index = 0
+            while True:
+                if index == target and not self.found:
+                    yield from self._walk(depth + 1, None)
+                else:
+                    self._decode_value()
+                index += 1
+                if self._expect(",]") == "]":
+                    return
+        else:
+            self._decode_value()
+
@@ -1,13 +1,15 @@
 import argparse
-import hashlib
 import io
 import json
 import os
 import traceback
 import uuid
 import warnings
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from urllib.parse import urlparse
 
 import joblib
@@ -27,11 +29,65 @@ except ImportError:
     # Evidently >= 0.7.x
     from evidently.presets import DataDriftPreset
 
-from common import get_supabase, log, now_iso
+from adaptive_sampling import default_sampling_mode, sequential_sample
+from artifacts import artifact_codec, download_artifact, encoded_path, upload_artifact, upload_artifact_file
+from batch_segments import MANIFEST_SUFFIX, is_manifest_path, read_segmented_batch
+from common import dataframe_csv_chunks, get_supabase, log, now_iso, refresh_daily_summary
+from drift_stats import compute_psi
+from feature_drift import ReferenceColumns, compute_feature_drift
+from feature_schema import compute_schema_hash, read_feature_csv, split_segment_columns
 from nordea_sync import FEATURE_COLUMNS
+from multivariate_drift import compute_multivariate_drift, default_multivariate_budget
+from psi_significance import (
+    default_psi_alpha,
+    default_psi_resamples,
+    feature_psi_significance,
+    gate_feature_drift,
+    prediction_psi_significance,
+    significance_summary,
+)
+from rolling_drift import commit_rolling_drift, prepare_rolling_drift
+from run_lease import LeaseLost, RunLease, default_lease_seconds, lease_expiry_iso, lease_owner_id
+from score_sketch import build_score_sketch
+from segment_drift import compute_segment_drift, summarize_segment_drift
+from warm_cache import WarmCache
 
 
 STATUS_RANK = {"green": 0, "yellow": 1, "red": 2}
+RUN_OPTION_KEYS = (
+    "challenger_versions",
+    "rolling_batches",
+    "rolling_days",
+    "drift_engine",
+    "drift_workers",
+    "drift_executor",
+    "segment_by",
+    "sampling",
+    "sample_confidence",
+    "sample_min_rows",
+    "psi_resamples",
+    "psi_alpha",
+    "multivariate_budget",
+)
+
+# Process-wide, so a resident worker keeps baselines and models warm between runs.
+BASELINE_CACHE = WarmCache(max_entries=8)
+MODEL_CACHE = WarmCache(max_entries=16)
+
+
+# Inputs handed over in memory by scripts/pipeline.py instead of being read back from Storage.
+# The rows those inputs persist to are written in the background; the run only waits for them
+# once it needs their ids.
+@dataclass
+class RunInputs:
+    baseline: Dict[str, Any]
+    reference: ReferenceColumns
+    baseline_source: str
+    current_df: pd.DataFrame
+    current_source: str
+    models: Dict[str, Any] = field(default_factory=dict)
+    baseline_row: Optional[Future] = None
+    feature_batch_row: Optional[Future] = None
 
 
 def to_json_number(value: Any) -> Any:
@@ -40,11 +96,6 @@ def to_json_number(value: Any) -> Any:
     return value
 
 
-def compute_schema_hash(df: pd.DataFrame) -> str:
-    payload = [(column, str(dtype)) for column, dtype in zip(df.columns, df.dtypes)]
-    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
-
-
 def storage_bucket() -> str:
     return os.getenv("DRIFTWATCH_STORAGE_BUCKET", "driftwatch-artifacts")
 
@@ -60,23 +111,41 @@ def storage_path_from_uri(uri: str, bucket: str) -> Optional[str]:
 
 
 def load_csv_from_storage(supabase, bucket: str, path: str) -> pd.DataFrame:
-    raw = supabase.download_public_bytes(bucket, path)
-    return pd.read_csv(io.BytesIO(raw))
+    raw = download_artifact(supabase, bucket, path)
+    return read_feature_csv(io.BytesIO(raw))
 
 
 def load_bytes_from_storage_uri(supabase, bucket: str, uri: str) -> bytes:
     path = storage_path_from_uri(uri, bucket)
     if not path:
         raise RuntimeError(f"Unsupported storage URI format: {uri}")
-    return supabase.download_public_bytes(bucket, path)
+    return download_artifact(supabase, bucket, path)
+
+
+def load_feature_batch_from_storage_uri(supabase, bucket: str, uri: str) -> pd.DataFrame:
+    raw = load_bytes_from_storage_uri(supabase, bucket, uri)
+    if is_manifest_path(storage_path_from_uri(uri, bucket) or ""):
+        return read_segmented_batch(supabase, bucket, raw)
+    return read_feature_csv(io.BytesIO(raw))
+
+
+def load_reference_columns(supabase, bucket: str, path: str) -> ReferenceColumns:
+    return BASELINE_CACHE.get(
+        path,
+        supabase.object_etag(bucket, path),
+        lambda: ReferenceColumns(*split_segment_columns(load_csv_from_storage(supabase, bucket, path))),
+    )
 
 
 def load_baseline_dataframe(
     supabase, domain_id: str, domain_key: str, baseline_version: str
-) -> Tuple[Dict[str, Any], pd.DataFrame, str]:
+) -> Tuple[Dict[str, Any], ReferenceColumns, str]:
     bucket = storage_bucket()
-    baseline_path = f"baselines/{domain_key}/{baseline_version}.csv"
-    baseline_uri_default = supabase.public_object_url(bucket, baseline_path)
+    codec = artifact_codec()
+    plain_path = f"baselines/{domain_key}/{baseline_version}.csv"
+    # train_model uploads the CSV under the artifact codec's suffix; older baselines are plain CSV.
+    default_paths = list(dict.fromkeys([encoded_path(plain_path, codec), plain_path]))
+    baseline_path = default_paths[0]
 
     rows = supabase.select(
         "baselines",
@@ -90,29 +159,41 @@ def load_baseline_dataframe(
     baseline_row = rows[0] if rows else None
 
     baseline_source = "storage"
-    baseline_df: Optional[pd.DataFrame] = None
+    reference: Optional[ReferenceColumns] = None
 
     if baseline_row and baseline_row.get("storage_uri"):
         try:
-            baseline_df = pd.read_csv(io.BytesIO(load_bytes_from_storage_uri(supabase, bucket, baseline_row["storage_uri"])))
+            stored_path = storage_path_from_uri(baseline_row["storage_uri"], bucket)
+            if not stored_path:
+                raise RuntimeError(f"Unsupported storage URI format: {baseline_row['storage_uri']}")
+            reference = load_reference_columns(supabase, bucket, stored_path)
             baseline_source = "baseline.storage_uri"
         except Exception as exc:  # noqa: BLE001
             baseline_source = f"baseline.storage_uri_fallback ({exc})"
 
-    if baseline_df is None:
+    errors: List[str] = [baseline_source] if reference is None and baseline_source != "storage" else []
+    for path in default_paths:
+        if reference is not None:
+            break
         try:
-            baseline_df = load_csv_from_storage(supabase, bucket, baseline_path)
-            baseline_source = "default_baseline_path"
+            reference = load_reference_columns(supabase, bucket, path)
+            baseline_path, baseline_source = path, "default_baseline_path"
         except Exception as exc:  # noqa: BLE001
-            baseline_df = pd.read_csv(Path("data/demo/baseline.csv"))
-            supabase.upload_bytes(
-                bucket,
-                baseline_path,
-                baseline_df.to_csv(index=False).encode("utf-8"),
-                "text/csv",
+            errors.append(f"{path}: {exc}")
+
+    if reference is None:
+        # Demo data only seeds a baseline that does not exist yet; a registered one that cannot be read
+        # fails the run instead of being monitored against, and overwritten with, the demo CSV.
+        if baseline_row:
+            raise RuntimeError(
+                f"Baseline {domain_key}/{baseline_version} is registered but could not be loaded: {'; '.join(errors)}"
             )
-            baseline_source = f"demo_fallback ({exc})"
+        reference = ReferenceColumns(read_feature_csv(Path("data/demo/baseline.csv")))
+        upload_artifact(supabase, bucket, plain_path, dataframe_csv_chunks(reference.frame), "text/csv", codec)
+        baseline_source = f"demo_fallback ({'; '.join(errors)})"
+    baseline_uri_default = supabase.public_object_url(bucket, baseline_path)
 
+    baseline_df = reference.frame
     schema_hash = compute_schema_hash(baseline_df)
     upsert_payload: Dict[str, Any] = {
         "domain_id": domain_id,
@@ -120,7 +201,9 @@ def load_baseline_dataframe(
         "schema_version": "v1",
         "schema_hash": schema_hash,
         "row_count": len(baseline_df),
-        "storage_uri": baseline_row.get("storage_uri") if baseline_row and baseline_row.get("storage_uri") else baseline_uri_default,
+        "storage_uri": (
+            baseline_row["storage_uri"] if baseline_source == "baseline.storage_uri" else baseline_uri_default
+        ),
         "reason": f"monitor reference source={baseline_source}",
     }
     if baseline_row and baseline_row.get("model_uri"):
@@ -133,7 +216,7 @@ def load_baseline_dataframe(
         [upsert_payload],
         on_conflict="domain_id,baseline_version",
     )
-    return upserted[0], baseline_df, baseline_source
+    return upserted[0], reference, baseline_source
 
 
 def load_current_dataframe(
@@ -168,17 +251,20 @@ def load_current_dataframe(
     if batch_rows:
         batch = batch_rows[0]
         try:
-            current_df = pd.read_csv(io.BytesIO(load_bytes_from_storage_uri(supabase, bucket, batch["storage_uri"])))
+            current_df = load_feature_batch_from_storage_uri(supabase, bucket, batch["storage_uri"])
             return current_df, f"feature_batches:{batch['batch_id']}", batch
         except Exception as exc:  # noqa: BLE001
             log(f"feature batch load fallback for batch_id={batch.get('batch_id')} reason={exc}")
 
-    legacy_path = f"feature-batches/{domain_key}/current.csv"
     try:
-        legacy_df = load_csv_from_storage(supabase, bucket, legacy_path)
-        return legacy_df, "legacy_current_csv", None
+        try:
+            manifest = download_artifact(supabase, bucket, f"feature-batches/{domain_key}/current{MANIFEST_SUFFIX}")
+            return read_segmented_batch(supabase, bucket, manifest), "legacy_current_manifest", None
+        except Exception:  # noqa: BLE001
+            legacy_df = load_csv_from_storage(supabase, bucket, f"feature-batches/{domain_key}/current.csv")
+            return legacy_df, "legacy_current_csv", None
     except Exception as exc:  # noqa: BLE001
-        current_df = pd.read_csv(Path("data/demo/current.csv"))
+        current_df = read_feature_csv(Path("data/demo/current.csv"))
         return current_df, f"demo_fallback ({exc})", None
 
 
@@ -200,7 +286,8 @@ def align_to_reference_schema(current_df: pd.DataFrame, reference_df: pd.DataFra
         if pd.api.types.is_numeric_dtype(target_dtype):
             aligned[column] = pd.to_numeric(aligned[column], errors="coerce").fillna(0)
             if pd.api.types.is_integer_dtype(target_dtype):
-                aligned[column] = aligned[column].round().astype(target_dtype)
+                limits = np.iinfo(target_dtype)
+                aligned[column] = aligned[column].round().clip(limits.min, limits.max).astype(target_dtype)
             else:
                 aligned[column] = aligned[column].astype(target_dtype)
         else:
@@ -229,6 +316,14 @@ def report_to_dict(report: Report) -> Dict[str, Any]:
     raise RuntimeError("Unable to serialize Evidently report; unsupported API surface.")
 
 
+def build_evidently_report(reference_df: pd.DataFrame, current_df: pd.DataFrame) -> Report:
+    report = Report(metrics=[DataDriftPreset()])
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="divide by zero encountered in divide")
+        report.run(reference_data=reference_df, current_data=current_df)
+    return report
+
+
 def get_drift_result(report_dict: Dict[str, Any]) -> Dict[str, Any]:
     metrics = report_dict.get("metrics", [])
     for metric in metrics:
@@ -274,15 +369,6 @@ def summarize_feature_drift(drift_result: Dict[str, Any]) -> Tuple[str, Dict[str
     return status, summary
 
 
-def compute_psi(expected: np.ndarray, current: np.ndarray, epsilon: float = 1e-6) -> float:
-    expected_safe = np.clip(expected, epsilon, None)
-    current_safe = np.clip(current, epsilon, None)
-    expected_safe = expected_safe / expected_safe.sum()
-    current_safe = current_safe / current_safe.sum()
-    values = (current_safe - expected_safe) * np.log(current_safe / expected_safe)
-    return float(np.sum(values))
-
-
 def prediction_status_from_psi(psi: float) -> str:
     if psi >= 0.25:
         return "red"
@@ -291,14 +377,20 @@ def prediction_status_from_psi(psi: float) -> str:
     return "green"
 
 
-def compute_prediction_drift(
-    supabase,
-    baseline: Dict[str, Any],
-    current_df: pd.DataFrame,
-) -> Optional[Dict[str, Any]]:
-    model_uri = baseline.get("model_uri")
+def load_model(supabase, model_uri: str) -> Any:
+    # Retraining overwrites models/<domain>/<version>/model.joblib, so the cache is keyed by ETag as well as URI.
+    bucket = storage_bucket()
+    path = storage_path_from_uri(model_uri, bucket)
+    return MODEL_CACHE.get(
+        model_uri,
+        supabase.object_etag(bucket, path) if path else None,
+        lambda: joblib.load(io.BytesIO(load_bytes_from_storage_uri(supabase, bucket, model_uri))),
+    )
+
+
+def prediction_reference(baseline: Dict[str, Any]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
     baseline_pred = baseline.get("baseline_predictions_json")
-    if not model_uri or not isinstance(baseline_pred, dict):
+    if not baseline.get("model_uri") or not isinstance(baseline_pred, dict):
         return None
 
     distribution = baseline_pred.get("distribution")
@@ -311,27 +403,169 @@ def compute_prediction_drift(
         bin_edges = np.array([float(v) for v in bins], dtype=float)
     else:
         bin_edges = np.linspace(0.0, 1.0, len(expected) + 1)
+    return expected, bin_edges
 
-    model_bytes = load_bytes_from_storage_uri(supabase, storage_bucket(), model_uri)
-    model = joblib.load(io.BytesIO(model_bytes))
 
+def batched_histogram(scores: np.ndarray, bin_edges: np.ndarray) -> np.ndarray:
+    # One bincount over all rows instead of a np.histogram call per model.
+    scores = np.atleast_2d(scores)
+    n_bins = len(bin_edges) - 1
+    index = np.searchsorted(bin_edges, scores, side="right") - 1
+    index[scores == bin_edges[-1]] = n_bins - 1
+    valid = (index >= 0) & (index < n_bins)
+    offsets = np.arange(scores.shape[0])[:, None] * n_bins
+    counts = np.bincount((index + offsets)[valid], minlength=scores.shape[0] * n_bins)
+    return counts.reshape(scores.shape[0], n_bins)
+
+
+def score_models(models: List[Any], current_df: pd.DataFrame) -> Optional[np.ndarray]:
     input_columns = [column for column in FEATURE_COLUMNS if column in current_df.columns]
     if not input_columns:
         return None
-    current_probs = model.predict_proba(current_df[input_columns])[:, 1]
-
-    current_counts, _ = np.histogram(current_probs, bins=bin_edges)
-    current_dist = current_counts / max(int(current_counts.sum()), 1)
-
+    features = current_df[input_columns]
+    if not models:
+        return np.empty((0, len(features)))
+    return np.vstack([model.predict_proba(features)[:, 1] for model in models])
+
+
+def prediction_drift_from_counts(
+    expected: np.ndarray,
+    counts: np.ndarray,
+    current_probs: np.ndarray,
+    baseline_mean: float,
+    significance: Optional[Dict[str, float]] = None,
+    alpha: float = 0.0,
+) -> Dict[str, Any]:
+    current_dist = counts / max(int(counts.sum()), 1)
     psi = compute_psi(expected=expected, current=current_dist)
-    return {
+    result = {
         "psi": round(psi, 6),
         "status": prediction_status_from_psi(psi),
-        "baseline_mean": float(baseline_pred.get("mean", 0.0)),
+        "baseline_mean": baseline_mean,
         "current_mean": float(np.mean(current_probs)) if len(current_probs) else 0.0,
         "baseline_distribution": expected.tolist(),
         "current_distribution": current_dist.tolist(),
     }
+    if significance is not None:
+        result["psi_p_value"] = round(significance["p_value"], 6)
+        result["psi_ci"] = [round(significance["ci_low"], 6), round(significance["ci_high"], 6)]
+        # With alpha set, a PSI that same-sized no-drift samples reach often enough is treated as noise.
+        if alpha > 0 and significance["p_value"] >= alpha and result["status"] != "green":
+            result["status"] = "green"
+            result["gated_by_psi"] = True
+    return result
+
+
+def compute_model_comparison(
+    supabase,
+    baselines: List[Dict[str, Any]],
+    current_df: pd.DataFrame,
+    models: Optional[Dict[str, Any]] = None,
+    psi_resamples: int = 0,
+    psi_alpha: float = 0.0,
+    seed: int = 0,
+    sketch_versions: Sequence[str] = (),
+) -> Dict[str, Dict[str, Any]]:
+    scorable = []
+    for baseline in baselines:
+        reference = prediction_reference(baseline)
+        if reference is not None:
+            scorable.append((baseline, reference))
+    if not scorable:
+        return {}
+
+    preloaded = models or {}
+    loaded = [
+        preloaded.get(baseline["baseline_version"]) or load_model(supabase, baseline["model_uri"])
+        for baseline, _ in scorable
+    ]
+    scores = score_models(loaded, current_df)
+    if scores is None:
+        return {}
+
+    # Models that share bin edges are histogrammed together in one call.
+    groups: Dict[Tuple[float, ...], List[int]] = {}
+    for index, (_, (_, bin_edges)) in enumerate(scorable):
+        groups.setdefault(tuple(bin_edges.tolist()), []).append(index)
+
+    rng = np.random.default_rng(seed)
+    results: Dict[str, Dict[str, Any]] = {}
+    for edges_key, indices in groups.items():
+        counts = batched_histogram(scores[indices], np.array(edges_key))
+        for row, index in enumerate(indices):
+            baseline, (expected, bin_edges) = scorable[index]
+            baseline_pred = baseline["baseline_predictions_json"]
+            # Older baselines did not record n_samples, so their PSI has no noise estimate.
+            baseline_rows = int(baseline_pred.get("n_samples") or 0)
+            significance = None
+            if psi_resamples > 0 and baseline_rows and len(scores[index]):
+                significance = prediction_psi_significance(
+                    expected, bin_edges, scores[index], baseline_rows, psi_resamples, rng
+                )
+            result = prediction_drift_from_counts(
+                expected=expected,
+                counts=counts[row],
+                current_probs=scores[index],
+                baseline_mean=float(baseline_pred.get("mean", 0.0)),
+                significance=significance,
+                alpha=psi_alpha,
+            )
+            # Sketches are stored in their own column, so only the versions that get one are sketched.
+            if baseline["baseline_version"] in sketch_versions:
+                result["score_sketch"] = build_score_sketch(scores[index])
+            results[baseline["baseline_version"]] = result
+
+    ordered = [baseline["baseline_version"] for baseline, _ in scorable]
+    return {version: results[version] for version in ordered}
+
+
+def compute_prediction_drift(
+    supabase,
+    baseline: Dict[str, Any],
+    current_df: pd.DataFrame,
+) -> Optional[Dict[str, Any]]:
+    results = compute_model_comparison(
+        supabase, [baseline], current_df, sketch_versions=(baseline.get("baseline_version"),)
+    )
+    return results.get(baseline.get("baseline_version")) if results else None
+
+
+def load_challenger_baselines(supabase, domain_id: str, versions: List[str]) -> List[Dict[str, Any]]:
+    if not versions:
+        return []
+    rows = supabase.select(
+        "baselines",
+        select="id,baseline_version,schema_hash,model_uri,baseline_predictions_json",
+        filters={"domain_id": f"eq.{domain_id}", "baseline_version": f"in.({','.join(versions)})"},
+    )
+    by_version = {row["baseline_version"]: row for row in rows}
+    missing = [version for version in versions if version not in by_version]
+    if missing:
+        log(f"challenger baselines not found: {missing}")
+    return [by_version[version] for version in versions if version in by_version]
+
+
+def split_compatible_challengers(
+    challengers: List[Dict[str, Any]], schema_hash: str
+) -> Tuple[List[Dict[str, Any]], Dict[str, Optional[str]]]:
+    # A challenger trained on another feature layout would be scored on misaligned columns, so it is
+    # skipped and reported instead, as a mismatched champion fails the run.
+    compatible = [challenger for challenger in challengers if challenger.get("schema_hash") == schema_hash]
+    incompatible = {
+        challenger["baseline_version"]: challenger.get("schema_hash")
+        for challenger in challengers
+        if challenger.get("schema_hash") != schema_hash
+    }
+    return compatible, incompatible
+
+
+def parse_version_list(raw: str) -> List[str]:
+    versions: List[str] = []
+    for item in raw.split(","):
+        version = item.strip()
+        if version and version not in versions:
+            versions.append(version)
+    return versions
 
 
 def combine_status(feature_status: str, prediction_status: Optional[str]) -> str:
@@ -340,27 +574,29 @@ def combine_status(feature_status: str, prediction_status: Optional[str]) -> str
     return feature_status if STATUS_RANK[feature_status] >= STATUS_RANK[prediction_status] else prediction_status
 
 
+def drift_severity(test_name: str, score: Any, drifted: bool) -> str:
+    severity = "low"
+    if drifted and isinstance(score, (int, float)):
+        score_value = float(score)
+        if "p_value" in test_name.lower() or "p-value" in test_name.lower():
+            if score_value < 0.01:
+                severity = "high"
+            elif score_value < 0.05:
+                severity = "medium"
+        else:
+            if score_value >= 0.25:
+                severity = "high"
+            elif score_value >= 0.1:
+                severity = "medium"
+    return severity
+
+
 def extract_feature_rows(run_id: str, drift_result: Dict[str, Any]) -> List[Dict[str, Any]]:
     rows: List[Dict[str, Any]] = []
     for feature_name, details in drift_result.get("drift_by_columns", {}).items():
         score = details.get("drift_score")
         drifted = bool(details.get("drift_detected", False))
         test_name = details.get("stattest_name", "unknown")
-
-        severity = "low"
-        if drifted and isinstance(score, (int, float)):
-            score_value = float(score)
-            if "p_value" in test_name.lower() or "p-value" in test_name.lower():
-                if score_value < 0.01:
-                    severity = "high"
-                elif score_value < 0.05:
-                    severity = "medium"
-            else:
-                if score_value >= 0.25:
-                    severity = "high"
-                elif score_value >= 0.1:
-                    severity = "medium"
-
         rows.append(
             {
                 "run_id": run_id,
@@ -369,12 +605,33 @@ def extract_feature_rows(run_id: str, drift_result: Dict[str, Any]) -> List[Dict
                 "score": to_json_number(score),
                 "p_value": to_json_number(details.get("p_value")),
                 "drifted": drifted,
-                "severity": severity,
+                "severity": drift_severity(test_name, score, drifted),
+                "segment": "",
             }
         )
     return rows
 
 
+def extract_segment_rows(run_id: str, segment_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Whole-batch rows keep segment ''; segment rows are keyed "<column>=<label>".
+    rows: List[Dict[str, Any]] = []
+    for name, details in segment_result["segments"].items():
+        for feature_name, column in details["drift_by_columns"].items():
+            rows.append(
+                {
+                    "run_id": run_id,
+                    "feature_name": feature_name,
+                    "test_name": "PSI",
+                    "score": column["psi"],
+                    "p_value": None,
+                    "drifted": column["drift_detected"],
+                    "severity": drift_severity("PSI", column["psi"], column["drift_detected"]),
+                    "segment": f"{segment_result['segment_by']}={name}",
+                }
+            )
+    return rows
+
+
 def get_domain_id(supabase, key: str) -> str:
     rows = supabase.select("domains", select="id,key", filters={"key": f"eq.{key}"}, limit=1)
     if not rows:
@@ -382,50 +639,151 @@ def get_domain_id(supabase, key: str) -> str:
     return rows[0]["id"]
 
 
-def main() -> None:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument("--domain", default=os.getenv("DOMAIN", "nordea"))
     parser.add_argument("--baseline-version", default=os.getenv("BASELINE_VERSION", "v1"))
     parser.add_argument("--batch-id", default=os.getenv("BATCH_ID", "manual"))
-    args = parser.parse_args()
+    parser.add_argument(
+        "--challenger-versions",
+        default=os.getenv("CHALLENGER_VERSIONS", ""),
+        help="Comma-separated baseline versions whose models also score the current batch.",
+    )
+    parser.add_argument(
+        "--rolling-batches",
+        type=int,
+        default=int(os.getenv("DRIFTWATCH_ROLLING_BATCHES", "0")),
+        help="Track windowed drift over the last K batches (0 disables).",
+    )
+    parser.add_argument(
+        "--rolling-days",
+        type=int,
+        default=int(os.getenv("DRIFTWATCH_ROLLING_DAYS", "0")),
+        help="Track windowed drift over the last D days (0 disables).",
+    )
+    parser.add_argument(
+        "--drift-engine",
+        default=os.getenv("DRIFTWATCH_DRIFT_ENGINE", "evidently"),
+        choices=["evidently", "native"],
+        help="native runs the per-feature tests on a worker pool; the Evidently report is then only built for HTML.",
+    )
+    parser.add_argument("--drift-workers", type=int, default=int(os.getenv("DRIFTWATCH_DRIFT_WORKERS", "0")))
+    parser.add_argument(
+        "--drift-executor",
+        default=os.getenv("DRIFTWATCH_DRIFT_EXECUTOR", "thread"),
+        choices=["thread", "process"],
+    )
+    parser.add_argument(
+        "--segment-by",
+        default=os.getenv("DRIFTWATCH_SEGMENT_BY", ""),
+        help="Segment column (e.g. segment) to also test drift per segment; empty disables.",
+    )
+    parser.add_argument(
+        "--sampling",
+        default=default_sampling_mode(),
+        choices=["full", "sequential"],
+        help="sequential evaluates growing stratified samples and stops once a bootstrapped PSI status is settled.",
+    )
+    parser.add_argument(
+        "--sample-confidence",
+        type=float,
+        default=float(os.getenv("DRIFTWATCH_SAMPLE_CONFIDENCE", "0.95")),
+    )
+    parser.add_argument("--sample-min-rows", type=int, default=int(os.getenv("DRIFTWATCH_SAMPLE_MIN_ROWS", "2000")))
+    parser.add_argument(
+        "--psi-resamples",
+        type=int,
+        default=default_psi_resamples(),
+        help="Resamples behind PSI p-values and confidence intervals; 0 disables them.",
+    )
+    parser.add_argument(
+        "--psi-alpha",
+        type=float,
+        default=default_psi_alpha(),
+        help="Only count PSI-scale drift whose resampled p-value is below alpha; 0 reports without gating.",
+    )
+    parser.add_argument(
+        "--multivariate-budget",
+        type=float,
+        default=default_multivariate_budget(),
+        help="Seconds allowed for the multivariate (random Fourier feature MMD) drift test; 0 disables it.",
+    )
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Only insert a queued run for a resident worker (scripts/worker.py) to claim.",
+    )
+    return parser
 
-    supabase = get_supabase()
-    run_id = str(uuid.uuid4())
-    domain_id = get_domain_id(supabase, args.domain)
 
-    supabase.insert(
-        "monitor_runs",
-        [
-            {
-                "id": run_id,
-                "domain_id": domain_id,
-                "domain_key": args.domain,
-                "baseline_version": args.baseline_version,
-                "batch_id": args.batch_id,
-                "status": "queued",
-            }
-        ],
+def sample_current_batch(
+    supabase,
+    run_id: str,
+    args: argparse.Namespace,
+    baseline: Dict[str, Any],
+    reference: ReferenceColumns,
+    current_df: pd.DataFrame,
+    current_labels: Optional[pd.DataFrame],
+    inputs: Optional[RunInputs] = None,
+) -> Tuple[pd.DataFrame, Optional[pd.DataFrame], Dict[str, Any]]:
+    # Only the champion's scores take part in the stopping rule; challengers are scored on the sample later.
+    expected_scores = prediction_reference(baseline)
+    score = None
+    if expected_scores is not None:
+        preloaded = inputs.models.get(args.baseline_version) if inputs else None
+        model = preloaded or load_model(supabase, baseline["model_uri"])
+
+        def score(frame: pd.DataFrame) -> np.ndarray:
+            return score_models([model], frame)[0]
+
+    strata = None
+    if args.segment_by and current_labels is not None and args.segment_by in current_labels.columns:
+        strata = current_labels[args.segment_by]
+    rows, sampling = sequential_sample(
+        reference,
+        current_df,
+        confidence=args.sample_confidence,
+        min_rows=args.sample_min_rows,
+        score=score,
+        prediction_reference=expected_scores,
+        labels=strata,
+        seed=zlib.crc32(run_id.encode("utf-8")),
     )
+    if rows is None:
+        return current_df, current_labels, sampling
+    sampled_labels = current_labels.iloc[rows].reset_index(drop=True) if current_labels is not None else None
+    return current_df.iloc[rows].reset_index(drop=True), sampled_labels, sampling
 
-    try:
-        supabase.update(
-            "monitor_runs",
-            filters={"id": f"eq.{run_id}"},
-            data={"status": "processing", "started_at": now_iso()},
-        )
 
-        baseline, baseline_df, baseline_source = load_baseline_dataframe(
-            supabase=supabase,
-            domain_id=domain_id,
-            domain_key=args.domain,
-            baseline_version=args.baseline_version,
-        )
-        current_df, current_source, feature_batch = load_current_dataframe(
-            supabase=supabase,
-            domain_id=domain_id,
-            domain_key=args.domain,
-            batch_id=args.batch_id,
-        )
+def execute_run(
+    supabase,
+    run_id: str,
+    domain_id: str,
+    args: argparse.Namespace,
+    lease: Optional[RunLease] = None,
+    inputs: Optional[RunInputs] = None,
+) -> str:
+    # With a lease, every write to the run row is conditional on still owning it.
+    run_filters = {"id": f"eq.{run_id}", **(lease.lease_filter if lease else {})}
+    try:
+        if inputs is None:
+            baseline, reference, baseline_source = load_baseline_dataframe(
+                supabase=supabase,
+                domain_id=domain_id,
+                domain_key=args.domain,
+                baseline_version=args.baseline_version,
+            )
+            current_df, current_source, feature_batch = load_current_dataframe(
+                supabase=supabase,
+                domain_id=domain_id,
+                domain_key=args.domain,
+                batch_id=args.batch_id,
+            )
+        else:
+            baseline, reference, baseline_source = inputs.baseline, inputs.reference, inputs.baseline_source
+            current_df, current_source, feature_batch = inputs.current_df, inputs.current_source, None
+        baseline_df = reference.frame
+        current_df, current_labels = split_segment_columns(current_df)
         current_df = align_to_reference_schema(current_df=current_df, reference_df=baseline_df)
 
         log(
@@ -441,15 +799,76 @@ def main() -> None:
                 f"baseline={baseline['schema_hash']} current={current_schema_hash}"
             )
 
-        report = Report(metrics=[DataDriftPreset()])
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", message="divide by zero encountered in divide")
-            report.run(reference_data=baseline_df, current_data=current_df)
-        report_dict = report_to_dict(report)
-        drift_result = get_drift_result(report_dict)
+        # Rolling windows and segment histograms are cheap per row, so they keep the full batch.
+        full_df, full_labels = current_df, current_labels
+        sampling: Optional[Dict[str, Any]] = None
+        if args.sampling == "sequential":
+            current_df, current_labels, sampling = sample_current_batch(
+                supabase, run_id, args, baseline, reference, current_df, current_labels, inputs
+            )
+            log(
+                f"sequential sampling rows={sampling['rows_used']}/{sampling['rows_total']} "
+                f"proxy_settled={sampling['proxy_settled']} confidence={sampling['confidence']}"
+            )
+
+        report: Optional[Report] = None
+        if args.drift_engine == "native":
+            drift_result = compute_feature_drift(
+                baseline_df,
+                current_df,
+                workers=args.drift_workers or None,
+                executor=args.drift_executor,
+                reference=reference,
+            )
+        else:
+            report = build_evidently_report(baseline_df, current_df)
+            drift_result = get_drift_result(report_to_dict(report))
 
+        psi_report: Optional[Dict[str, Any]] = None
+        if args.psi_resamples > 0:
+            significance = feature_psi_significance(
+                reference, current_df, args.psi_resamples, np.random.default_rng(zlib.crc32(run_id.encode("utf-8")))
+            )
+            psi_report = {
+                "resamples": args.psi_resamples,
+                "alpha": args.psi_alpha,
+                "gated_columns": gate_feature_drift(drift_result, significance, args.psi_alpha),
+                "features": significance_summary(significance),
+            }
         feature_status, drift_summary = summarize_feature_drift(drift_result)
-        prediction = compute_prediction_drift(supabase=supabase, baseline=baseline, current_df=current_df)
+        # Joint shifts (e.g. income vs cashflow) that no single column shows; reported next to the per-column
+        # result without changing the status. Its row cap keeps the cost bounded, so it reads the full batch.
+        multivariate: Optional[Dict[str, Any]] = None
+        if args.multivariate_budget > 0:
+            multivariate = compute_multivariate_drift(
+                reference, full_df, args.multivariate_budget, seed=zlib.crc32(run_id.encode("utf-8"))
+            )
+        segment_result: Optional[Dict[str, Any]] = None
+        if args.segment_by:
+            if full_labels is not None and args.segment_by in full_labels.columns:
+                segment_result = compute_segment_drift(reference, full_df, full_labels[args.segment_by], args.segment_by)
+            else:
+                log(f"segment drift skipped: batch has no '{args.segment_by}' column")
+        challenger_versions = [
+            version for version in parse_version_list(args.challenger_versions) if version != args.baseline_version
+        ]
+        challengers = load_challenger_baselines(supabase, domain_id, challenger_versions)
+        challengers, incompatible = split_compatible_challengers(challengers, current_schema_hash)
+        if incompatible:
+            log(f"challengers skipped on schema mismatch: current={current_schema_hash} {incompatible}")
+        prediction_by_model = compute_model_comparison(
+            supabase=supabase,
+            baselines=[baseline, *challengers],
+            current_df=current_df,
+            models=inputs.models if inputs else None,
+            psi_resamples=args.psi_resamples,
+            psi_alpha=args.psi_alpha,
+            seed=zlib.crc32(run_id.encode("utf-8")),
+            sketch_versions=(args.baseline_version,),
+        )
+        prediction = prediction_by_model.get(args.baseline_version)
+        # The champion's sketch lives in its own column so trend queries can skip report_json.
+        score_sketch = prediction.pop("score_sketch", None) if prediction else None
         prediction_status = prediction.get("status") if prediction else None
         overall_status = combine_status(feature_status=feature_status, prediction_status=prediction_status)
 
@@ -458,27 +877,52 @@ def main() -> None:
             f"Recommended action: {'investigate immediately' if overall_status == 'red' else 'continue monitoring'}"
         )
         if prediction:
-            deterministic += f" Prediction PSI={prediction['psi']} ({prediction['status']})."
+            noise = f"p={prediction['psi_p_value']}, " if "psi_p_value" in prediction else ""
+            deterministic += f" Prediction PSI={prediction['psi']} ({noise}{prediction['status']})."
+        if segment_result:
+            drifted_segments = [
+                f"{name} ({details['number_of_drifted_columns']}/{details['number_of_columns']})"
+                for name, details in segment_result["segments"].items()
+                if details["number_of_drifted_columns"]
+            ]
+            if drifted_segments:
+                deterministic += f" Segments with drift by {args.segment_by}: {', '.join(drifted_segments)}."
+        if multivariate and multivariate["drift_detected"]:
+            deterministic += f" Joint feature distribution shifted (MMD p={multivariate['p_value']})."
         drift_summary["deterministic_summary"] = deterministic
 
+        if inputs is not None:
+            if inputs.baseline_row is not None:
+                baseline = {**baseline, **inputs.baseline_row.result()}
+            feature_batch = inputs.feature_batch_row.result() if inputs.feature_batch_row is not None else None
+
+        if lease:
+            lease.ensure_held()
         feature_rows = extract_feature_rows(run_id, drift_result)
+        if segment_result:
+            feature_rows += extract_segment_rows(run_id, segment_result)
         if feature_rows:
             supabase.upsert(
                 "feature_drift_metrics",
                 feature_rows,
-                on_conflict="run_id,feature_name,test_name",
+                on_conflict="run_id,feature_name,test_name,segment",
             )
 
         html_report_uri = None
         bucket = storage_bucket()
-        if os.getenv("DRIFTWATCH_UPLOAD_HTML", "true").lower() in {"1", "true", "yes"}:
+        if html_report_enabled(args.drift_engine):
+            if report is None:
+                report = build_evidently_report(baseline_df, current_df)
             html_temp = Path("/tmp") / f"{run_id}.html"
             report.save_html(str(html_temp))
-            html_report_uri = supabase.upload_bytes(
+            # Reports stay uncompressed by default: the dashboard links straight to the object.
+            html_report_uri = upload_artifact_file(
+                supabase,
                 bucket,
                 f"reports/{run_id}.html",
-                html_temp.read_bytes(),
+                str(html_temp),
                 "text/html",
+                codec=artifact_codec("DRIFTWATCH_REPORT_CODEC", default="none"),
             )
 
         compact_report = {
@@ -495,6 +939,38 @@ def main() -> None:
             "drift": drift_summary,
             "prediction_drift": prediction,
         }
+        if challengers:
+            compact_report["prediction_drift_by_model"] = prediction_by_model
+        if incompatible:
+            compact_report["skipped_challengers"] = {
+                version: {"reason": "schema_hash mismatch", "schema_hash": schema_hash}
+                for version, schema_hash in incompatible.items()
+            }
+        if segment_result:
+            compact_report["segment_drift"] = summarize_segment_drift(segment_result)
+        if sampling:
+            # The sample's final status comes from the drift engine and can differ from the PSI proxy.
+            compact_report["sampling"] = {**sampling, "drift_status": overall_status}
+            if "proxy_status" in sampling:
+                compact_report["sampling"]["proxy_agrees"] = sampling["proxy_status"] == overall_status
+        if psi_report:
+            compact_report["psi_significance"] = psi_report
+        if multivariate:
+            compact_report["multivariate_drift"] = multivariate
+        rolling_update = None
+        if args.rolling_batches > 0 or args.rolling_days > 0:
+            compact_report["rolling_drift"], rolling_update = prepare_rolling_drift(
+                supabase=supabase,
+                domain_id=domain_id,
+                baseline_version=args.baseline_version,
+                baseline_id=baseline["id"],
+                baseline_df=baseline_df,
+                schema_hash=baseline["schema_hash"],
+                current_df=full_df,
+                batch_id=args.batch_id,
+                max_batches=args.rolling_batches or None,
+                max_days=args.rolling_days or None,
+            )
 
         if overall_status == "red":
             top_features = drift_summary.get("top_features", [])
@@ -516,9 +992,10 @@ def main() -> None:
                 ],
             )
 
-        supabase.update(
+        finished_at = now_iso()
+        completed = supabase.update(
             "monitor_runs",
-            filters={"id": f"eq.{run_id}"},
+            filters=run_filters,
             data={
                 "baseline_id": baseline["id"],
                 "feature_batch_id": feature_batch.get("id") if feature_batch else None,
@@ -526,12 +1003,18 @@ def main() -> None:
                 "status": "completed",
                 "drift_status": overall_status,
                 "prediction_drift_score": prediction.get("psi") if prediction else None,
+                "score_sketch": score_sketch,
                 "report_json": compact_report,
                 "html_report_uri": html_report_uri,
-                "finished_at": now_iso(),
+                "finished_at": finished_at,
                 "error_text": None,
             },
         )
+        if not completed:
+            raise LeaseLost(f"Run {run_id} was reclaimed before it could be completed")
+        if rolling_update is not None:
+            commit_rolling_drift(supabase, rolling_update)
+        refresh_daily_summary(supabase, args.domain, args.baseline_version, day=finished_at[:10])
         supabase.update(
             "domains",
             filters={"id": f"eq.{domain_id}"},
@@ -539,14 +1022,21 @@ def main() -> None:
         )
 
         log(f"run {run_id} completed with drift_status={overall_status}")
+        return overall_status
+    except LeaseLost as exc:
+        # The sweeper requeued the run; its next owner records the outcome.
+        log(f"run {run_id} abandoned: {exc}")
+        raise
     except Exception as exc:
         log(f"run {run_id} failed: {exc}")
         log(traceback.format_exc())
+        finished_at = now_iso()
         supabase.update(
             "monitor_runs",
-            filters={"id": f"eq.{run_id}"},
-            data={"status": "failed", "error_text": str(exc), "finished_at": now_iso()},
+            filters=run_filters,
+            data={"status": "failed", "error_text": str(exc), "finished_at": finished_at},
         )
+        refresh_daily_summary(supabase, args.domain, args.baseline_version, day=finished_at[:10])
         supabase.update(
             "domains",
             filters={"id": f"eq.{domain_id}"},
@@ -555,5 +1045,63 @@ def main() -> None:
         raise
 
 
+def html_report_enabled(drift_engine: str) -> bool:
+    # The HTML artifact is a full Evidently report, so the native engine skips it unless it is asked for.
+    default = "false" if drift_engine == "native" else "true"
+    return os.getenv("DRIFTWATCH_UPLOAD_HTML", default).strip().lower() in {"1", "true", "yes"}
+
+
+def new_run_record(run_id: str, domain_id: str, args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "id": run_id,
+        "domain_id": domain_id,
+        "domain_key": args.domain,
+        "baseline_version": args.baseline_version,
+        "batch_id": args.batch_id,
+        # Stored for direct runs too, so every run records the options it used.
+        "params": {key: getattr(args, key) for key in RUN_OPTION_KEYS},
+    }
+
+
+def insert_owned_run(supabase, run: Dict[str, Any]) -> RunLease:
+    # Inserted as processing under this process's lease so a worker polling the queue never claims it; as it
+    # is not from_queue, the sweeper fails it rather than requeueing it if this process dies.
+    owner = lease_owner_id()
+    token = str(uuid.uuid4())
+    lease_seconds = default_lease_seconds()
+    supabase.insert(
+        "monitor_runs",
+        [
+            {
+                **run,
+                "status": "processing",
+                "started_at": now_iso(),
+                "lease_owner": owner,
+                "lease_token": token,
+                "lease_expires_at": lease_expiry_iso(lease_seconds),
+                "attempt_count": 1,
+            }
+        ],
+    )
+    return RunLease(supabase, run["id"], owner, token, lease_seconds)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+
+    supabase = get_supabase()
+    run_id = str(uuid.uuid4())
+    domain_id = get_domain_id(supabase, args.domain)
+
+    run = new_run_record(run_id, domain_id, args)
+    if args.enqueue:
+        supabase.insert("monitor_runs", [{**run, "status": "queued"}])
+        log(f"run {run_id} queued for {args.domain}/{args.baseline_version} batch_id={args.batch_id}")
+        return
+
+    with insert_owned_run(supabase, run) as lease:
+        execute_run(supabase, run_id, domain_id, args, lease=lease)
+
+
 if __name__ == "__main__":
     main()
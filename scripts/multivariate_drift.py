@@ -0,0 +1,169 @@
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from drift_stats import baseline_block_masks, circular_blocks
+from feature_drift import ReferenceColumns
+from psi_significance import default_psi_block_rows
+
+
+# Kernel MMD between baseline and batch rows, approximated with random Fourier features so the
+# statistic is a distance between two mean embeddings and costs O(rows x components).
+RFF_COMPONENTS = 256
+PERMUTATIONS = 200
+PERMUTATION_CHUNK = 25
+MAX_ROWS = 5000
+BANDWIDTH_ROWS = 500
+P_VALUE_THRESHOLD = 0.05
+
+
+def default_multivariate_budget() -> float:
+    return float(os.getenv("DRIFTWATCH_MULTIVARIATE_BUDGET_SECONDS", "2.0"))
+
+
+def standardized(frame: pd.DataFrame, columns: List[str], center: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    values = frame[columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    values = (values - center) / scale
+    # Missing values sit at the baseline mean.
+    return np.nan_to_num(values, nan=0.0)
+
+
+def rff_map(values: np.ndarray, weights: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    return np.sqrt(2.0 / weights.shape[1]) * np.cos(values @ weights + offsets)
+
+
+def subsample(rows: int, limit: int, rng: np.random.Generator) -> Optional[np.ndarray]:
+    return np.sort(rng.choice(rows, size=limit, replace=False)) if rows > limit else None
+
+
+def baseline_embedding(reference: ReferenceColumns, components: int, max_rows: int, seed: int) -> Dict[str, Any]:
+    frame = reference.frame
+    columns = [column for column in frame.columns if pd.api.types.is_numeric_dtype(frame[column])]
+    numeric = frame[columns].apply(pd.to_numeric, errors="coerce")
+    center = numeric.mean().fillna(0.0).to_numpy(dtype=float)
+    scale = numeric.std().fillna(0.0).to_numpy(dtype=float)
+    scale[scale < 1e-9] = 1.0
+
+    rng = np.random.default_rng(seed)
+    values = standardized(frame, columns, center, scale)
+    sample = subsample(len(values), max_rows, rng)
+    if sample is not None:
+        values = values[sample]
+
+    # Median heuristic: the Gaussian kernel width is the median distance between baseline rows.
+    probe = values[subsample(len(values), BANDWIDTH_ROWS, rng)] if len(values) > BANDWIDTH_ROWS else values
+    squared = (probe**2).sum(axis=1)
+    distances = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * probe @ probe.T, 0.0))
+    upper = distances[np.triu_indices(len(probe), k=1)]
+    bandwidth = float(np.median(upper)) if len(upper) and np.median(upper) > 0 else 1.0
+
+    weights = rng.normal(0.0, 1.0 / bandwidth, size=(len(columns), components))
+    offsets = rng.uniform(0.0, 2 * np.pi, size=components)
+    return {
+        "columns": columns,
+        "center": center,
+        "scale": scale,
+        "bandwidth": bandwidth,
+        "weights": weights,
+        "offsets": offsets,
+        "features": rff_map(values, weights, offsets),
+    }
+
+
+def block_sums(features: np.ndarray, size: int, phase: int) -> np.ndarray:
+    # Embedding sums of the circular blocks: (blocks, components).
+    rows, _ = circular_blocks(len(features), size, phase)
+    return features[rows].reshape(-1, size, features.shape[1]).sum(axis=1)
+
+
+def permutation_null(
+    reference_features: np.ndarray,
+    current_features: np.ndarray,
+    permutations: int,
+    rng: np.random.Generator,
+    deadline: float,
+    block_rows: int,
+) -> Tuple[np.ndarray, bool]:
+    # Block relabellings of the pooled rows, as for the PSI p-values: with weights of +1/m for baseline and
+    # -1/n for current rows, each chunk's mean-embedding differences are one matrix product.
+    size = max(1, min(block_rows, len(reference_features), len(current_features)))
+    statistics: List[np.ndarray] = []
+    done, chunk_seconds = 0, 0.0
+    while done < permutations:
+        # The budget is a hard cap: no chunk starts that the last one's duration says would overrun it.
+        chunk_started = time.perf_counter()
+        if chunk_started + chunk_seconds > deadline:
+            return np.concatenate(statistics) if statistics else np.empty(0), True
+        count = min(PERMUTATION_CHUNK, permutations - done)
+        reference_blocks = block_sums(reference_features, size, int(rng.integers(size)))
+        current_blocks = block_sums(current_features, size, int(rng.integers(size)))
+        pooled = np.vstack([reference_blocks, current_blocks])
+        masks = baseline_block_masks(len(reference_blocks), len(pooled), count, rng)
+        weights = np.where(masks, 1.0 / (len(reference_blocks) * size), -1.0 / (len(current_blocks) * size))
+        statistics.append(((weights @ pooled) ** 2).sum(axis=1))
+        done += count
+        chunk_seconds = time.perf_counter() - chunk_started
+    return np.concatenate(statistics), False
+
+
+def compute_multivariate_drift(
+    reference: ReferenceColumns,
+    current_df: pd.DataFrame,
+    budget_seconds: float,
+    seed: int = 0,
+    components: int = RFF_COMPONENTS,
+    permutations: int = PERMUTATIONS,
+    max_rows: int = MAX_ROWS,
+    block_rows: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    started = time.perf_counter()
+    # The projection and the baseline's embedded rows depend only on the baseline, so they are cached with it.
+    embedding = reference.derived(
+        ("rff_mmd", components, max_rows), lambda: baseline_embedding(reference, components, max_rows, seed=0)
+    )
+    columns = [column for column in embedding["columns"] if column in current_df.columns]
+    if len(columns) != len(embedding["columns"]) or current_df.empty or not columns:
+        return None
+
+    # Both sides are capped at max_rows, so the cost stays linear in rows and bounded for any batch size.
+    rng = np.random.default_rng(seed)
+    sample = subsample(len(current_df), max_rows, rng)
+    current = current_df if sample is None else current_df.iloc[sample]
+    current_features = rff_map(
+        standardized(current, columns, embedding["center"], embedding["scale"]),
+        embedding["weights"],
+        embedding["offsets"],
+    )
+    reference_features = embedding["features"]
+    statistic = float(((reference_features.mean(axis=0) - current_features.mean(axis=0)) ** 2).sum())
+
+    null, exhausted = permutation_null(
+        reference_features,
+        current_features,
+        permutations,
+        rng,
+        deadline=started + budget_seconds,
+        block_rows=block_rows or default_psi_block_rows(),
+    )
+    # Without a single permutation inside the budget there is no null to compare against.
+    p_value = float((1 + (null >= statistic).sum()) / (len(null) + 1)) if len(null) else None
+    return {
+        "method": "rff_mmd",
+        "statistic": round(statistic, 8),
+        "p_value": round(p_value, 6) if p_value is not None else None,
+        "threshold": P_VALUE_THRESHOLD,
+        "drift_detected": p_value is not None and p_value < P_VALUE_THRESHOLD,
+        "columns": len(columns),
+        "components": components,
+        "bandwidth": round(embedding["bandwidth"], 6),
+        "reference_rows": len(reference_features),
+        "current_rows": len(current_features),
+        "current_rows_total": len(current_df),
+        "permutations": len(null),
+        "budget_seconds": budget_seconds,
+        "budget_exhausted": exhausted,
+        "elapsed_seconds": round(time.perf_counter() - started, 4),
+    }
@@ -1,7 +1,14 @@
+import fcntl
+import hashlib
+import json
 import os
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
 
@@ -54,55 +61,137 @@ def build_headers(cfg: NordeaConfig, access_token: Optional[str] = None) -> Dict
     return headers
 
 
-def fetch_access_token(cfg: NordeaConfig) -> Optional[str]:
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+DEFAULT_TOKEN_TTL_SECONDS = 300
+AUTH_STYLES = ("client_headers", "basic_auth")
+
+_TOKEN_LOCK = threading.Lock()
+
+
+def token_cache_path() -> Path:
+    raw = os.getenv("NORDEA_TOKEN_CACHE_PATH", "~/.cache/driftwatch/nordea_token.json")
+    return Path(raw).expanduser()
+
+
+def token_cache_key(cfg: NordeaConfig) -> str:
+    return hashlib.sha256(f"{cfg.env}|{cfg.token_url}|{cfg.client_id}".encode("utf-8")).hexdigest()
+
+
+def read_token_cache(path: Path) -> Dict[str, Any]:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def write_token_cache(path: Path, cache: Dict[str, Any]) -> None:
+    # Owner-only file written atomically; tokens never leave the runner.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_suffix(f".{os.getpid()}.tmp")
+    fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as handle:
+        json.dump(cache, handle)
+    os.replace(temp, path)
+
+
+@contextmanager
+def token_cache_lock(path: Path) -> Iterator[None]:
+    # Serializes refreshes across threads and processes sharing the same cache file.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _TOKEN_LOCK, open(path.with_suffix(".lock"), "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def cached_token_is_fresh(entry: Optional[Dict[str, Any]]) -> bool:
+    if not entry or not entry.get("access_token"):
+        return False
+    return float(entry.get("expires_at", 0)) - TOKEN_REFRESH_MARGIN_SECONDS > time.time()
+
+
+def request_token(cfg: NordeaConfig, auth_style: str) -> requests.Response:
+    headers = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "x-request-id": str(uuid.uuid4()),
+        "x-ibm-client-id": cfg.client_id,
+        "x-ibm-client-secret": cfg.client_secret,
+    }
+    if cfg.bypass_signature:
+        headers["Signature"] = "SKIP_SIGNATURE_VALIDATION_FOR_SANDBOX"
+    auth: Optional[Tuple[str, str]] = (cfg.client_id, cfg.client_secret) if auth_style == "basic_auth" else None
+    return requests.post(
+        cfg.token_url,
+        headers=headers,
+        data={"grant_type": "client_credentials"},
+        auth=auth,
+        timeout=30,
+    )
+
+
+def summarize_token_response(resp: requests.Response) -> str:
+    body = (resp.text or "").strip().replace("\n", " ")
+    content_type = resp.headers.get("Content-Type", "")
+    return f"status={resp.status_code} content_type={content_type} body={body[:260]}"
+
+
+def request_access_token(cfg: NordeaConfig, preferred_style: Optional[str] = None) -> Dict[str, Any]:
+    styles = list(AUTH_STYLES)
+    if preferred_style in styles:
+        styles.remove(preferred_style)
+        styles.insert(0, preferred_style)
+
+    # The style that worked last time is tried alone; the other is only a fallback.
+    responses: List[requests.Response] = []
+    for style in styles:
+        response = request_token(cfg, style)
+        responses.append(response)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        token = payload.get("access_token") if isinstance(payload, dict) else None
+        if response.status_code < 400 and token:
+            expires_in = float(payload.get("expires_in") or DEFAULT_TOKEN_TTL_SECONDS)
+            return {"access_token": token, "expires_at": time.time() + expires_in, "auth_style": style}
+
+    status_text = " | ".join(summarize_token_response(resp) for resp in responses)
+    raise RuntimeError(
+        "Nordea token request failed. "
+        f"Attempt details: {status_text}. "
+        "If this is personal/v5, direct client_credentials may be rejected until full authorization flow is implemented."
+    )
+
+
+def fetch_access_token(cfg: NordeaConfig, use_cache: bool = True) -> Optional[str]:
     if not (cfg.token_url and cfg.client_id and cfg.client_secret):
         return None
 
     validate_sandbox_bypass(cfg)
 
-    def call_token(use_basic_auth: bool) -> requests.Response:
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded",
-            "x-request-id": str(uuid.uuid4()),
-            "x-ibm-client-id": cfg.client_id,
-            "x-ibm-client-secret": cfg.client_secret,
-        }
-        if cfg.bypass_signature:
-            headers["Signature"] = "SKIP_SIGNATURE_VALIDATION_FOR_SANDBOX"
-        auth: Optional[Tuple[str, str]] = (cfg.client_id, cfg.client_secret) if use_basic_auth else None
-        return requests.post(
-            cfg.token_url,
-            headers=headers,
-            data={"grant_type": "client_credentials"},
-            auth=auth,
-            timeout=30,
-        )
-
-    def summarize_response(resp: requests.Response) -> str:
-        body = (resp.text or "").strip().replace("\n", " ")
-        content_type = resp.headers.get("Content-Type", "")
-        return f"status={resp.status_code} content_type={content_type} body={body[:260]}"
-
-    responses = [call_token(use_basic_auth=False), call_token(use_basic_auth=True)]
-    response = responses[-1]
-    for candidate in responses:
-        if candidate.status_code < 400:
-            response = candidate
-            break
-
-    try:
-        payload = response.json()
-    except ValueError:
-        payload = {}
-    token = payload.get("access_token")
-    if response.status_code >= 400 or not token:
-        status_text = " | ".join(summarize_response(resp) for resp in responses)
-        raise RuntimeError(
-            "Nordea token request failed. "
-            f"Attempt details: {status_text}. "
-            "If this is personal/v5, direct client_credentials may be rejected until full authorization flow is implemented."
-        )
-    return token
+    if not use_cache:
+        return request_access_token(cfg)["access_token"]
+
+    path = token_cache_path()
+    key = token_cache_key(cfg)
+    entry = read_token_cache(path).get(key)
+    if cached_token_is_fresh(entry):
+        return entry["access_token"]
+
+    with token_cache_lock(path):
+        cache = read_token_cache(path)
+        entry = cache.get(key)
+        if cached_token_is_fresh(entry):
+            return entry["access_token"]
+
+        refreshed = request_access_token(cfg, preferred_style=(entry or {}).get("auth_style"))
+        cache[key] = refreshed
+        write_token_cache(path, cache)
+        log(f"Nordea access token refreshed auth_style={refreshed['auth_style']}")
+        return refreshed["access_token"]
 
 
 def probe_nordea(cfg: NordeaConfig) -> Dict[str, str]:
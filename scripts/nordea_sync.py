@@ -1,33 +1,43 @@
 import argparse
-import hashlib
 import json
 import math
 import os
-from collections import defaultdict
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urljoin
 
 import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
+from artifacts import artifact_codec, upload_artifact
+from batch_segments import upload_feature_batch
 from common import get_supabase, log, now_iso
+from feature_registry import (
+    FEATURES,
+    HORIZONS_HELP,
+    Timeline,
+    compute_feature_rows,
+    compute_horizon_features,
+    default_horizons,
+    longest_window,
+    plan_features,
+    resolve_horizons,
+    safe_entropy,
+)
+from feature_schema import SEGMENT_COLUMN, apply_feature_dtypes, compute_schema_hash, read_feature_csv
+from json_stream import JsonArrayStream, JsonPathNotFound
 from nordea_client import build_headers, fetch_access_token, load_nordea_config, validate_sandbox_bypass
+from transaction_store import open_transaction_store
 
 
-FEATURE_COLUMNS = [
-    "daily_spend_30d",
-    "daily_income_30d",
-    "rent_ratio",
-    "subscription_count",
-    "top_merchant_share",
-    "txn_count_7d",
-    "avg_txn_amount_30d",
-    "weekday_spend_entropy",
-    "cashflow_ratio_30d",
-    "merchant_diversity_30d",
-]
+FEATURE_COLUMNS = list(FEATURES)
 
 SCENARIOS: Dict[str, Dict[str, float]] = {
     "stable_salary": {
@@ -76,27 +86,21 @@ SCENARIOS: Dict[str, Dict[str, float]] = {
     },
 }
 
-SUBSCRIPTION_HINTS = {
-    "spotify",
-    "netflix",
-    "youtube",
-    "apple",
-    "icloud",
-    "amazon prime",
-    "adobe",
-    "gym",
-    "hbo",
-    "disney",
-    "viaplay",
-    "tv4",
-}
-
-RENT_HINTS = {"rent", "hyra", "landlord", "heimstaden", "balder", "hus"}
 
 
-def compute_schema_hash(df: pd.DataFrame) -> str:
-    payload = [(column, str(dtype)) for column, dtype in zip(df.columns, df.dtypes)]
-    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+TIMESTAMP_KEYS = ("bookingDateTime", "bookingDate", "valueDate", "transactionDate", "date")
+DATE_ONLY_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+MERCHANT_KEYS = (
+    "merchantName",
+    "merchant",
+    "creditorName",
+    "debtorName",
+    "counterpartyName",
+    "description",
+    "remittanceInformationUnstructured",
+    "reference",
+)
+BULK_NORMALIZE_MIN_RECORDS = 32
 
 
 def env_bool(name: str, default: bool = False) -> bool:
@@ -178,16 +182,7 @@ def extract_amount(tx: Dict[str, Any]) -> Optional[float]:
 
 
 def extract_merchant(tx: Dict[str, Any]) -> str:
-    for key in (
-        "merchantName",
-        "merchant",
-        "creditorName",
-        "debtorName",
-        "counterpartyName",
-        "description",
-        "remittanceInformationUnstructured",
-        "reference",
-    ):
+    for key in MERCHANT_KEYS:
         value = tx.get(key)
         if isinstance(value, str) and value.strip():
             return value.strip()
@@ -195,43 +190,53 @@ def extract_merchant(tx: Dict[str, Any]) -> str:
 
 
 def extract_timestamp(tx: Dict[str, Any]) -> Optional[datetime]:
-    for key in ("bookingDateTime", "bookingDate", "valueDate", "transactionDate", "date"):
+    for key in TIMESTAMP_KEYS:
         parsed = parse_datetime(tx.get(key))
         if parsed:
             return parsed
     return None
 
 
-def gather_lists(node: Any, depth: int = 0) -> List[List[Dict[str, Any]]]:
+def gather_list_paths(
+    node: Any, path: Tuple[Any, ...] = (), depth: int = 0
+) -> List[Tuple[Tuple[Any, ...], List[Dict[str, Any]]]]:
     if depth > 5:
         return []
-    found: List[List[Dict[str, Any]]] = []
+    found: List[Tuple[Tuple[Any, ...], List[Dict[str, Any]]]] = []
     if isinstance(node, list):
         dict_items = [item for item in node if isinstance(item, dict)]
         if dict_items:
-            found.append(dict_items)
-        for item in node:
-            found.extend(gather_lists(item, depth + 1))
+            found.append((path, dict_items))
+        for index, item in enumerate(node):
+            found.extend(gather_list_paths(item, (*path, index), depth + 1))
     elif isinstance(node, dict):
-        for value in node.values():
-            found.extend(gather_lists(value, depth + 1))
+        for key, value in node.items():
+            found.extend(gather_list_paths(value, (*path, key), depth + 1))
     return found
 
 
-def pick_transaction_list(payload: Any) -> List[Dict[str, Any]]:
-    candidates = gather_lists(payload)
-    scored: List[Tuple[int, List[Dict[str, Any]]]] = []
-    for candidate in candidates:
+def gather_lists(node: Any, depth: int = 0) -> List[List[Dict[str, Any]]]:
+    return [items for _, items in gather_list_paths(node, (), depth)]
+
+
+def pick_transaction_list_with_path(payload: Any) -> Tuple[Optional[Tuple[Any, ...]], List[Dict[str, Any]]]:
+    candidates = gather_list_paths(payload)
+    scored: List[Tuple[int, Tuple[Any, ...], List[Dict[str, Any]]]] = []
+    for path, candidate in candidates:
         score = 0
         for item in candidate[:10]:
             if any(key in item for key in ("transactionAmount", "amount", "bookingDate", "bookingDateTime", "valueDate")):
                 score += 1
         if score > 0:
-            scored.append((score, candidate))
+            scored.append((score, path, candidate))
     if not scored:
-        return []
-    scored.sort(key=lambda row: (row[0], len(row[1])), reverse=True)
-    return scored[0][1]
+        return None, []
+    scored.sort(key=lambda row: (row[0], len(row[2])), reverse=True)
+    return scored[0][1], scored[0][2]
+
+
+def pick_transaction_list(payload: Any) -> List[Dict[str, Any]]:
+    return pick_transaction_list_with_path(payload)[1]
 
 
 def pick_account_list(payload: Any) -> List[Dict[str, Any]]:
@@ -264,14 +269,14 @@ def account_id_of(record: Dict[str, Any]) -> Optional[str]:
     return str(raw) if raw is not None else None
 
 
-def http_get_json(url: str, headers: Dict[str, str], params: Optional[Dict[str, str]] = None) -> Any:
-    response = requests.get(url, headers=headers, params=params, timeout=30)
-    if response.status_code >= 400:
-        body = (response.text or "").strip().replace("\n", " ")
-        raise RuntimeError(
-            f"Nordea GET failed url={url} params={params} status={response.status_code} "
-            f"content_type={response.headers.get('Content-Type', '')} body={body[:260]}"
-        )
+def http_get_json(
+    url: str,
+    headers: Dict[str, str],
+    params: Optional[Dict[str, str]] = None,
+    session: Optional[requests.Session] = None,
+) -> Any:
+    response = (session or requests).get(url, headers=headers, params=params, timeout=30)
+    raise_for_nordea_status(response, url, params)
     try:
         return response.json()
     except ValueError as exc:
@@ -282,7 +287,400 @@ def http_get_json(url: str, headers: Dict[str, str], params: Optional[Dict[str,
         ) from exc
 
 
-def load_live_transactions() -> Tuple[List[Dict[str, Any]], Dict[str, Any], str]:
+def transaction_path_cache_file() -> Path:
+    return Path(os.getenv("NORDEA_PATH_CACHE_PATH", "~/.cache/driftwatch/nordea_paths.json")).expanduser()
+
+
+# Where each endpoint's transaction array sits in its response, persisted so later syncs can stream pages.
+class TransactionPathCache:
+    def __init__(self, cache_file: Path) -> None:
+        self.cache_file = cache_file
+        self.paths: Optional[Dict[str, List[Any]]] = None
+        self.lock = threading.Lock()
+
+    def _loaded(self) -> Dict[str, List[Any]]:
+        if self.paths is None:
+            try:
+                stored = json.loads(self.cache_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                stored = {}
+            stored = stored if isinstance(stored, dict) else {}
+            self.paths = {key: value for key, value in stored.items() if isinstance(value, list)}
+        return self.paths
+
+    def get(self, endpoint: str) -> Optional[List[Any]]:
+        with self.lock:
+            return self._loaded().get(endpoint)
+
+    def remember(self, endpoint: str, path: Optional[Sequence[Any]]) -> None:
+        with self.lock:
+            paths = self._loaded()
+            if path is None:
+                paths.pop(endpoint, None)
+            else:
+                paths[endpoint] = list(path)
+            try:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                self.cache_file.write_text(json.dumps(paths), encoding="utf-8")
+            except OSError as exc:
+                log(f"nordea_sync could not persist transaction path cache reason={exc}")
+
+
+def restore_records(skeleton: Dict[str, Any], path: Sequence[Any], records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # A streamed page keeps only its pagination keys; the records go back where they were read from, or
+    # next to the skeleton with their path when that runs through an array.
+    if all(isinstance(key, str) for key in path) and path:
+        node = skeleton
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = records
+        return skeleton
+    return {**skeleton, "_transactions_path": list(path), "_transactions": records}
+
+
+def raise_for_nordea_status(response: requests.Response, url: str, params: Optional[Dict[str, str]]) -> None:
+    if response.status_code >= 400:
+        body = (response.text or "").strip().replace("\n", " ")
+        raise RuntimeError(
+            f"Nordea GET failed url={url} params={params} status={response.status_code} "
+            f"content_type={response.headers.get('Content-Type', '')} body={body[:260]}"
+        )
+
+
+def get_transaction_page(
+    session: requests.Session,
+    url: str,
+    headers: Dict[str, str],
+    params: Optional[Dict[str, str]],
+    endpoint: str,
+    from_date: date,
+    path_cache: TransactionPathCache,
+) -> Dict[str, Any]:
+    path = path_cache.get(endpoint)
+    if path is not None:
+        # Known layout: stream the array so only the transaction records are materialized.
+        response = session.get(url, headers=headers, params=params, timeout=30, stream=True)
+        try:
+            raise_for_nordea_status(response, url, params)
+            stream = JsonArrayStream(response.iter_content(chunk_size=65536), path)
+            tx_records = [tx for tx in stream if isinstance(tx, dict)]
+            return {
+                "payload": restore_records(stream.skeleton, path, tx_records),
+                "normalized": normalize_transactions(tx_records, from_date),
+                "records": len(tx_records),
+            }
+        except JsonPathNotFound:
+            log(f"nordea_sync cached transaction path {path} missing for endpoint={endpoint}; rediscovering")
+            path_cache.remember(endpoint, None)
+        finally:
+            response.close()
+
+    payload = http_get_json(url, headers=headers, params=params, session=session)
+    discovered, tx_records = pick_transaction_list_with_path(payload)
+    if discovered is not None:
+        path_cache.remember(endpoint, discovered)
+    return {
+        "payload": payload,
+        "normalized": normalize_transactions(tx_records, from_date),
+        "records": len(tx_records),
+    }
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate_per_second: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = max(rate_per_second, 0.001)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+def build_http_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def next_page_request(payload: Any, url: str) -> Optional[Tuple[str, Optional[Dict[str, str]]]]:
+    # Nordea responses carry either a "next" link or a continuation key, at the top level or under "response".
+    containers = [payload]
+    if isinstance(payload, dict) and isinstance(payload.get("response"), dict):
+        containers.append(payload["response"])
+    for container in containers:
+        if not isinstance(container, dict):
+            continue
+        for link in container.get("_links") or container.get("links") or []:
+            if isinstance(link, dict) and str(link.get("rel", "")).lower() == "next" and link.get("href"):
+                return urljoin(url, str(link["href"])), None
+        key = first_present(container, ["continuation_key", "continuationKey"])
+        if key:
+            return url, {"continuation_key": str(key)}
+    return None
+
+
+def normalize_transaction(tx: Dict[str, Any], from_date: date) -> Optional[Dict[str, Any]]:
+    ts = extract_timestamp(tx)
+    amount = extract_amount(tx)
+    if ts is None or amount is None or not math.isfinite(amount):
+        return None
+    if ts.date() < from_date:
+        return None
+    return {
+        "ts": ts,
+        "date": ts.date(),
+        "amount": float(amount),
+        "merchant": extract_merchant(tx),
+        "raw": tx,
+    }
+
+
+def parse_column(values: Sequence[Any], parse_uniques: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    # Booking dates, amounts and merchants repeat heavily within a batch, so each distinct value is parsed once.
+    column = np.empty(len(values), dtype=object)
+    column[:] = list(values)
+    try:
+        codes, uniques = pd.factorize(column)
+    except TypeError:
+        codes, uniques = np.arange(len(column)), column
+    parsed = np.empty(len(uniques) + 1, dtype=object)
+    parsed[:-1] = parse_uniques(uniques)
+    parsed[-1] = None
+    return parsed[codes]
+
+
+def first_parsed(
+    tx_records: Sequence[Dict[str, Any]],
+    keys: Sequence[str],
+    parse_uniques: Callable[[np.ndarray], np.ndarray],
+) -> np.ndarray:
+    result = np.empty(len(tx_records), dtype=object)
+    pending = np.arange(len(tx_records))
+    for key in keys:
+        if not len(pending):
+            break
+        resolved = parse_column([tx_records[index].get(key) for index in pending], parse_uniques)
+        hit = pd.notna(resolved)
+        result[pending[hit]] = resolved[hit]
+        pending = pending[~hit]
+    return result
+
+
+def parse_timestamp_uniques(uniques: np.ndarray) -> np.ndarray:
+    parsed = np.empty(len(uniques), dtype=object)
+    text_index = np.flatnonzero([isinstance(value, str) for value in uniques])
+    if len(text_index):
+        text = pd.Series(uniques[text_index], dtype=object)
+        # One format per batch column; values that do not fit it go through parse_datetime below.
+        fmt = "%Y-%m-%d" if DATE_ONLY_PATTERN.fullmatch(text.iat[0]) else "ISO8601"
+        converted = pd.to_datetime(text, utc=True, errors="coerce", format=fmt)
+        ok = converted.notna().to_numpy()
+        parsed[text_index[ok]] = converted[ok].array.to_pydatetime()
+    for index in np.flatnonzero(pd.isna(parsed)):
+        parsed[index] = parse_datetime(uniques[index])
+    return parsed
+
+
+def parse_amount_uniques(uniques: np.ndarray) -> np.ndarray:
+    parsed = np.empty(len(uniques), dtype=object)
+    text_index = np.flatnonzero([isinstance(value, str) for value in uniques])
+    if len(text_index):
+        cleaned = np.char.replace(np.char.strip(uniques[text_index].astype(str)), ",", ".")
+        numbers = pd.to_numeric(pd.Series(cleaned), errors="coerce").to_numpy(dtype=float)
+        ok = np.isfinite(numbers)
+        parsed[text_index[ok]] = numbers[ok]
+    for index in np.flatnonzero(pd.isna(parsed)):
+        parsed[index] = to_float(uniques[index])
+    return parsed
+
+
+def parse_merchant_uniques(uniques: np.ndarray) -> np.ndarray:
+    return np.array([value.strip() or None if isinstance(value, str) else None for value in uniques], dtype=object)
+
+
+def parse_indicator_uniques(uniques: np.ndarray) -> np.ndarray:
+    return np.array([str(value).upper() if value else None for value in uniques], dtype=object)
+
+
+def nested_amount(nested: Any) -> Any:
+    return (nested.get("amount") or nested.get("value")) if isinstance(nested, dict) else None
+
+
+def bulk_extract_amounts(tx_records: Sequence[Dict[str, Any]], present: Set[str]) -> np.ndarray:
+    amounts = np.array(first_parsed(tx_records, ["amount"] if "amount" in present else [], parse_amount_uniques), dtype=float)
+    missing = np.flatnonzero(np.isnan(amounts))
+    if len(missing) and "transactionAmount" in present:
+        nested_values = [nested_amount(tx_records[index].get("transactionAmount")) for index in missing]
+        amounts[missing] = np.array(parse_column(nested_values, parse_amount_uniques), dtype=float)
+
+    indicator_keys = [key for key in ("creditDebitIndicator", "credit_debit_indicator", "type") if key in present]
+    indicators = first_parsed(tx_records, indicator_keys, parse_indicator_uniques)
+    debit = np.isin(indicators, ["DBIT", "DEBIT"]) & (amounts > 0)
+    credit = np.isin(indicators, ["CRDT", "CREDIT"]) & (amounts < 0)
+    amounts[debit] = -amounts[debit]
+    amounts[credit] = np.abs(amounts[credit])
+    return amounts
+
+
+def normalize_transactions(tx_records: Iterable[Dict[str, Any]], from_date: date) -> List[Dict[str, Any]]:
+    records = list(tx_records)
+    if len(records) < BULK_NORMALIZE_MIN_RECORDS:
+        normalized = (normalize_transaction(tx, from_date) for tx in records)
+        return [item for item in normalized if item is not None]
+
+    # Keys absent from the whole batch are never probed record by record.
+    present = set().union(*(tx.keys() for tx in records))
+    timestamps = first_parsed(records, [key for key in TIMESTAMP_KEYS if key in present], parse_timestamp_uniques)
+    amounts = bulk_extract_amounts(records, present)
+    merchants = first_parsed(records, [key for key in MERCHANT_KEYS if key in present], parse_merchant_uniques)
+    result: List[Dict[str, Any]] = []
+    for tx, ts, amount, merchant in zip(records, timestamps, amounts.tolist(), merchants):
+        if ts is None or not math.isfinite(amount):
+            continue
+        day = ts.date()
+        if day < from_date:
+            continue
+        result.append({"ts": ts, "date": day, "amount": amount, "merchant": merchant or "unknown", "raw": tx})
+    return result
+
+
+def fetch_account_transactions(
+    session: requests.Session,
+    api_base: str,
+    account_id: str,
+    headers: Dict[str, str],
+    from_date: date,
+    to_date: date,
+    limiter: TokenBucket,
+    path_cache: TransactionPathCache,
+    max_pages: int = 50,
+) -> Dict[str, Any]:
+    started = time.monotonic()
+    transactions_url = f"{api_base}/accounts/{account_id}/transactions"
+    endpoint = f"{api_base}/accounts/{{account_id}}/transactions"
+
+    # The first page settles which date parameter style the API accepts; later pages follow its links.
+    page_result: Optional[Dict[str, Any]] = None
+    base_params: Optional[Dict[str, str]] = None
+    attempts = [
+        {"fromDate": from_date.isoformat(), "toDate": to_date.isoformat()},
+        {"dateFrom": from_date.isoformat(), "dateTo": to_date.isoformat()},
+        None,
+    ]
+    last_error: Optional[Exception] = None
+    for params in attempts:
+        try:
+            limiter.acquire()
+            page_result = get_transaction_page(session, transactions_url, headers, params, endpoint, from_date, path_cache)
+            base_params = params
+            break
+        except Exception as exc:  # noqa: BLE001
+            last_error = exc
+    if page_result is None:
+        raise RuntimeError(f"Live read: failed to fetch transactions for account {account_id}. Last error: {last_error}")
+
+    payloads = [page_result["payload"]]
+    normalized = list(page_result["normalized"])
+    records = page_result["records"]
+    seen_pages = set()
+    page = next_page_request(page_result["payload"], transactions_url)
+    while page and len(payloads) < max_pages:
+        page_url, page_params = page
+        marker = (page_url, tuple(sorted((page_params or {}).items())))
+        if marker in seen_pages:
+            break
+        seen_pages.add(marker)
+        params = {**(base_params or {}), **page_params} if page_params is not None else None
+        limiter.acquire()
+        page_result = get_transaction_page(session, page_url, headers, params, endpoint, from_date, path_cache)
+        payloads.append(page_result["payload"])
+        normalized.extend(page_result["normalized"])
+        records += page_result["records"]
+        page = next_page_request(page_result["payload"], page_url)
+
+    return {
+        "account_id": account_id,
+        "transactions_endpoint": transactions_url,
+        "payloads": payloads,
+        "normalized": normalized,
+        "pages": len(payloads),
+        "records": records,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def select_live_accounts(accounts: List[Dict[str, Any]]) -> List[str]:
+    preferred = [item.strip() for item in os.getenv("NORDEA_ACCOUNT_ID", "").split(",") if item.strip()]
+    available = [account_id for account_id in (account_id_of(account) for account in accounts) if account_id]
+    if preferred:
+        missing = [account_id for account_id in preferred if account_id not in available]
+        if missing:
+            raise RuntimeError(f"Live read: NORDEA_ACCOUNT_ID={','.join(missing)} not found in account list.")
+        return preferred
+    if not available:
+        raise RuntimeError("Live read: accounts are missing accountId/id/resourceId.")
+    return available
+
+
+def fetch_accounts_concurrently(
+    api_base: str,
+    account_ids: List[str],
+    headers: Dict[str, str],
+    from_dates: Dict[str, date],
+    to_date: date,
+    path_cache: Optional[TransactionPathCache] = None,
+) -> List[Dict[str, Any]]:
+    concurrency = max(1, int(os.getenv("NORDEA_FETCH_CONCURRENCY", "4")))
+    path_cache = path_cache or TransactionPathCache(transaction_path_cache_file())
+    limiter = TokenBucket(
+        rate_per_second=float(os.getenv("NORDEA_RATE_LIMIT_PER_SECOND", "5")),
+        capacity=int(os.getenv("NORDEA_RATE_LIMIT_BURST", str(concurrency))),
+    )
+    max_pages = int(os.getenv("NORDEA_MAX_PAGES", "50"))
+    with build_http_session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(
+                fetch_account_transactions,
+                session,
+                api_base,
+                account_id,
+                headers,
+                from_dates[account_id],
+                to_date,
+                limiter,
+                path_cache,
+                max_pages,
+            )
+            for account_id in account_ids
+        ]
+        return [future.result() for future in futures]
+
+
+def load_live_transactions(
+    history_days: int = 30,
+    domain: str = "nordea",
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], str]:
     cfg = load_nordea_config()
     validate_sandbox_bypass(cfg)
 
@@ -301,78 +699,69 @@ def load_live_transactions() -> Tuple[List[Dict[str, Any]], Dict[str, Any], str]
     accounts = pick_account_list(accounts_payload)
     if not accounts:
         raise RuntimeError("Live read: no accounts returned from Nordea.")
-
-    preferred_account = os.getenv("NORDEA_ACCOUNT_ID", "").strip()
-    account = None
-    if preferred_account:
-        for candidate in accounts:
-            if account_id_of(candidate) == preferred_account:
-                account = candidate
-                break
-        if not account:
-            raise RuntimeError(f"Live read: NORDEA_ACCOUNT_ID={preferred_account} not found in account list.")
-    else:
-        account = accounts[0]
-
-    account_id = account_id_of(account)
-    if not account_id:
-        raise RuntimeError("Live read: selected account is missing accountId/id/resourceId.")
+    account_ids = select_live_accounts(accounts)
 
     to_date = datetime.now(timezone.utc).date()
-    from_date = to_date - timedelta(days=30)
-    transactions_url = f"{api_base}/accounts/{account_id}/transactions"
-
-    tx_payload: Any = None
-    attempts = [
-        {"fromDate": from_date.isoformat(), "toDate": to_date.isoformat()},
-        {"dateFrom": from_date.isoformat(), "dateTo": to_date.isoformat()},
-        None,
-    ]
-    last_error: Optional[Exception] = None
-    for params in attempts:
-        try:
-            tx_payload = http_get_json(transactions_url, headers=headers, params=params)
-            break
-        except Exception as exc:  # noqa: BLE001
-            last_error = exc
-    if tx_payload is None:
-        raise RuntimeError(f"Live read: failed to fetch transactions. Last error: {last_error}")
-
-    tx_records = pick_transaction_list(tx_payload)
-    if not tx_records:
-        raise RuntimeError("Live read: transactions payload did not contain parsable transaction records.")
-
-    normalized: List[Dict[str, Any]] = []
-    for tx in tx_records:
-        ts = extract_timestamp(tx)
-        amount = extract_amount(tx)
-        if ts is None or amount is None:
-            continue
-        if ts.date() < from_date:
-            continue
-        normalized.append(
-            {
-                "ts": ts,
-                "date": ts.date(),
-                "amount": float(amount),
-                "merchant": extract_merchant(tx),
-                "raw": tx,
-            }
+    # The feature windows need history_days of transactions, so a fetch never starts later than that.
+    history_start = to_date - timedelta(days=max(history_days, 1))
+    lookback_start = to_date - timedelta(days=max(history_days, int(os.getenv("NORDEA_SYNC_LOOKBACK_DAYS", "30"))))
+    store = open_transaction_store(domain) if env_bool("NORDEA_INCREMENTAL_SYNC", default=True) else None
+
+    # With a store, each account resumes from its watermark day (inclusive; the store dedupes the overlap),
+    # unless earlier fetches never reached back to history_start: then the whole lookback is fetched again.
+    from_dates: Dict[str, date] = {}
+    for account_id in account_ids:
+        watermark = store.watermark_date(account_id) if store else None
+        covered = store.fetched_since(account_id) if store else None
+        backfilled = covered is not None and covered <= history_start
+        from_dates[account_id] = max(watermark, lookback_start) if watermark and backfilled else lookback_start
+    fetched = fetch_accounts_concurrently(api_base, account_ids, headers, from_dates, to_date)
+
+    new_counts: Dict[str, int] = {}
+    if store:
+        new_raw: Dict[str, List[Any]] = {}
+        for result in fetched:
+            appended = store.append(result["account_id"], result["normalized"])
+            store.record_fetch(result["account_id"], from_dates[result["account_id"]])
+            new_counts[result["account_id"]] = len(appended)
+            new_raw[result["account_id"]] = [tx.get("raw") for tx in appended]
+        normalized = store.load_transactions(account_ids, since=history_start, until=to_date)
+        raw_transactions: Dict[str, Any] = new_raw
+    else:
+        normalized = sorted(
+            (tx for result in fetched for tx in result["normalized"]),
+            key=lambda tx: tx["ts"],
         )
-
+        raw_transactions = {result["account_id"]: result["payloads"] for result in fetched}
     if not normalized:
-        raise RuntimeError("Live read: no valid transactions in last 30 days after normalization.")
+        raise RuntimeError("Live read: no valid transactions after normalization.")
+
+    timings = [
+        {
+            **{key: result[key] for key in ("account_id", "pages", "records", "seconds")},
+            "from_date": from_dates[result["account_id"]].isoformat(),
+            "new_transactions": new_counts.get(result["account_id"]),
+        }
+        for result in fetched
+    ]
+    for timing in timings:
+        log(
+            "nordea_sync account fetched "
+            f"account_id={timing['account_id']} from={timing['from_date']} pages={timing['pages']} "
+            f"records={timing['records']} new={timing['new_transactions']} seconds={timing['seconds']}"
+        )
 
     raw_bundle = {
         "fetched_at": now_iso(),
         "accounts_endpoint": accounts_url,
-        "transactions_endpoint": transactions_url,
-        "account_id": account_id,
+        "account_ids": account_ids,
         "accounts": accounts_payload,
-        "transactions": tx_payload,
+        "incremental": store is not None,
+        "transactions": raw_transactions,
+        "account_timings": timings,
         "normalized_count": len(normalized),
     }
-    return normalized, raw_bundle, account_id
+    return normalized, raw_bundle, ",".join(account_ids)
 
 
 def generate_synthetic_transactions(scenario: str, seed: Optional[int], days: int = 60) -> List[Dict[str, Any]]:
@@ -464,174 +853,192 @@ def generate_synthetic_transactions(scenario: str, seed: Optional[int], days: in
     return transactions
 
 
-def safe_entropy(counts: Iterable[float]) -> float:
-    values = [v for v in counts if v > 0]
-    total = sum(values)
-    if total <= 0:
-        return 0.0
-    entropy = 0.0
-    for value in values:
-        p = value / total
-        entropy -= p * math.log(p)
-    return entropy / math.log(7) if len(values) > 1 else 0.0
-
-
-def compute_features_for_anchor(transactions: List[Dict[str, Any]], anchor_day: date) -> Dict[str, float]:
-    window_start = anchor_day - timedelta(days=29)
-    window_tx = [tx for tx in transactions if window_start <= tx["date"] <= anchor_day]
-    if not window_tx:
-        return {column: 0.0 for column in FEATURE_COLUMNS}
-
-    spend_tx = [tx for tx in window_tx if tx["amount"] < 0]
-    income_tx = [tx for tx in window_tx if tx["amount"] > 0]
-    total_spend = sum(abs(tx["amount"]) for tx in spend_tx)
-    total_income = sum(tx["amount"] for tx in income_tx)
-
-    rent_spend = 0.0
-    merchant_spend: Dict[str, float] = defaultdict(float)
-    subscription_merchants = set()
-
-    for tx in spend_tx:
-        merchant = tx["merchant"].lower()
-        merchant_spend[merchant] += abs(tx["amount"])
-        if any(hint in merchant for hint in RENT_HINTS):
-            rent_spend += abs(tx["amount"])
-        if any(hint in merchant for hint in SUBSCRIPTION_HINTS):
-            subscription_merchants.add(merchant)
-
-    top_merchant_share = max(merchant_spend.values()) / total_spend if total_spend > 0 else 0.0
-
-    recent_start = anchor_day - timedelta(days=6)
-    txn_count_7d = sum(1 for tx in window_tx if recent_start <= tx["date"] <= anchor_day)
-
-    avg_txn_amount_30d = (
-        sum(abs(tx["amount"]) for tx in window_tx) / len(window_tx) if window_tx else 0.0
-    )
-
-    weekday_spend = [0.0] * 7
-    for tx in spend_tx:
-        weekday_spend[tx["date"].weekday()] += abs(tx["amount"])
-
-    merchant_diversity = len({tx["merchant"].lower() for tx in window_tx}) / len(window_tx) if window_tx else 0.0
-
-    features = {
-        "daily_spend_30d": total_spend / 30.0,
-        "daily_income_30d": total_income / 30.0,
-        "rent_ratio": rent_spend / total_spend if total_spend > 0 else 0.0,
-        "subscription_count": float(len(subscription_merchants)),
-        "top_merchant_share": top_merchant_share,
-        "txn_count_7d": float(txn_count_7d),
-        "avg_txn_amount_30d": avg_txn_amount_30d,
-        "weekday_spend_entropy": safe_entropy(weekday_spend),
-        "cashflow_ratio_30d": total_income / total_spend if total_spend > 0 else 0.0,
-        "merchant_diversity_30d": merchant_diversity,
-    }
-    return features
+def compute_features_for_anchor(
+    transactions: List[Dict[str, Any]], anchor_day: date, features: Optional[Sequence[str]] = None
+) -> Dict[str, float]:
+    return compute_feature_rows(transactions, [anchor_day], features)[0]
 
 
-def build_feature_batch(transactions: List[Dict[str, Any]], rows: int = 100) -> pd.DataFrame:
+def feature_anchor_days(transactions: List[Dict[str, Any]], rows: int = 100) -> List[date]:
     latest_day = max(tx["date"] for tx in transactions)
-    anchors = [latest_day - timedelta(days=offset) for offset in range(rows - 1, -1, -1)]
-    feature_rows = [compute_features_for_anchor(transactions, anchor_day) for anchor_day in anchors]
-    frame = pd.DataFrame(feature_rows, columns=FEATURE_COLUMNS)
-    frame = frame.fillna(0.0)
-    return frame
+    return [latest_day - timedelta(days=offset) for offset in range(rows - 1, -1, -1)]
 
 
-def load_mock_features() -> pd.DataFrame:
-    return pd.read_csv(Path("data/demo/current.csv"))
+def build_feature_batch(
+    transactions: List[Dict[str, Any]],
+    rows: int = 100,
+    features: Optional[Sequence[str]] = None,
+    horizons: Optional[Sequence[int]] = None,
+) -> pd.DataFrame:
+    anchors = feature_anchor_days(transactions, rows)
+    plan = plan_features(features)
+    timeline = Timeline(transactions)
+    frame = pd.DataFrame([plan.evaluate(timeline, anchor_day) for anchor_day in anchors], columns=plan.columns)
+    # The 30-day horizon columns share names with the registry features, which keep precedence.
+    horizon_values = compute_horizon_features(timeline, anchors, default_horizons() if horizons is None else horizons)
+    frame = frame.assign(**{name: values for name, values in horizon_values.items() if name not in frame.columns})
+    return apply_feature_dtypes(frame.fillna(0.0))
 
 
-def build_batch_from_synthetic(scenario: str, rows: int, seed: Optional[int]) -> pd.DataFrame:
-    tx = generate_synthetic_transactions(scenario=scenario, seed=seed, days=max(rows + 45, 90))
-    return build_feature_batch(tx, rows=rows)
+def synthetic_history_days(rows: int, horizons: Sequence[int] = ()) -> int:
+    return max(rows + longest_window(horizons) + 15, 90)
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--domain", default="nordea")
-    parser.add_argument("--baseline-version", default="v1")
-    parser.add_argument("--batch-id", default=f"manual-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}")
-    parser.add_argument("--scenario", default="stable_salary", choices=sorted(SCENARIOS.keys()))
-    parser.add_argument("--rows", type=int, default=100)
-    parser.add_argument("--seed", type=int, default=None)
-    args = parser.parse_args()
-
-    supabase = get_supabase()
-    domains = supabase.select("domains", select="id,key", filters={"key": f"eq.{args.domain}"}, limit=1)
-    if not domains:
-        raise RuntimeError("Domain not found")
-    domain = domains[0]
-
+def load_mock_features() -> pd.DataFrame:
+    return read_feature_csv(Path("data/demo/current.csv"))
+
+
+def build_batch_from_synthetic(
+    scenario: str, rows: int, seed: Optional[int], horizons: Optional[Sequence[int]] = None
+) -> pd.DataFrame:
+    horizons = default_horizons() if horizons is None else horizons
+    tx = generate_synthetic_transactions(scenario=scenario, seed=seed, days=synthetic_history_days(rows, horizons))
+    return build_feature_batch(tx, rows=rows, horizons=horizons)
+
+
+def build_segmented_synthetic_batch(
+    scenarios: Sequence[str], rows: int, seed: Optional[int], horizons: Optional[Sequence[int]] = None
+) -> Tuple[pd.DataFrame, List[date]]:
+    # One population per scenario, labelled in the segment column; seeds are offset per scenario so a
+    # seeded mixed batch is reproducible without the cohorts sharing a draw.
+    horizons = default_horizons() if horizons is None else horizons
+    frames: List[pd.DataFrame] = []
+    anchor_days: List[date] = []
+    for offset, scenario in enumerate(scenarios):
+        if scenario not in SCENARIOS:
+            raise RuntimeError(f"Unknown scenario '{scenario}'. Valid: {sorted(SCENARIOS)}")
+        tx = generate_synthetic_transactions(
+            scenario=scenario,
+            seed=None if seed is None else seed + offset,
+            days=synthetic_history_days(rows, horizons),
+        )
+        frames.append(build_feature_batch(tx, rows=rows, horizons=horizons).assign(**{SEGMENT_COLUMN: scenario}))
+        anchor_days.extend(feature_anchor_days(tx, rows=rows))
+    return pd.concat(frames, ignore_index=True), anchor_days
+
+
+def collect_sync_batch(
+    domain: str,
+    batch_id: str,
+    scenario: str,
+    rows: int,
+    seed: Optional[int],
+    horizons: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    horizons = default_horizons() if horizons is None else horizons
     live_read_enabled = env_bool("NORDEA_LIVE_READ", default=False)
-    source_mode = "synthetic"
-    source_reason = "Synthetic scenario mode"
-    live_account_id = ""
-    raw_storage_uri = ""
-    scenario_used = args.scenario
+    batch: Dict[str, Any] = {
+        "batch_id": batch_id,
+        "source_mode": "synthetic",
+        "source_reason": "Synthetic scenario mode",
+        "scenario": scenario,
+        "anchor_days": None,
+        "raw_bundle": None,
+        "account_id": "",
+    }
 
-    current_df: pd.DataFrame
     if live_read_enabled:
         try:
-            transactions, raw_bundle, live_account_id = load_live_transactions()
-            current_df = build_feature_batch(transactions, rows=args.rows)
-            source_mode = "live"
-            scenario_used = "live_transactions"
-            source_reason = f"Loaded {len(transactions)} transactions from Nordea sandbox."
-            raw_storage_uri = supabase.upload_bytes(
-                "driftwatch-artifacts",
-                f"raw/nordea/{args.batch_id}.json",
-                json.dumps(raw_bundle, ensure_ascii=True, indent=2).encode("utf-8"),
-                "application/json",
+            transactions, raw_bundle, live_account_id = load_live_transactions(
+                history_days=rows + longest_window(horizons) - 1,
+                domain=domain,
+            )
+            batch.update(
+                frame=build_feature_batch(transactions, rows=rows, horizons=horizons),
+                anchor_days=feature_anchor_days(transactions, rows=rows),
+                source_mode="live",
+                scenario="live_transactions",
+                source_reason=f"Loaded {len(transactions)} transactions from Nordea sandbox.",
+                raw_bundle=raw_bundle,
+                account_id=live_account_id,
             )
             log(f"nordea_sync source_mode=live account_id={live_account_id} tx_count={len(transactions)}")
         except Exception as exc:  # noqa: BLE001
-            source_mode = "mock_fallback"
-            source_reason = f"Live read failed; fallback to synthetic. reason={exc}"
+            batch.update(
+                source_mode="mock_fallback",
+                source_reason=f"Live read failed; fallback to synthetic. reason={exc}",
+            )
             log(f"nordea_sync source_mode=mock_fallback reason={exc}")
-            current_df = build_batch_from_synthetic(args.scenario, rows=args.rows, seed=args.seed)
+            batch["frame"] = build_batch_from_synthetic(scenario, rows=rows, seed=seed, horizons=horizons)
     else:
-        source_reason = "NORDEA_LIVE_READ disabled"
+        batch["source_reason"] = "NORDEA_LIVE_READ disabled"
         log("nordea_sync source_mode=synthetic reason=NORDEA_LIVE_READ disabled")
-        current_df = build_batch_from_synthetic(args.scenario, rows=args.rows, seed=args.seed)
-
-    if current_df.empty:
-        current_df = load_mock_features()
-        source_mode = "mock_fallback"
-        source_reason = "Generated empty synthetic dataset; fallback to demo current.csv"
-
-    schema_hash = compute_schema_hash(current_df)
-
-    storage_uri = supabase.upload_bytes(
-        "driftwatch-artifacts",
-        f"feature-batches/{args.domain}/{args.batch_id}.csv",
-        current_df.to_csv(index=False).encode("utf-8"),
-        "text/csv",
-    )
+        batch["frame"] = build_batch_from_synthetic(scenario, rows=rows, seed=seed, horizons=horizons)
+
+    if batch["frame"].empty:
+        batch.update(
+            frame=load_mock_features(),
+            anchor_days=None,
+            source_mode="mock_fallback",
+            source_reason="Generated empty synthetic dataset; fallback to demo current.csv",
+        )
+    return batch
+
+
+def publish_sync_batch(supabase, domain_id: str, domain: str, batch: Dict[str, Any]) -> Dict[str, Any]:
+    batch_id = batch["batch_id"]
+    current_df = batch["frame"]
+    if batch["raw_bundle"] is not None:
+        batch["raw_storage_uri"] = upload_artifact(
+            supabase,
+            "driftwatch-artifacts",
+            f"raw/nordea/{batch_id}.json",
+            [json.dumps(batch["raw_bundle"], ensure_ascii=True, separators=(",", ":"), default=str).encode("utf-8")],
+            "application/json",
+            codec=artifact_codec(),
+        )
 
-    # Legacy compatibility path for existing readers.
-    supabase.upload_bytes(
+    # "current" is the legacy compatibility path for existing readers.
+    storage_uri, segment_stats = upload_feature_batch(
+        supabase,
         "driftwatch-artifacts",
-        f"feature-batches/{args.domain}/current.csv",
-        current_df.to_csv(index=False).encode("utf-8"),
-        "text/csv",
+        domain,
+        batch_id,
+        current_df,
+        anchor_days=batch["anchor_days"],
+        aliases=("current",),
     )
+    if segment_stats:
+        log(f"nordea_sync segmented batch rows={segment_stats['rows']} new_rows={segment_stats['new_rows']}")
 
-    supabase.upsert(
+    rows = supabase.upsert(
         "feature_batches",
         [
             {
-                "domain_id": domain["id"],
-                "batch_id": args.batch_id,
-                "scenario": scenario_used,
+                "domain_id": domain_id,
+                "batch_id": batch_id,
+                "scenario": batch["scenario"],
                 "row_count": len(current_df),
                 "storage_uri": storage_uri,
-                "schema_hash": schema_hash,
-                "source_mode": source_mode,
+                "schema_hash": compute_schema_hash(current_df),
+                "source_mode": batch["source_mode"],
             }
         ],
         on_conflict="domain_id,batch_id",
     )
+    return rows[0]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--domain", default="nordea")
+    parser.add_argument("--baseline-version", default="v1")
+    parser.add_argument("--batch-id", default=f"manual-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}")
+    parser.add_argument("--scenario", default="stable_salary", choices=sorted(SCENARIOS.keys()))
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--horizons", default=None, help=HORIZONS_HELP)
+    args = parser.parse_args(argv)
+
+    supabase = get_supabase()
+    domains = supabase.select("domains", select="id,key", filters={"key": f"eq.{args.domain}"}, limit=1)
+    if not domains:
+        raise RuntimeError("Domain not found")
+    domain = domains[0]
+
+    horizons = resolve_horizons(args.horizons)
+    batch = collect_sync_batch(args.domain, args.batch_id, args.scenario, args.rows, args.seed, horizons)
+    publish_sync_batch(supabase, domain["id"], args.domain, batch)
 
     supabase.update(
         "domains",
@@ -641,9 +1048,9 @@ def main() -> None:
 
     log(
         "sync completed "
-        f"domain={args.domain} batch_id={args.batch_id} scenario={scenario_used} "
-        f"mode={source_mode} rows={len(current_df)} reason={source_reason} "
-        f"raw_uri={raw_storage_uri or 'none'} account_id={live_account_id or 'n/a'}"
+        f"domain={args.domain} batch_id={args.batch_id} scenario={batch['scenario']} "
+        f"mode={batch['source_mode']} rows={len(batch['frame'])} reason={batch['source_reason']} "
+        f"raw_uri={batch.get('raw_storage_uri') or 'none'} account_id={batch['account_id'] or 'n/a'}"
     )
 
 
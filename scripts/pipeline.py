@@ -0,0 +1,130 @@
+import argparse
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import monitor_run
+from common import get_supabase, log
+from feature_drift import ReferenceColumns
+from feature_registry import HORIZONS_HELP, resolve_horizons
+from nordea_sync import SCENARIOS, collect_sync_batch, publish_sync_batch
+from train_model import (
+    BaselineSpec,
+    baseline_artifact_uris,
+    baseline_record,
+    build_training_frames,
+    publish_baselines,
+    train_baseline,
+)
+
+
+# Runs ingest -> (optional) baseline refresh -> monitor in one process. Frames and models are handed
+# to the monitor in memory; batch, baseline and model artifacts are written by a background pool so
+# audit persistence overlaps with drift computation instead of preceding it.
+def run_pipeline(
+    supabase,
+    args: argparse.Namespace,
+    monitor_args: argparse.Namespace,
+    persist_workers: int = 2,
+) -> Dict[str, Any]:
+    timings: Dict[str, float] = {}
+    domain_id = monitor_run.get_domain_id(supabase, args.domain)
+
+    with ThreadPoolExecutor(max_workers=persist_workers, thread_name_prefix="persist") as persist:
+        started = time.perf_counter()
+        horizons = resolve_horizons(args.horizons)
+        batch = collect_sync_batch(args.domain, args.batch_id, args.scenario, args.rows, args.seed, horizons)
+        feature_batch_row: Future = persist.submit(publish_sync_batch, supabase, domain_id, args.domain, batch)
+        timings["ingest"] = time.perf_counter() - started
+
+        models: Dict[str, Any] = {}
+        baseline_row: Optional[Future] = None
+        if args.refresh_baseline:
+            started = time.perf_counter()
+            spec = BaselineSpec(
+                baseline_version=args.baseline_version,
+                scenario=args.baseline_scenario,
+                seed=args.baseline_seed,
+                rows=args.baseline_rows,
+            )
+            frames = build_training_frames(spec.scenario, spec.seed, [spec.rows], horizons)
+            trained = train_baseline(spec, frames[spec.rows])
+            baseline_uri, model_uri = baseline_artifact_uris(supabase, args.domain, args.baseline_version)
+            baseline = baseline_record(domain_id, trained, baseline_uri, model_uri)
+            baseline_row = persist.submit(
+                lambda: publish_baselines(supabase, args.domain, domain_id, [trained])[0]["baseline"]
+            )
+            reference = ReferenceColumns(trained.baseline_df)
+            models[args.baseline_version] = trained.model
+            baseline_source = "pipeline.trained"
+            timings["baseline"] = time.perf_counter() - started
+        else:
+            baseline, reference, baseline_source = monitor_run.load_baseline_dataframe(
+                supabase=supabase,
+                domain_id=domain_id,
+                domain_key=args.domain,
+                baseline_version=args.baseline_version,
+            )
+
+        started = time.perf_counter()
+        run_id = str(uuid.uuid4())
+        inputs = monitor_run.RunInputs(
+            baseline=baseline,
+            reference=reference,
+            baseline_source=baseline_source,
+            current_df=batch["frame"],
+            current_source=f"pipeline:{args.batch_id}",
+            models=models,
+            baseline_row=baseline_row,
+            feature_batch_row=feature_batch_row,
+        )
+        with monitor_run.insert_owned_run(supabase, monitor_run.new_run_record(run_id, domain_id, monitor_args)) as lease:
+            status = monitor_run.execute_run(supabase, run_id, domain_id, monitor_args, lease=lease, inputs=inputs)
+        timings["monitor"] = time.perf_counter() - started
+
+        # Leaving the pool waits for any persistence still in flight; a failed write raises here.
+        started = time.perf_counter()
+        feature_batch_row.result()
+        if baseline_row is not None:
+            baseline_row.result()
+    timings["persist_wait"] = time.perf_counter() - started
+
+    log(
+        f"pipeline completed run={run_id} drift_status={status} "
+        + " ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items())
+    )
+    return {"run_id": run_id, "drift_status": status, "timings": timings}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Ingest, optionally refresh the baseline, and monitor in one process. "
+        "Unrecognised options are passed to monitor_run (e.g. --drift-engine native)."
+    )
+    parser.add_argument("--domain", default="nordea")
+    parser.add_argument("--baseline-version", default="v1")
+    parser.add_argument("--batch-id", default=f"pipeline-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}")
+    parser.add_argument("--scenario", default="stable_salary", choices=sorted(SCENARIOS.keys()))
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--horizons", default=None, help=HORIZONS_HELP)
+    parser.add_argument("--refresh-baseline", action="store_true", help="Retrain the baseline before monitoring.")
+    parser.add_argument("--baseline-scenario", default="stable_salary", choices=sorted(SCENARIOS.keys()))
+    parser.add_argument("--baseline-rows", type=int, default=200)
+    parser.add_argument("--baseline-seed", type=int, default=42)
+    parser.add_argument("--persist-workers", type=int, default=2)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args, monitor_argv = build_parser().parse_known_args(argv)
+    monitor_args = monitor_run.build_parser().parse_args(
+        [*monitor_argv, "--domain", args.domain, "--baseline-version", args.baseline_version, "--batch-id", args.batch_id]
+    )
+    run_pipeline(get_supabase(), args, monitor_args, persist_workers=args.persist_workers)
+
+
+if __name__ == "__main__":
+    main()
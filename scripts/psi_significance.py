@@ -0,0 +1,185 @@
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from drift_stats import baseline_block_masks, circular_blocks, compute_psi_matrix
+from feature_drift import ReferenceColumns
+from feature_registry import WINDOW_DAYS, default_horizons, longest_window
+from segment_drift import baseline_segment_sketch, bin_matrix, grouped_histograms, proportions
+
+
+CI_LEVEL = 0.95
+# Resamples drawn per block phase; each phase re-cuts both samples into blocks at a random offset.
+PHASE_RESAMPLES = 250
+
+
+def default_psi_resamples() -> int:
+    return int(os.getenv("DRIFTWATCH_PSI_RESAMPLES", "1000"))
+
+
+def default_psi_alpha() -> float:
+    return float(os.getenv("DRIFTWATCH_PSI_ALPHA", "0"))
+
+
+def default_psi_block_rows() -> int:
+    # Feature rows are consecutive anchor days whose windows overlap, so rows closer than the longest
+    # window are strongly correlated; blocks of at least that many rows keep the dependence together.
+    return int(os.getenv("DRIFTWATCH_PSI_BLOCK_ROWS", str(longest_window(default_horizons()))))
+
+
+def histogram(bins: np.ndarray, width: int) -> np.ndarray:
+    return grouped_histograms(bins, np.zeros(len(bins), dtype=np.int64), 1, width)[0]
+
+
+def block_histograms(bins: np.ndarray, width: int, size: int, phase: int) -> np.ndarray:
+    # Histograms of the circular blocks: (blocks, columns, width).
+    rows, blocks = circular_blocks(len(bins), size, phase)
+    return grouped_histograms(bins[rows], blocks, int(blocks[-1]) + 1, width)
+
+
+def bootstrap_counts(blocks: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    # `count` moving-block resamples: as many blocks as the sample holds, drawn with replacement.
+    n_blocks = len(blocks)
+    picks = rng.integers(0, n_blocks, size=(count, n_blocks)) + n_blocks * np.arange(count)[:, None]
+    draws = np.bincount(picks.ravel(), minlength=count * n_blocks).reshape(count, n_blocks)
+    # Float operands keep the product on BLAS; the counts stay exact well past any batch size.
+    return (draws.astype(float) @ blocks.reshape(n_blocks, -1).astype(float)).reshape((count,) + blocks.shape[1:])
+
+
+def permuted_counts(
+    reference_blocks: np.ndarray, current_blocks: np.ndarray, count: int, rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    # `count` relabellings of the pooled block histograms into baseline- and current-sized sets.
+    pooled = np.concatenate([reference_blocks, current_blocks])
+    flat = pooled.reshape(len(pooled), -1).astype(float)
+    masks = baseline_block_masks(len(reference_blocks), len(pooled), count, rng)
+    reference_counts = masks.astype(float) @ flat
+    shape = (count,) + pooled.shape[1:]
+    return reference_counts.reshape(shape), (flat.sum(axis=0) - reference_counts).reshape(shape)
+
+
+def psi_significance(
+    reference_bins: np.ndarray,
+    current_bins: np.ndarray,
+    width: int,
+    resamples: int,
+    rng: np.random.Generator,
+    valid: Optional[np.ndarray] = None,
+    block_rows: int = WINDOW_DAYS,
+) -> Dict[str, np.ndarray]:
+    # Per column: the observed PSI; a percentile interval from a moving-block bootstrap of the current rows
+    # against the fixed baseline; and a p-value from block permutations of the pooled rows, i.e. PSI with
+    # no drift at the same sample sizes, baseline noise included. Both sides share one block size, so their
+    # blocks are exchangeable under no drift.
+    expected = proportions(histogram(reference_bins, width))
+    observed = compute_psi_matrix(expected, proportions(histogram(current_bins, width)), valid)
+    size = max(1, min(block_rows, len(reference_bins), len(current_bins)))
+
+    boot, null = [], []
+    for start in range(0, resamples, PHASE_RESAMPLES):
+        count = min(PHASE_RESAMPLES, resamples - start)
+        reference_blocks = block_histograms(reference_bins, width, size, int(rng.integers(size)))
+        current_blocks = block_histograms(current_bins, width, size, int(rng.integers(size)))
+        boot.append(compute_psi_matrix(expected, proportions(bootstrap_counts(current_blocks, count, rng)), valid))
+        reference_counts, current_counts = permuted_counts(reference_blocks, current_blocks, count, rng)
+        null.append(compute_psi_matrix(proportions(reference_counts), proportions(current_counts), valid))
+    boot_psi, null_psi = np.concatenate(boot), np.concatenate(null)
+    tail = (1.0 - CI_LEVEL) / 2
+    return {
+        "psi": observed,
+        "p_value": (1 + (null_psi >= observed - 1e-12).sum(axis=0)) / (resamples + 1),
+        "ci_low": np.quantile(boot_psi, tail, axis=0),
+        "ci_high": np.quantile(boot_psi, 1 - tail, axis=0),
+    }
+
+
+def score_bins(scores: np.ndarray, bin_edges: np.ndarray) -> np.ndarray:
+    index = np.searchsorted(bin_edges, scores, side="right") - 1
+    return np.clip(index, 0, len(bin_edges) - 2)[:, None]
+
+
+def prediction_psi_significance(
+    expected: np.ndarray,
+    bin_edges: np.ndarray,
+    scores: np.ndarray,
+    baseline_rows: int,
+    resamples: int,
+    rng: np.random.Generator,
+    block_rows: Optional[int] = None,
+) -> Dict[str, float]:
+    # The baseline keeps only its score histogram, which is expanded back to per-row bin ids. Its row order
+    # is lost, so the rows are shuffled and its blocks are plain random samples of the baseline.
+    baseline_counts = np.rint(expected / max(expected.sum(), 1e-12) * baseline_rows).astype(np.int64)
+    reference_bins = rng.permutation(np.repeat(np.arange(len(expected)), baseline_counts))[:, None]
+    current_bins = score_bins(scores, bin_edges)
+    block_rows = block_rows or default_psi_block_rows()
+    result = psi_significance(reference_bins, current_bins, len(expected), resamples, rng, block_rows=block_rows)
+    return {key: float(values[0]) for key, values in result.items()}
+
+
+def feature_psi_significance(
+    reference: ReferenceColumns,
+    current_df: pd.DataFrame,
+    resamples: int,
+    rng: np.random.Generator,
+    block_rows: Optional[int] = None,
+) -> Dict[str, Dict[str, float]]:
+    # Binned on the same baseline quantile edges as segment drift; every column shares the same blocks and
+    # block draws, so all features are resampled in one pass.
+    sketch = reference.derived(("segment_sketch", ""), lambda: baseline_segment_sketch(reference, ""))
+    columns, width = sketch["columns"], sketch["width"]
+    if not columns or current_df.empty:
+        return {}
+    reference_bins = reference.derived(
+        "reference_bins", lambda: bin_matrix(reference.frame, columns, sketch["edges"], width)
+    )
+    current_bins = bin_matrix(current_df, columns, sketch["edges"], width)
+    result = psi_significance(
+        reference_bins,
+        current_bins,
+        width,
+        resamples,
+        rng,
+        valid=sketch["valid"],
+        block_rows=block_rows or default_psi_block_rows(),
+    )
+    return {
+        column: {key: float(values[position]) for key, values in result.items()}
+        for position, column in enumerate(columns)
+    }
+
+
+def gate_feature_drift(drift_result: Dict[str, Any], significance: Dict[str, Dict[str, float]], alpha: float) -> int:
+    # With alpha set, a column's drift only counts when its PSI is also unlikely under sampling noise.
+    gated = 0
+    for name, details in drift_result.get("drift_by_columns", {}).items():
+        column = significance.get(name)
+        if column is None:
+            continue
+        details["psi_p_value"] = column["p_value"]
+        if alpha > 0 and details.get("drift_detected") and column["p_value"] >= alpha:
+            details["drift_detected"] = False
+            details["gated_by_psi"] = True
+            gated += 1
+    if gated:
+        total = drift_result.get("number_of_columns", 0)
+        drifted = sum(1 for details in drift_result["drift_by_columns"].values() if details["drift_detected"])
+        drift_result.update(
+            number_of_drifted_columns=drifted,
+            share_of_drifted_columns=drifted / total if total else 0.0,
+            dataset_drift=bool(total) and drifted / total >= 0.5,
+        )
+    return gated
+
+
+def significance_summary(significance: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    return {
+        name: {
+            "psi": round(values["psi"], 6),
+            "p_value": round(values["p_value"], 6),
+            "ci": [round(values["ci_low"], 6), round(values["ci_high"], 6)],
+        }
+        for name, values in significance.items()
+    }
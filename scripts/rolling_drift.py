@@ -0,0 +1,330 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+from common import log, now_iso
+from drift_stats import compute_psi
+
+
+ROLLING_BINS = 10
+ROLLING_PSI_THRESHOLD = 0.2
+COMMIT_ATTEMPTS = 5
+
+
+def reference_edges(values: pd.Series, bins: int = ROLLING_BINS) -> List[float]:
+    # Interior quantile edges only; the outer bins are open-ended so JSON never sees inf.
+    finite = pd.to_numeric(values, errors="coerce").dropna().to_numpy(dtype=float)
+    if not len(finite):
+        return []
+    quantiles = np.quantile(finite, np.linspace(0.0, 1.0, bins + 1)[1:-1])
+    return np.unique(quantiles).tolist()
+
+
+def column_aggregate(values: pd.Series, edges: List[float]) -> Dict[str, Any]:
+    finite = pd.to_numeric(values, errors="coerce").dropna().to_numpy(dtype=float)
+    index = np.searchsorted(np.asarray(edges, dtype=float), finite, side="right")
+    counts = np.bincount(index, minlength=len(edges) + 1)
+    return {
+        "counts": counts.astype(int).tolist(),
+        "n": int(len(finite)),
+        "sum": float(finite.sum()),
+        "sum_sq": float(np.square(finite).sum()),
+    }
+
+
+def frame_aggregates(frame: pd.DataFrame, edges: Dict[str, List[float]]) -> Dict[str, Dict[str, Any]]:
+    return {column: column_aggregate(frame[column], column_edges) for column, column_edges in edges.items()}
+
+
+def combine_aggregates(left: Dict[str, Any], right: Dict[str, Any], sign: int = 1) -> Dict[str, Any]:
+    return {
+        "counts": (np.asarray(left["counts"]) + sign * np.asarray(right["counts"])).astype(int).tolist(),
+        "n": int(left["n"] + sign * right["n"]),
+        "sum": float(left["sum"] + sign * right["sum"]),
+        "sum_sq": float(left["sum_sq"] + sign * right["sum_sq"]),
+    }
+
+
+def empty_aggregate(edges: List[float]) -> Dict[str, Any]:
+    return {"counts": [0] * (len(edges) + 1), "n": 0, "sum": 0.0, "sum_sq": 0.0}
+
+
+def init_rolling_state(baseline_df: pd.DataFrame, schema_hash: str, baseline_id: str) -> Dict[str, Any]:
+    numeric = [column for column in baseline_df.columns if pd.api.types.is_numeric_dtype(baseline_df[column])]
+    edges = {column: reference_edges(baseline_df[column]) for column in numeric}
+    return {
+        "schema_hash": schema_hash,
+        "baseline_id": baseline_id,
+        "edges": edges,
+        "baseline": frame_aggregates(baseline_df, edges),
+        "batches": [],
+        "window": {column: empty_aggregate(column_edges) for column, column_edges in edges.items()},
+        "previous_batches": [],
+        "previous_window": {column: empty_aggregate(column_edges) for column, column_edges in edges.items()},
+        "updated_at": now_iso(),
+    }
+
+
+def parse_recorded_at(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+
+
+def batch_entry(
+    state: Dict[str, Any], current_df: pd.DataFrame, batch_id: str, recorded_at: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "batch_id": batch_id,
+        "recorded_at": recorded_at or now_iso(),
+        "features": frame_aggregates(current_df, state["edges"]),
+    }
+
+
+def counted_batch_ids(state: Dict[str, Any]) -> List[str]:
+    return [entry["batch_id"] for entry in [*state.get("previous_batches", []), *state["batches"]]]
+
+
+def evict_expired(
+    batches: List[Dict[str, Any]],
+    window: Dict[str, Dict[str, Any]],
+    max_batches: Optional[int],
+    cutoff: Optional[datetime],
+    keep: int,
+) -> List[Dict[str, Any]]:
+    # Evicted aggregates are subtracted from `window` in place and returned oldest first.
+    evicted: List[Dict[str, Any]] = []
+    while len(batches) > keep and (
+        (max_batches and len(batches) > max_batches)
+        or (cutoff is not None and parse_recorded_at(batches[0]["recorded_at"]) < cutoff)
+    ):
+        entry = batches.pop(0)
+        for column, aggregate in window.items():
+            window[column] = combine_aggregates(aggregate, entry["features"][column], sign=-1)
+        evicted.append(entry)
+    return evicted
+
+
+def add_batch_entry(
+    state: Dict[str, Any],
+    entry: Dict[str, Any],
+    max_batches: Optional[int] = None,
+    max_days: Optional[int] = None,
+) -> Dict[str, Any]:
+    # Cost is O(bins) per added or evicted batch; the window totals are never rebuilt from stored batches.
+    # A batch already counted (a retried or requeued run) leaves the state unchanged.
+    if entry["batch_id"] in counted_batch_ids(state):
+        return state
+
+    window = {
+        column: combine_aggregates(aggregate, entry["features"][column])
+        for column, aggregate in state["window"].items()
+    }
+    batches = [*state["batches"], entry]
+    recorded = parse_recorded_at(entry["recorded_at"])
+    cutoff = recorded - timedelta(days=max_days) if max_days else None
+    evicted = evict_expired(batches, window, max_batches, cutoff, keep=1)
+
+    # The previous window holds the batches evicted just before the current window, so the two are
+    # disjoint and equally long; states saved before it existed start with an empty one.
+    previous_batches = [*state.get("previous_batches", []), *evicted]
+    previous_window = dict(state.get("previous_window") or {}) if "previous_batches" in state else {}
+    previous_window = previous_window or {column: empty_aggregate(edges) for column, edges in state["edges"].items()}
+    for evicted_entry in evicted:
+        for column, aggregate in previous_window.items():
+            previous_window[column] = combine_aggregates(aggregate, evicted_entry["features"][column])
+    previous_cutoff = recorded - timedelta(days=2 * max_days) if max_days else None
+    evict_expired(previous_batches, previous_window, max_batches, previous_cutoff, keep=0)
+
+    return {
+        **state,
+        "batches": batches,
+        "window": window,
+        "previous_batches": previous_batches,
+        "previous_window": previous_window,
+        "updated_at": entry["recorded_at"],
+    }
+
+
+def update_rolling_state(
+    state: Dict[str, Any],
+    current_df: pd.DataFrame,
+    batch_id: str,
+    max_batches: Optional[int] = None,
+    max_days: Optional[int] = None,
+    recorded_at: Optional[str] = None,
+) -> Dict[str, Any]:
+    return add_batch_entry(state, batch_entry(state, current_df, batch_id, recorded_at), max_batches, max_days)
+
+
+def aggregate_mean(aggregate: Dict[str, Any]) -> float:
+    return aggregate["sum"] / aggregate["n"] if aggregate["n"] else 0.0
+
+
+def aggregate_std(aggregate: Dict[str, Any]) -> float:
+    if not aggregate["n"]:
+        return 0.0
+    mean = aggregate_mean(aggregate)
+    return float(np.sqrt(max(aggregate["sum_sq"] / aggregate["n"] - mean * mean, 0.0)))
+
+
+def aggregate_psi(reference: Dict[str, Any], current: Dict[str, Any]) -> Optional[float]:
+    if not reference["n"] or not current["n"]:
+        return None
+    expected = np.asarray(reference["counts"], dtype=float) / reference["n"]
+    observed = np.asarray(current["counts"], dtype=float) / current["n"]
+    return compute_psi(expected=expected, current=observed)
+
+
+def rolling_status(drifted: int, total: int) -> str:
+    ratio = drifted / max(total, 1)
+    if ratio >= 0.5:
+        return "red"
+    if ratio >= 0.2:
+        return "yellow"
+    return "green"
+
+
+def evaluate_rolling_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    features: Dict[str, Dict[str, Any]] = {}
+    for column, window in state["window"].items():
+        baseline = state["baseline"][column]
+        previous = (state.get("previous_window") or {}).get(column)
+        baseline_psi = aggregate_psi(baseline, window)
+        previous_psi = aggregate_psi(previous, window) if previous and previous["n"] else None
+        baseline_std = aggregate_std(baseline)
+        features[column] = {
+            "psi_vs_baseline": round(baseline_psi, 6) if baseline_psi is not None else None,
+            "psi_vs_previous_window": round(previous_psi, 6) if previous_psi is not None else None,
+            "mean_shift_std": (
+                round((aggregate_mean(window) - aggregate_mean(baseline)) / baseline_std, 6) if baseline_std else None
+            ),
+            "drifted": baseline_psi is not None and baseline_psi >= ROLLING_PSI_THRESHOLD,
+        }
+
+    drifted = sum(1 for details in features.values() if details["drifted"])
+    batches = state["batches"]
+    return {
+        "status": rolling_status(drifted, len(features)),
+        "drifted_columns": drifted,
+        "total_columns": len(features),
+        "window_batches": len(batches),
+        "window_rows": max((aggregate["n"] for aggregate in state["window"].values()), default=0),
+        "window_start": batches[0]["recorded_at"] if batches else None,
+        "window_end": batches[-1]["recorded_at"] if batches else None,
+        "previous_window_batches": len(state.get("previous_batches", [])),
+        "features": features,
+    }
+
+
+def load_rolling_state(supabase, domain_id: str, baseline_version: str) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+    rows = supabase.select(
+        "rolling_drift_state",
+        select="state,revision",
+        filters={"domain_id": f"eq.{domain_id}", "baseline_version": f"eq.{baseline_version}"},
+        limit=1,
+    )
+    return (rows[0].get("state"), int(rows[0].get("revision") or 0)) if rows else (None, None)
+
+
+def save_rolling_state(
+    supabase, domain_id: str, baseline_version: str, state: Dict[str, Any], revision: Optional[int]
+) -> bool:
+    # Compare-and-set on `revision`: False means another worker saved first and the caller must rebase.
+    if revision is None:
+        try:
+            supabase.insert(
+                "rolling_drift_state",
+                [
+                    {
+                        "domain_id": domain_id,
+                        "baseline_version": baseline_version,
+                        "state": state,
+                        "revision": 1,
+                        "updated_at": now_iso(),
+                    }
+                ],
+            )
+        except requests.HTTPError as exc:
+            if exc.response is not None and exc.response.status_code == 409:
+                return False
+            raise
+        return True
+    saved = supabase.update(
+        "rolling_drift_state",
+        filters={
+            "domain_id": f"eq.{domain_id}",
+            "baseline_version": f"eq.{baseline_version}",
+            "revision": f"eq.{revision}",
+        },
+        data={"state": state, "revision": revision + 1, "updated_at": now_iso()},
+    )
+    return bool(saved)
+
+
+@dataclass
+class PendingRollingUpdate:
+    domain_id: str
+    baseline_version: str
+    baseline_id: str
+    schema_hash: str
+    baseline_df: pd.DataFrame
+    entry: Dict[str, Any]
+    max_batches: Optional[int]
+    max_days: Optional[int]
+    state: Dict[str, Any]
+    revision: Optional[int]
+
+
+def rebased_state(
+    stored: Optional[Dict[str, Any]], baseline_df: pd.DataFrame, schema_hash: str, baseline_id: str
+) -> Dict[str, Any]:
+    # A refreshed baseline or a schema change invalidates the stored edges and aggregates.
+    if not stored or stored.get("schema_hash") != schema_hash or stored.get("baseline_id") != baseline_id:
+        return init_rolling_state(baseline_df, schema_hash, baseline_id)
+    return stored
+
+
+def prepare_rolling_drift(
+    supabase,
+    domain_id: str,
+    baseline_version: str,
+    baseline_id: str,
+    baseline_df: pd.DataFrame,
+    schema_hash: str,
+    current_df: pd.DataFrame,
+    batch_id: str,
+    max_batches: Optional[int],
+    max_days: Optional[int],
+) -> Tuple[Dict[str, Any], PendingRollingUpdate]:
+    # Nothing is saved here: the run commits the update only once it has itself been completed, so a
+    # failed or reclaimed run never leaves its batch in the window.
+    stored, revision = load_rolling_state(supabase, domain_id, baseline_version)
+    state = rebased_state(stored, baseline_df, schema_hash, baseline_id)
+    entry = batch_entry(state, current_df, batch_id)
+    already_counted = batch_id in counted_batch_ids(state)
+    state = add_batch_entry(state, entry, max_batches=max_batches, max_days=max_days)
+
+    result = evaluate_rolling_state(state)
+    result["max_batches"] = max_batches
+    result["max_days"] = max_days
+    result["batch_already_counted"] = already_counted
+    pending = PendingRollingUpdate(
+        domain_id, baseline_version, baseline_id, schema_hash, baseline_df, entry, max_batches, max_days, state, revision
+    )
+    return result, pending
+
+
+def commit_rolling_drift(supabase, pending: PendingRollingUpdate, attempts: int = COMMIT_ATTEMPTS) -> bool:
+    state, revision = pending.state, pending.revision
+    for _ in range(attempts):
+        if save_rolling_state(supabase, pending.domain_id, pending.baseline_version, state, revision):
+            return True
+        # Another worker saved in between: re-apply this batch to its state instead of overwriting it.
+        stored, revision = load_rolling_state(supabase, pending.domain_id, pending.baseline_version)
+        state = rebased_state(stored, pending.baseline_df, pending.schema_hash, pending.baseline_id)
+        state = add_batch_entry(state, pending.entry, max_batches=pending.max_batches, max_days=pending.max_days)
+    log(f"rolling drift state for {pending.baseline_version} not saved after {attempts} concurrent updates")
+    return False
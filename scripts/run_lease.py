@@ -0,0 +1,96 @@
+import os
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+from common import log
+
+
+class LeaseLost(RuntimeError):
+    pass
+
+
+def default_lease_seconds() -> int:
+    return int(os.getenv("DRIFTWATCH_LEASE_SECONDS", "120"))
+
+
+def lease_owner_id() -> str:
+    return os.getenv("DRIFTWATCH_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def lease_expiry_iso(seconds: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + seconds))
+
+
+# Holds one claim of a run, identified by its monitor_runs.lease_token, for the lifetime of the run: a daemon
+# thread extends lease_expires_at every third of the lease, so slow stages stay owned while a dead process is
+# reclaimed one lease after its last renewal. The token is per claim, so a stalled process whose run was
+# reclaimed and claimed again under the same worker id no longer matches it.
+class RunLease:
+    kind = "run"
+    renew_function = "renew_run_lease"
+    id_param = "p_run_id"
+
+    def __init__(self, supabase, run_id: str, owner: str, token: str, lease_seconds: Optional[int] = None) -> None:
+        self.supabase = supabase
+        self.run_id = run_id
+        self.owner = owner
+        self.token = token
+        self.lease_seconds = lease_seconds or default_lease_seconds()
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def lease_filter(self) -> Dict[str, str]:
+        return {"lease_token": f"eq.{self.token}"}
+
+    def renew(self) -> bool:
+        try:
+            held = self.supabase.rpc(
+                self.renew_function,
+                {self.id_param: self.run_id, "p_token": self.token, "p_lease_seconds": self.lease_seconds},
+            )
+        except requests.RequestException as exc:
+            # A missed renewal is retried on the next tick; the lease only lapses after several misses.
+            log(f"lease renewal for {self.kind} {self.run_id} failed: {exc}")
+            return True
+        if held is False:
+            self.lost = True
+            self._stop.set()
+            log(f"{self.kind} {self.run_id} lease is no longer held by {self.owner}")
+        return not self.lost
+
+    def ensure_held(self) -> None:
+        if self.lost:
+            raise LeaseLost(f"{self.kind.capitalize()} {self.run_id} was reclaimed from {self.owner}")
+
+    def _renew_loop(self) -> None:
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.renew()
+
+    def start(self) -> "RunLease":
+        self._thread = threading.Thread(target=self._renew_loop, name=f"{self.kind}-lease-{self.run_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "RunLease":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+# The same lease over a worker_jobs row, renewed through renew_job_lease.
+class JobLease(RunLease):
+    kind = "job"
+    renew_function = "renew_job_lease"
+    id_param = "p_job_id"
@@ -0,0 +1,233 @@
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from common import get_supabase, log
+from drift_stats import compute_psi
+
+
+SKETCH_BINS = 200
+SKETCH_QUANTILES = (0.1, 0.5, 0.9)
+SKETCH_LAYOUT = ("lo", "hi", "bins")
+
+
+def build_score_sketch(scores: np.ndarray, bins: int = SKETCH_BINS) -> Dict[str, Any]:
+    values = np.clip(np.asarray(scores, dtype=float).ravel(), 0.0, 1.0)
+    counts, _ = np.histogram(values, bins=np.linspace(0.0, 1.0, bins + 1))
+    return {
+        "lo": 0.0,
+        "hi": 1.0,
+        "bins": bins,
+        "counts": counts.astype(int).tolist(),
+        "n": int(len(values)),
+        "sum": float(values.sum()),
+        "sum_sq": float(np.square(values).sum()),
+    }
+
+
+def sketch_edges(sketch: Dict[str, Any]) -> np.ndarray:
+    return np.linspace(float(sketch["lo"]), float(sketch["hi"]), int(sketch["bins"]) + 1)
+
+
+def merge_score_sketches(sketches: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    merged: Optional[Dict[str, Any]] = None
+    counts: Optional[np.ndarray] = None
+    for sketch in sketches:
+        if not isinstance(sketch, dict) or not sketch.get("counts"):
+            continue
+        if merged is None:
+            merged = {key: sketch[key] for key in SKETCH_LAYOUT}
+            merged.update({"n": 0, "sum": 0.0, "sum_sq": 0.0})
+            counts = np.zeros(int(sketch["bins"]), dtype=np.int64)
+        elif any(sketch[key] != merged[key] for key in SKETCH_LAYOUT):
+            raise RuntimeError("Cannot merge score sketches with different bin layouts.")
+        counts += np.asarray(sketch["counts"], dtype=np.int64)
+        merged["n"] += int(sketch.get("n", 0))
+        merged["sum"] += float(sketch.get("sum", 0.0))
+        merged["sum_sq"] += float(sketch.get("sum_sq", 0.0))
+
+    if merged is None or counts is None:
+        return None
+    merged["counts"] = counts.tolist()
+    return merged
+
+
+def sketch_mergeable(sketch: Dict[str, Any], layout: Optional[Dict[str, Any]]) -> bool:
+    counts = sketch.get("counts")
+    if not isinstance(counts, list) or not counts or any(key not in sketch for key in SKETCH_LAYOUT):
+        return False
+    if len(counts) != int(sketch["bins"]):
+        return False
+    return layout is None or all(sketch[key] == layout[key] for key in SKETCH_LAYOUT)
+
+
+def sketch_mean(sketch: Dict[str, Any]) -> float:
+    n = int(sketch.get("n", 0))
+    return float(sketch["sum"]) / n if n else 0.0
+
+
+def sketch_std(sketch: Dict[str, Any]) -> float:
+    n = int(sketch.get("n", 0))
+    if not n:
+        return 0.0
+    mean = float(sketch["sum"]) / n
+    return float(np.sqrt(max(float(sketch["sum_sq"]) / n - mean * mean, 0.0)))
+
+
+def sketch_quantile(sketch: Dict[str, Any], q: float) -> float:
+    counts = np.asarray(sketch["counts"], dtype=float)
+    total = counts.sum()
+    if total <= 0:
+        return 0.0
+    # Scores are assumed uniform inside a bin, so the CDF is piecewise linear over the edges.
+    cdf = np.concatenate([[0.0], np.cumsum(counts) / total])
+    return float(np.interp(q, cdf, sketch_edges(sketch)))
+
+
+def sketch_distribution(sketch: Dict[str, Any], bin_edges: np.ndarray) -> np.ndarray:
+    counts = np.asarray(sketch["counts"], dtype=float)
+    total = max(counts.sum(), 1.0)
+    cdf = np.concatenate([[0.0], np.cumsum(counts) / total])
+    coarse_cdf = np.interp(np.asarray(bin_edges, dtype=float), sketch_edges(sketch), cdf)
+    return np.diff(coarse_cdf)
+
+
+def sketch_psi(sketch: Dict[str, Any], baseline_pred: Dict[str, Any]) -> Optional[float]:
+    distribution = baseline_pred.get("distribution") if isinstance(baseline_pred, dict) else None
+    if not isinstance(distribution, list) or not distribution:
+        return None
+    expected = np.array([float(v) for v in distribution], dtype=float)
+    bins = baseline_pred.get("bins")
+    if isinstance(bins, list) and len(bins) == len(expected) + 1:
+        bin_edges = np.array([float(v) for v in bins], dtype=float)
+    else:
+        bin_edges = np.linspace(0.0, 1.0, len(expected) + 1)
+    return compute_psi(expected=expected, current=sketch_distribution(sketch, bin_edges))
+
+
+def summarize_sketch(sketch: Dict[str, Any], baseline_pred: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        "n_samples": int(sketch.get("n", 0)),
+        "mean": round(sketch_mean(sketch), 6),
+        "std": round(sketch_std(sketch), 6),
+        "quantiles": {f"p{int(q * 100)}": round(sketch_quantile(sketch, q), 6) for q in SKETCH_QUANTILES},
+    }
+    if baseline_pred is not None:
+        psi = sketch_psi(sketch, baseline_pred)
+        summary["psi"] = round(psi, 6) if psi is not None else None
+    return summary
+
+
+def period_key(timestamp: str, bucket: str) -> str:
+    moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(timezone.utc)
+    if bucket == "week":
+        monday = moment.date() - timedelta(days=moment.weekday())
+        return monday.isoformat()
+    return moment.date().isoformat()
+
+
+def score_trend(
+    runs: Iterable[Dict[str, Any]],
+    bucket: str = "day",
+    baseline_pred: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    # Sketches are merged as runs arrive, so memory stays bounded by the number of periods.
+    merged_by_period: Dict[str, Dict[str, Any]] = {}
+    batches: Dict[str, int] = {}
+    skipped: Dict[str, int] = {}
+    overall: Optional[Dict[str, Any]] = None
+    for run in runs:
+        sketch = run.get("score_sketch")
+        if not run.get("finished_at") or not isinstance(sketch, dict):
+            continue
+        period = period_key(run["finished_at"], bucket)
+        # The first usable sketch fixes the layout; empty or differently binned sketches are counted as
+        # skipped instead of as batches of a distribution they are not part of.
+        if not sketch_mergeable(sketch, overall):
+            skipped[period] = skipped.get(period, 0) + 1
+            continue
+        batches[period] = batches.get(period, 0) + 1
+        merged_by_period[period] = merge_score_sketches([merged_by_period.get(period), sketch])
+        overall = merge_score_sketches([overall, sketch])
+
+    periods: List[Dict[str, Any]] = [
+        {
+            "period": period,
+            "batches": batches[period],
+            "skipped": skipped.get(period, 0),
+            **summarize_sketch(merged_by_period[period], baseline_pred),
+        }
+        for period in sorted(merged_by_period)
+    ]
+    return {
+        "bucket": bucket,
+        "periods": periods,
+        "skipped": sum(skipped.values()),
+        "overall": summarize_sketch(overall, baseline_pred) if overall else None,
+    }
+
+
+def load_score_sketches(
+    supabase,
+    domain_key: str,
+    baseline_version: str,
+    since: str,
+    until: str,
+) -> Iterator[Dict[str, Any]]:
+    return supabase.select_iter(
+        "monitor_runs",
+        select="id,batch_id,finished_at,score_sketch",
+        filters={
+            "domain_key": f"eq.{domain_key}",
+            "baseline_version": f"eq.{baseline_version}",
+            "status": "eq.completed",
+            "and": f'(finished_at.gte."{since}",finished_at.lt."{until}")',
+        },
+    )
+
+
+def load_baseline_predictions(supabase, domain_key: str, baseline_version: str) -> Optional[Dict[str, Any]]:
+    domains = supabase.select("domains", select="id,key", filters={"key": f"eq.{domain_key}"}, limit=1)
+    if not domains:
+        raise RuntimeError(f"Domain '{domain_key}' not found")
+    rows = supabase.select(
+        "baselines",
+        select="baseline_predictions_json",
+        filters={"domain_id": f"eq.{domains[0]['id']}", "baseline_version": f"eq.{baseline_version}"},
+        limit=1,
+    )
+    return rows[0].get("baseline_predictions_json") if rows else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--domain", default="nordea")
+    parser.add_argument("--baseline-version", default="v1")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--since", default=None, help="ISO timestamp; defaults to now minus --days.")
+    parser.add_argument("--until", default=None, help="ISO timestamp; defaults to now.")
+    parser.add_argument("--bucket", default="day", choices=["day", "week"])
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    until = args.until or now.isoformat()
+    since = args.since or (now - timedelta(days=args.days)).isoformat()
+
+    supabase = get_supabase()
+    runs = load_score_sketches(supabase, args.domain, args.baseline_version, since, until)
+    baseline_pred = load_baseline_predictions(supabase, args.domain, args.baseline_version)
+    trend = score_trend(runs, bucket=args.bucket, baseline_pred=baseline_pred)
+
+    run_count = sum(period["batches"] for period in trend["periods"])
+    log(
+        f"score trend domain={args.domain} baseline={args.baseline_version} runs={run_count} "
+        f"skipped={trend['skipped']} since={since} until={until}"
+    )
+    print(json.dumps(trend, indent=2))
+
+
+if __name__ == "__main__":
+    main()
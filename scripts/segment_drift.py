@@ -0,0 +1,143 @@
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from drift_stats import compute_psi_matrix
+from feature_drift import ReferenceColumns
+from rolling_drift import reference_edges
+
+
+SEGMENT_PSI_THRESHOLD = 0.2
+
+
+def default_segment_min_rows() -> int:
+    return int(os.getenv("DRIFTWATCH_SEGMENT_MIN_ROWS", "30"))
+
+
+def bin_matrix(frame: pd.DataFrame, columns: Sequence[str], edges: Dict[str, List[float]], width: int) -> np.ndarray:
+    # Row x column bin indices against the overall baseline edges; missing values get index `width`,
+    # a slot that is dropped once the histograms are counted.
+    bins = np.empty((len(frame), len(columns)), dtype=np.int64)
+    for position, column in enumerate(columns):
+        values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=float)
+        index = np.searchsorted(np.asarray(edges[column], dtype=float), values, side="right")
+        bins[:, position] = np.where(np.isnan(values), width, index)
+    return bins
+
+
+def grouped_histograms(bins: np.ndarray, codes: np.ndarray, groups: int, width: int) -> np.ndarray:
+    # A single bincount over (group, column, bin) gives every group's histogram for every column.
+    n_columns = bins.shape[1]
+    flat = (codes[:, None] * n_columns + np.arange(n_columns)) * (width + 1) + bins
+    counts = np.bincount(flat.ravel(), minlength=groups * n_columns * (width + 1))
+    return counts.reshape(groups, n_columns, width + 1)[..., :width]
+
+
+def proportions(counts: np.ndarray) -> np.ndarray:
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros(counts.shape, dtype=float), where=totals > 0)
+
+
+def baseline_segment_sketch(reference: ReferenceColumns, segment_by: str) -> Dict[str, Any]:
+    frame = reference.frame
+    columns = [column for column in frame.columns if pd.api.types.is_numeric_dtype(frame[column])]
+    edges = {column: reference_edges(frame[column]) for column in columns}
+    bin_counts = np.array([len(edges[column]) + 1 for column in columns], dtype=np.int64)
+    width = int(bin_counts.max()) if len(columns) else 1
+    bins = bin_matrix(frame, columns, edges, width)
+
+    sketch: Dict[str, Any] = {
+        "columns": columns,
+        "edges": edges,
+        "width": width,
+        "valid": np.arange(width)[None, :] < bin_counts[:, None],
+        "overall": grouped_histograms(bins, np.zeros(len(frame), dtype=np.int64), 1, width)[0],
+        "segments": {},
+        "segment_rows": {},
+    }
+    if reference.labels is not None and segment_by in reference.labels.columns:
+        codes, names = pd.factorize(reference.labels[segment_by])
+        counts = grouped_histograms(bins, codes, len(names), width)
+        sizes = np.bincount(codes, minlength=len(names))
+        sketch["segments"] = {name: counts[position] for position, name in enumerate(names)}
+        sketch["segment_rows"] = {name: int(sizes[position]) for position, name in enumerate(names)}
+    return sketch
+
+
+def compute_segment_drift(
+    reference: ReferenceColumns,
+    current_df: pd.DataFrame,
+    current_labels: pd.Series,
+    segment_by: str,
+    min_rows: Optional[int] = None,
+) -> Dict[str, Any]:
+    min_rows = default_segment_min_rows() if min_rows is None else min_rows
+    # Baseline sketches depend only on the baseline, so a resident worker builds them once per segment column.
+    sketch = reference.derived(("segment_sketch", segment_by), lambda: baseline_segment_sketch(reference, segment_by))
+    columns = sketch["columns"]
+    codes, names = pd.factorize(current_labels.astype(str))
+    sizes = np.bincount(codes, minlength=len(names))
+    current_counts = grouped_histograms(
+        bin_matrix(current_df, columns, sketch["edges"], sketch["width"]), codes, len(names), sketch["width"]
+    )
+
+    # Segments the baseline lacks, or has too few rows of, are compared with the whole baseline.
+    own_baseline = [sketch["segment_rows"].get(name, 0) >= min_rows for name in names]
+    expected = np.zeros(current_counts.shape, dtype=np.int64)
+    for position, name in enumerate(names):
+        expected[position] = sketch["segments"][name] if own_baseline[position] else sketch["overall"]
+    psi = compute_psi_matrix(proportions(expected), proportions(current_counts), sketch["valid"])
+
+    segments: Dict[str, Any] = {}
+    skipped: Dict[str, int] = {}
+    for position, name in enumerate(names):
+        if sizes[position] < min_rows:
+            skipped[name] = int(sizes[position])
+            continue
+        scores = psi[position]
+        by_column = {
+            column: {"psi": float(scores[index]), "drift_detected": bool(scores[index] >= SEGMENT_PSI_THRESHOLD)}
+            for index, column in enumerate(columns)
+        }
+        drifted = sum(1 for details in by_column.values() if details["drift_detected"])
+        segments[name] = {
+            "rows": int(sizes[position]),
+            "baseline": "segment" if own_baseline[position] else "overall",
+            "number_of_columns": len(columns),
+            "number_of_drifted_columns": drifted,
+            "share_of_drifted_columns": drifted / len(columns) if columns else 0.0,
+            "drift_by_columns": by_column,
+        }
+    return {
+        "segment_by": segment_by,
+        "threshold": SEGMENT_PSI_THRESHOLD,
+        "min_rows": min_rows,
+        "segments": segments,
+        "skipped": skipped,
+    }
+
+
+def summarize_segment_drift(result: Dict[str, Any], top: int = 3) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    for name, details in result["segments"].items():
+        ranked: List[Tuple[str, float]] = sorted(
+            ((column, column_details["psi"]) for column, column_details in details["drift_by_columns"].items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        summary[name] = {
+            "rows": details["rows"],
+            "baseline": details["baseline"],
+            "drifted_columns": details["number_of_drifted_columns"],
+            "total_columns": details["number_of_columns"],
+            "max_psi": ranked[0][1] if ranked else 0.0,
+            "top_features": [column for column, score in ranked[:top] if score >= result["threshold"]],
+        }
+    return {
+        "segment_by": result["segment_by"],
+        "min_rows": result["min_rows"],
+        "segments": summary,
+        "skipped": result["skipped"],
+    }
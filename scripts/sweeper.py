@@ -1,36 +1,45 @@
 import argparse
-import datetime as dt
+import os
+from typing import List, Optional
 
-from common import get_supabase, log, now_iso
+from common import get_supabase, log, now_iso, refresh_daily_summary
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--timeout-minutes", type=int, default=10)
-    args = parser.parse_args()
+    parser.add_argument(
+        "--timeout-minutes",
+        type=int,
+        default=10,
+        help="Only for processing runs and jobs without a lease (started before leases existed).",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=int(os.getenv("DRIFTWATCH_MAX_RUN_ATTEMPTS", "3")),
+        help="Runs and jobs whose lease expires on this attempt are failed instead of requeued.",
+    )
+    args = parser.parse_args(argv)
 
     supabase = get_supabase()
-    cutoff = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(minutes=args.timeout_minutes)).isoformat()
-
-    stale = supabase.select(
-        "monitor_runs",
-        select="id,status,started_at",
-        filters={"status": "eq.processing", "started_at": f"lt.{cutoff}"},
+    # One bulk UPDATE per queue table: expired leases are requeued, or failed once attempts run out.
+    reclaim_params = {"p_max_attempts": args.max_attempts, "p_legacy_timeout_minutes": args.timeout_minutes}
+    reclaimed = supabase.rpc("reclaim_expired_leases", reclaim_params) or []
+    reclaimed_jobs = supabase.rpc("reclaim_expired_jobs", reclaim_params) or []
+
+    requeued = [run for run in reclaimed if run["status"] == "queued"]
+    failed = [run for run in reclaimed if run["status"] == "failed"]
+    day = now_iso()[:10]
+    for domain_key, baseline_version in sorted({(run["domain_key"], run["baseline_version"]) for run in failed}):
+        refresh_daily_summary(supabase, domain_key, baseline_version, day=day)
+
+    requeued_jobs = [job for job in reclaimed_jobs if job["status"] == "queued"]
+    log(f"sweeper requeued {len(requeued)} and failed {len(failed)} runs with expired leases")
+    log(
+        f"sweeper requeued {len(requeued_jobs)} and failed {len(reclaimed_jobs) - len(requeued_jobs)} "
+        "worker jobs with expired leases"
     )
 
-    for run in stale:
-        supabase.update(
-            "monitor_runs",
-            filters={"id": f"eq.{run['id']}"},
-            data={
-                "status": "failed",
-                "error_text": "timeout: run exceeded sweeper threshold",
-                "finished_at": now_iso(),
-            },
-        )
-
-    log(f"sweeper marked {len(stale)} stale runs as failed")
-
 
 if __name__ == "__main__":
     main()
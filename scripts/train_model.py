@@ -1,9 +1,10 @@
 import argparse
-import hashlib
-import io
-import json
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import joblib
 import numpy as np
@@ -12,13 +13,21 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
-from common import get_supabase, log, now_iso
-from nordea_sync import FEATURE_COLUMNS, build_feature_batch, generate_synthetic_transactions
+from artifacts import artifact_codec, encoded_path, upload_artifact
+from common import dataframe_csv_chunks, get_supabase, log, now_iso
+from feature_registry import HORIZONS_HELP, default_horizons, longest_window, resolve_horizons
+from feature_schema import compute_schema_hash
+from nordea_sync import (
+    FEATURE_COLUMNS,
+    SCENARIOS,
+    build_feature_batch,
+    build_segmented_synthetic_batch,
+    generate_synthetic_transactions,
+)
+from score_sketch import build_score_sketch
 
 
-def compute_schema_hash(df: pd.DataFrame) -> str:
-    payload = [(column, str(dtype)) for column, dtype in zip(df.columns, df.dtypes)]
-    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+SEGMENT_SCENARIOS_HELP = "Comma-separated scenarios trained as one baseline, labelled in the segment column."
 
 
 def create_training_target(df: pd.DataFrame) -> pd.Series:
@@ -72,93 +81,280 @@ def train_model(baseline_df: pd.DataFrame) -> Tuple[Pipeline, np.ndarray, Dict[s
     return pipeline, probs, metrics
 
 
-def run_training(
-    *,
-    domain: str,
-    baseline_version: str,
-    rows: int,
-    seed: Optional[int],
+@dataclass(frozen=True)
+class BaselineSpec:
+    baseline_version: str
+    scenario: str
+    seed: Optional[int]
+    rows: int
+
+
+@dataclass
+class TrainedBaseline:
+    spec: BaselineSpec
+    baseline_df: pd.DataFrame
+    model: Pipeline
+    metrics: Dict[str, Any]
+    schema_hash: str
+    prediction_hist: Dict[str, Any]
+
+
+def synthetic_days_for_rows(rows: int, horizons: Sequence[int] = ()) -> int:
+    return max(rows + longest_window(horizons) + 15, 120)
+
+
+def parse_baseline_matrix(raw: str) -> List[BaselineSpec]:
+    specs: List[BaselineSpec] = []
+    for entry in re.split(r"[,\s]+", raw.strip()):
+        if not entry:
+            continue
+        parts = entry.split(":")
+        if len(parts) != 4:
+            raise RuntimeError(f"Invalid baseline matrix entry '{entry}'. Expected version:scenario:seed:rows")
+        version, scenario, seed_raw, rows_raw = parts
+        if scenario not in SCENARIOS:
+            raise RuntimeError(f"Unknown scenario '{scenario}'. Valid: {sorted(SCENARIOS)}")
+        seed = None if seed_raw.lower() in {"", "none", "random"} else int(seed_raw)
+        specs.append(BaselineSpec(baseline_version=version, scenario=scenario, seed=seed, rows=int(rows_raw)))
+
+    versions = [spec.baseline_version for spec in specs]
+    duplicates = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicates:
+        raise RuntimeError(f"Duplicate baseline versions in matrix: {duplicates}")
+    return specs
+
+
+def group_specs_by_data(specs: Sequence[BaselineSpec]) -> List[Tuple[str, Optional[int], List[BaselineSpec]]]:
+    # Unseeded specs never share data: each one must get its own random draw.
+    groups: Dict[Tuple[str, Any], List[BaselineSpec]] = {}
+    for index, spec in enumerate(specs):
+        key = (spec.scenario, spec.seed if spec.seed is not None else f"unseeded-{index}")
+        groups.setdefault(key, []).append(spec)
+    return [(group[0].scenario, group[0].seed, group) for group in groups.values()]
+
+
+def build_training_frames(
+    scenario: str, seed: Optional[int], rows: Sequence[int], horizons: Optional[Sequence[int]] = None
+) -> Dict[int, pd.DataFrame]:
+    # A frame must match what `--rows N --seed S` builds on its own, and the generator's draws depend on
+    # the history length, so each distinct length gets its own timeline. Anchor rows only depend on that
+    # timeline, so sizes sharing one are cut from its widest batch.
+    horizons = default_horizons() if horizons is None else horizons
+    by_days: Dict[int, List[int]] = {}
+    for count in sorted(set(rows)):
+        by_days.setdefault(synthetic_days_for_rows(count, horizons), []).append(count)
+
+    frames: Dict[int, pd.DataFrame] = {}
+    for days, counts in by_days.items():
+        tx = generate_synthetic_transactions(scenario=scenario, seed=seed, days=days)
+        widest = build_feature_batch(tx, rows=max(counts), horizons=horizons)
+        frames.update({count: widest.tail(count).reset_index(drop=True) for count in counts})
+    return frames
+
+
+def parse_segment_scenarios(raw: str) -> List[str]:
+    return [entry.strip() for entry in raw.split(",") if entry.strip()]
+
+
+def build_baseline_frame(
     scenario: str,
-) -> Dict[str, Any]:
-    supabase = get_supabase()
-    domains = supabase.select("domains", select="id,key", filters={"key": f"eq.{domain}"}, limit=1)
-    if not domains:
-        raise RuntimeError(f"Domain '{domain}' not found")
-    domain_id = domains[0]["id"]
+    seed: Optional[int],
+    rows: int,
+    horizons: Optional[Sequence[int]] = None,
+    segment_scenarios: Sequence[str] = (),
+) -> pd.DataFrame:
+    # With segment scenarios the baseline is built like `generate_batch --segment-scenarios`: one labelled
+    # cohort of `rows` rows per scenario, so segmented drift can compare each segment with its own slice.
+    if segment_scenarios:
+        return build_segmented_synthetic_batch(segment_scenarios, rows, seed, horizons)[0]
+    return build_training_frames(scenario, seed, [rows], horizons)[rows]
 
-    tx = generate_synthetic_transactions(scenario=scenario, seed=seed, days=max(rows + 45, 120))
-    baseline_df = build_feature_batch(tx, rows=rows)
-    schema_hash = compute_schema_hash(baseline_df)
 
+def train_baseline(spec: BaselineSpec, baseline_df: pd.DataFrame) -> TrainedBaseline:
     model, baseline_probs, metrics = train_model(baseline_df)
     prediction_hist = histogram_distribution(baseline_probs, bins=10)
+    prediction_hist["score_sketch"] = build_score_sketch(baseline_probs)
+    return TrainedBaseline(
+        spec=spec,
+        baseline_df=baseline_df,
+        model=model,
+        metrics=metrics,
+        schema_hash=compute_schema_hash(baseline_df),
+        prediction_hist=prediction_hist,
+    )
 
+
+def get_domain_id(supabase, domain: str) -> str:
+    domains = supabase.select("domains", select="id,key", filters={"key": f"eq.{domain}"}, limit=1)
+    if not domains:
+        raise RuntimeError(f"Domain '{domain}' not found")
+    return domains[0]["id"]
+
+
+def upload_baseline_artifacts(supabase, domain: str, trained: TrainedBaseline) -> Tuple[str, str]:
     bucket = "driftwatch-artifacts"
+    baseline_version = trained.spec.baseline_version
     baseline_path = f"baselines/{domain}/{baseline_version}.csv"
-    baseline_uri = supabase.upload_bytes(
+    baseline_uri = upload_artifact(
+        supabase,
         bucket,
         baseline_path,
-        baseline_df.to_csv(index=False).encode("utf-8"),
+        dataframe_csv_chunks(trained.baseline_df),
         "text/csv",
+        codec=artifact_codec(),
     )
 
     model_path = f"models/{domain}/{baseline_version}/model.joblib"
-    model_buffer = io.BytesIO()
-    joblib.dump(model, model_buffer)
-    model_uri = supabase.upload_bytes(
-        bucket,
-        model_path,
-        model_buffer.getvalue(),
-        "application/octet-stream",
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_file = f"{temp_dir}/model.joblib"
+        joblib.dump(trained.model, model_file)
+        model_uri = supabase.upload_file(
+            bucket,
+            model_path,
+            model_file,
+            "application/octet-stream",
+        )
+    return baseline_uri, model_uri
+
+
+def baseline_artifact_uris(supabase, domain: str, baseline_version: str) -> Tuple[str, str]:
+    # Where upload_baseline_artifacts puts the CSV and model, known before either is uploaded.
+    bucket = "driftwatch-artifacts"
+    return (
+        supabase.public_object_url(bucket, encoded_path(f"baselines/{domain}/{baseline_version}.csv", artifact_codec())),
+        supabase.public_object_url(bucket, f"models/{domain}/{baseline_version}/model.joblib"),
     )
 
-    upserted = supabase.upsert(
-        "baselines",
-        [
-            {
-                "domain_id": domain_id,
-                "baseline_version": baseline_version,
-                "schema_version": "v1",
-                "schema_hash": schema_hash,
-                "row_count": len(baseline_df),
-                "storage_uri": baseline_uri,
-                "model_uri": model_uri,
-                "baseline_predictions_json": prediction_hist,
-                "reason": f"synthetic baseline refresh scenario={scenario}",
-            }
-        ],
-        on_conflict="domain_id,baseline_version",
-    )[0]
 
+def baseline_record(domain_id: str, trained: TrainedBaseline, baseline_uri: str, model_uri: str) -> Dict[str, Any]:
+    return {
+        "domain_id": domain_id,
+        "baseline_version": trained.spec.baseline_version,
+        "schema_version": "v1",
+        "schema_hash": trained.schema_hash,
+        "row_count": len(trained.baseline_df),
+        "storage_uri": baseline_uri,
+        "model_uri": model_uri,
+        "baseline_predictions_json": trained.prediction_hist,
+        "reason": f"synthetic baseline refresh scenario={trained.spec.scenario}",
+    }
+
+
+def publish_baselines(supabase, domain: str, domain_id: str, trained: Sequence[TrainedBaseline]) -> List[Dict[str, Any]]:
+    records: List[Dict[str, Any]] = []
+    uris: List[Tuple[str, str]] = []
+    for item in trained:
+        baseline_uri, model_uri = upload_baseline_artifacts(supabase, domain, item)
+        uris.append((baseline_uri, model_uri))
+        records.append(baseline_record(domain_id, item, baseline_uri, model_uri))
+
+    upserted = supabase.upsert("baselines", records, on_conflict="domain_id,baseline_version")
     supabase.update(
         "domains",
         filters={"id": f"eq.{domain_id}"},
         data={"last_worker_heartbeat": now_iso()},
     )
 
-    log(
-        "model trained "
-        f"domain={domain} baseline={baseline_version} rows={len(baseline_df)} "
-        f"accuracy={metrics['accuracy']:.4f} model_uri={model_uri}"
-    )
+    by_version = {row.get("baseline_version"): row for row in upserted}
+    results: List[Dict[str, Any]] = []
+    for item, (baseline_uri, model_uri) in zip(trained, uris):
+        version = item.spec.baseline_version
+        log(
+            "model trained "
+            f"domain={domain} baseline={version} rows={len(item.baseline_df)} "
+            f"accuracy={item.metrics['accuracy']:.4f} model_uri={model_uri}"
+        )
+        results.append(
+            {
+                "baseline": by_version.get(version, {}),
+                "metrics": item.metrics,
+                "schema_hash": item.schema_hash,
+                "baseline_uri": baseline_uri,
+                "model_uri": model_uri,
+            }
+        )
+    return results
 
-    return {
-        "baseline": upserted,
-        "metrics": metrics,
-        "schema_hash": schema_hash,
-        "baseline_uri": baseline_uri,
-        "model_uri": model_uri,
-    }
+
+def run_training(
+    *,
+    domain: str,
+    baseline_version: str,
+    rows: int,
+    seed: Optional[int],
+    scenario: str,
+    horizons: Optional[Sequence[int]] = None,
+    segment_scenarios: Sequence[str] = (),
+) -> Dict[str, Any]:
+    supabase = get_supabase()
+    domain_id = get_domain_id(supabase, domain)
+
+    label = "+".join(segment_scenarios) if segment_scenarios else scenario
+    spec = BaselineSpec(baseline_version=baseline_version, scenario=label, seed=seed, rows=rows)
+    baseline_df = build_baseline_frame(scenario, seed, rows, horizons, segment_scenarios)
+    trained = train_baseline(spec, baseline_df)
+    return publish_baselines(supabase, domain, domain_id, [trained])[0]
+
+
+def _build_group_frames(
+    scenario: str, seed: Optional[int], specs: List[BaselineSpec], horizons: Sequence[int] = ()
+) -> List[Tuple[BaselineSpec, pd.DataFrame]]:
+    frames = build_training_frames(scenario, seed, [spec.rows for spec in specs], horizons)
+    return [(spec, frames[spec.rows]) for spec in specs]
+
+
+def train_baseline_matrix(
+    specs: Sequence[BaselineSpec],
+    max_workers: Optional[int] = None,
+    horizons: Optional[Sequence[int]] = None,
+) -> List[TrainedBaseline]:
+    groups = group_specs_by_data(specs)
+    # Resolved here so pool workers build the same columns whatever their environment.
+    horizons = tuple(default_horizons() if horizons is None else horizons)
+    if max_workers == 1:
+        prepared = [
+            pair for scenario, seed, group in groups for pair in _build_group_frames(scenario, seed, group, horizons)
+        ]
+        trained = [train_baseline(spec, frame) for spec, frame in prepared]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            frame_futures = [
+                pool.submit(_build_group_frames, scenario, seed, group, horizons) for scenario, seed, group in groups
+            ]
+            prepared = [pair for future in frame_futures for pair in future.result()]
+            train_futures = [pool.submit(train_baseline, spec, frame) for spec, frame in prepared]
+            trained = [future.result() for future in train_futures]
+
+    order = {spec.baseline_version: index for index, spec in enumerate(specs)}
+    return sorted(trained, key=lambda item: order[item.spec.baseline_version])
+
+
+def run_training_matrix(
+    *,
+    domain: str,
+    specs: Sequence[BaselineSpec],
+    max_workers: Optional[int] = None,
+    horizons: Optional[Sequence[int]] = None,
+) -> List[Dict[str, Any]]:
+    if not specs:
+        raise RuntimeError("Baseline matrix is empty.")
+    supabase = get_supabase()
+    domain_id = get_domain_id(supabase, domain)
+
+    trained = train_baseline_matrix(specs, max_workers=max_workers, horizons=horizons)
+    return publish_baselines(supabase, domain, domain_id, trained)
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--domain", default="nordea")
     parser.add_argument("--baseline-version", default="v1")
     parser.add_argument("--rows", type=int, default=200)
     parser.add_argument("--seed", type=int, default=42)
     parser.add_argument("--scenario", default="stable_salary")
-    args = parser.parse_args()
+    parser.add_argument("--horizons", default=None, help=HORIZONS_HELP)
+    parser.add_argument("--segment-scenarios", default="", help=SEGMENT_SCENARIOS_HELP)
+    args = parser.parse_args(argv)
 
     run_training(
         domain=args.domain,
@@ -166,6 +362,8 @@ def main() -> None:
         rows=args.rows,
         seed=args.seed,
         scenario=args.scenario,
+        horizons=resolve_horizons(args.horizons),
+        segment_scenarios=parse_segment_scenarios(args.segment_scenarios),
     )
 
 
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+TRANSACTION_ID_KEYS = ("transactionId", "transaction_id", "entryReference", "entry_reference", "id")
+
+
+def transaction_id(raw: Dict[str, Any], occurrence: int = 0) -> str:
+    for key in TRANSACTION_ID_KEYS:
+        value = raw.get(key)
+        if value is not None and value != "":
+            return str(value)
+    # Payloads without ids are keyed by content so a re-fetched record still dedupes; `occurrence` numbers
+    # identical payloads booked on the same day, so two equal purchases stay two transactions.
+    canonical = json.dumps(raw, sort_keys=True, default=str, separators=(",", ":"))
+    digest = "sha256:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{digest}#{occurrence}" if occurrence else digest
+
+
+def safe_account_key(account_id: str) -> str:
+    return "".join(char if char.isalnum() or char in "-_." else "_" for char in account_id)
+
+
+@dataclass
+class TransactionStore:
+    root: Path
+
+    def account_dir(self, account_id: str) -> Path:
+        return self.root / safe_account_key(account_id)
+
+    def partition_path(self, account_id: str, day: date) -> Path:
+        return self.account_dir(account_id) / f"{day.isoformat()}.jsonl"
+
+    def watermark_path(self, account_id: str) -> Path:
+        return self.account_dir(account_id) / "_watermark.json"
+
+    def read_watermark(self, account_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            payload = json.loads(self.watermark_path(account_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return payload if isinstance(payload, dict) and payload.get("last_booked_date") else None
+
+    def write_watermark(self, account_id: str, watermark: Dict[str, Any]) -> None:
+        path = self.watermark_path(account_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix(".tmp")
+        temp.write_text(json.dumps(watermark, separators=(",", ":")), encoding="utf-8")
+        os.replace(temp, path)
+
+    def watermark_date(self, account_id: str) -> Optional[date]:
+        watermark = self.read_watermark(account_id)
+        return date.fromisoformat(watermark["last_booked_date"]) if watermark else None
+
+    def fetched_since(self, account_id: str) -> Optional[date]:
+        # Earliest day a fetch for this account has covered; days before it were never requested.
+        watermark = self.read_watermark(account_id)
+        return date.fromisoformat(watermark["fetched_since"]) if watermark and watermark.get("fetched_since") else None
+
+    def record_fetch(self, account_id: str, from_date: date) -> None:
+        watermark = self.read_watermark(account_id)
+        if watermark is None:
+            return
+        covered = self.fetched_since(account_id)
+        if covered is None or from_date < covered:
+            self.write_watermark(account_id, {**watermark, "fetched_since": from_date.isoformat()})
+
+    def read_partition(self, account_id: str, day: date) -> List[Dict[str, Any]]:
+        path = self.partition_path(account_id, day)
+        if not path.exists():
+            return []
+        with path.open("r", encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+
+    def append(self, account_id: str, transactions: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_day: Dict[date, List[Dict[str, Any]]] = {}
+        for tx in transactions:
+            by_day.setdefault(tx["date"], []).append(tx)
+
+        # Dedupe is against the day's partition, which a fetch from the watermark always covers in full, so
+        # the watermark itself only records the last booked date (and, via record_fetch, how far back
+        # fetches have reached).
+        watermark = self.read_watermark(account_id) or {}
+        last = watermark.get("last_booked_date")
+        appended: List[Dict[str, Any]] = []
+        for day in sorted(by_day):
+            known = {record["id"] for record in self.read_partition(account_id, day)}
+            occurrences: Dict[str, int] = {}
+            lines: List[str] = []
+            for tx in by_day[day]:
+                raw = tx.get("raw") or {}
+                base_id = transaction_id(raw)
+                tx_id = transaction_id(raw, occurrences.get(base_id, 0))
+                occurrences[base_id] = occurrences.get(base_id, 0) + 1
+                if tx_id in known:
+                    continue
+                known.add(tx_id)
+                record = {
+                    "id": tx_id,
+                    "ts": tx["ts"].isoformat(),
+                    "amount": float(tx["amount"]),
+                    "merchant": tx["merchant"],
+                    "raw": tx.get("raw"),
+                }
+                lines.append(json.dumps(record, separators=(",", ":"), default=str))
+                appended.append(tx)
+            if lines:
+                path = self.partition_path(account_id, day)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with path.open("a", encoding="utf-8") as handle:
+                    handle.write("\n".join(lines) + "\n")
+            if last is None or day.isoformat() > last:
+                last = day.isoformat()
+
+        if last:
+            self.write_watermark(account_id, {**watermark, "last_booked_date": last})
+        return appended
+
+    def load_transactions(self, account_ids: Iterable[str], since: date, until: date) -> List[Dict[str, Any]]:
+        transactions: List[Dict[str, Any]] = []
+        for account_id in account_ids:
+            day = since
+            while day <= until:
+                for record in self.read_partition(account_id, day):
+                    ts = datetime.fromisoformat(record["ts"])
+                    transactions.append(
+                        {
+                            "ts": ts,
+                            "date": ts.date(),
+                            "amount": float(record["amount"]),
+                            "merchant": record["merchant"],
+                            "raw": record.get("raw"),
+                        }
+                    )
+                day += timedelta(days=1)
+        transactions.sort(key=lambda tx: tx["ts"])
+        return transactions
+
+
+def open_transaction_store(domain: str = "nordea") -> TransactionStore:
+    root = Path(os.getenv("NORDEA_TX_STORE_DIR", ".driftwatch/transactions")) / domain
+    return TransactionStore(root=root)
@@ -0,0 +1,39 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+# Values are reused only while the caller's validation token (a storage ETag) still matches, so a
+# resident worker picks up a retrained model or refreshed baseline on its next run. Loads happen
+# outside the lock; two threads racing on the same key both load and the later one wins.
+class WarmCache:
+    def __init__(self, max_entries: int = 16) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, token: Optional[str], load: Callable[[], Any]) -> Any:
+        if token is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == token:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+        value = load()
+        with self._lock:
+            self.misses += 1
+            if token is None:
+                self._entries.pop(key, None)
+                return value
+            self._entries[key] = (token, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,162 @@
+import argparse
+import importlib
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import monitor_run
+from common import SupabaseClient, get_supabase, log, now_iso
+from run_lease import JobLease, RunLease, default_lease_seconds, lease_owner_id
+
+
+# worker_jobs.job_type -> script module whose main(argv) runs the job in this process.
+JOB_ENTRYPOINTS = {
+    "nordea_sync": "nordea_sync",
+    "baseline_refresh": "baseline_refresh",
+    "generate_batch": "generate_batch",
+}
+
+Work = Tuple[str, Dict[str, Any]]
+
+
+def claim_work(supabase: SupabaseClient, slots: int, owner: str, lease_seconds: int) -> List[Work]:
+    if slots <= 0:
+        return []
+    runs = supabase.rpc("claim_monitor_runs", {"p_owner": owner, "p_lease_seconds": lease_seconds, "p_limit": slots})
+    claimed: List[Work] = [("monitor_run", row) for row in runs or []]
+    remaining = slots - len(claimed)
+    if remaining > 0:
+        jobs = supabase.rpc("claim_worker_jobs", {"p_owner": owner, "p_lease_seconds": lease_seconds, "p_limit": remaining})
+        claimed += [("job", row) for row in jobs or []]
+    return claimed
+
+
+def monitor_args_for(run: Dict[str, Any]) -> argparse.Namespace:
+    # Options the run was queued with win over this worker's env defaults.
+    args = monitor_run.build_parser().parse_args([])
+    for key, value in (run.get("params") or {}).items():
+        if key in monitor_run.RUN_OPTION_KEYS and value is not None:
+            setattr(args, key, value)
+    args.domain = run["domain_key"]
+    args.baseline_version = run["baseline_version"]
+    args.batch_id = run["batch_id"]
+    return args
+
+
+def process_monitor_run(supabase: SupabaseClient, run: Dict[str, Any], lease_seconds: int) -> None:
+    domain_id = run.get("domain_id") or monitor_run.get_domain_id(supabase, run["domain_key"])
+    started = time.perf_counter()
+    try:
+        with RunLease(supabase, run["id"], run["lease_owner"], run["lease_token"], lease_seconds) as lease:
+            monitor_run.execute_run(supabase, run["id"], domain_id, monitor_args_for(run), lease=lease)
+    except Exception:  # noqa: BLE001
+        # execute_run already recorded the failure, or the run was reclaimed for another owner.
+        return
+    log(f"worker finished run {run['id']} in {time.perf_counter() - started:.2f}s")
+
+
+def process_job(supabase: SupabaseClient, job: Dict[str, Any], lease_seconds: int) -> None:
+    # The lease keeps the job claimed while its script runs; if the worker dies the sweeper requeues it. The
+    # outcome is only written while this claim's token still holds the row.
+    with JobLease(supabase, job["id"], job["lease_owner"], job["lease_token"], lease_seconds) as lease:
+        try:
+            module = importlib.import_module(JOB_ENTRYPOINTS[job["job_type"]])
+            module.main([str(arg) for arg in job.get("args") or []])
+        except (Exception, SystemExit) as exc:  # noqa: BLE001
+            log(f"job {job['id']} ({job['job_type']}) failed: {exc}")
+            log(traceback.format_exc())
+            outcome = {"status": "failed", "error_text": str(exc)}
+        else:
+            outcome = {"status": "completed", "error_text": None}
+    supabase.update(
+        "worker_jobs",
+        filters={"id": f"eq.{job['id']}", **lease.lease_filter},
+        data={**outcome, "finished_at": now_iso()},
+    )
+
+
+def process(supabase: SupabaseClient, work: Work, lease_seconds: int) -> None:
+    kind, row = work
+    if kind == "monitor_run":
+        process_monitor_run(supabase, row, lease_seconds)
+    else:
+        process_job(supabase, row, lease_seconds)
+
+
+def run_worker(
+    supabase: SupabaseClient,
+    concurrency: int,
+    poll_seconds: float,
+    once: bool = False,
+    max_idle_polls: Optional[int] = None,
+    owner: Optional[str] = None,
+    lease_seconds: Optional[int] = None,
+) -> int:
+    owner = owner or lease_owner_id()
+    lease_seconds = lease_seconds or default_lease_seconds()
+    processed = 0
+    idle_polls = 0
+    running: Set[Future] = set()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            running = {future for future in running if not future.done()}
+            claimed = claim_work(supabase, concurrency - len(running), owner, lease_seconds)
+            for work in claimed:
+                running.add(pool.submit(process, supabase, work, lease_seconds))
+            processed += len(claimed)
+
+            if claimed:
+                idle_polls = 0
+                continue
+            if not running:
+                idle_polls += 1
+                if once or (max_idle_polls is not None and idle_polls >= max_idle_polls):
+                    return processed
+                time.sleep(poll_seconds)
+            else:
+                # Poll again as soon as a slot frees up, or after poll_seconds for newly queued work.
+                wait(running, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+
+
+def enqueue_job(supabase: SupabaseClient, job_type: str, job_args: List[str]) -> str:
+    rows = supabase.insert("worker_jobs", [{"job_type": job_type, "args": job_args, "status": "queued"}])
+    return rows[0]["id"]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("DRIFTWATCH_WORKER_CONCURRENCY", "2")),
+        help="Runs and jobs processed at once.",
+    )
+    parser.add_argument("--poll-seconds", type=float, default=float(os.getenv("DRIFTWATCH_WORKER_POLL_SECONDS", "5")))
+    parser.add_argument("--once", action="store_true", help="Drain the queue and exit instead of staying resident.")
+    parser.add_argument(
+        "--enqueue-job",
+        choices=sorted(JOB_ENTRYPOINTS),
+        help="Queue a job for a worker and exit; arguments after -- are passed to the job's script.",
+    )
+    parser.add_argument("job_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    supabase = get_supabase()
+    if args.enqueue_job:
+        job_args = args.job_args[1:] if args.job_args[:1] == ["--"] else args.job_args
+        job_id = enqueue_job(supabase, args.enqueue_job, job_args)
+        log(f"queued {args.enqueue_job} job {job_id} args={job_args}")
+        return
+
+    log(f"worker {lease_owner_id()} started concurrency={args.concurrency}")
+    processed = run_worker(supabase, max(1, args.concurrency), args.poll_seconds, once=args.once)
+    log(
+        f"worker {lease_owner_id()} stopped after {processed} items "
+        f"(baseline cache hits={monitor_run.BASELINE_CACHE.hits} model cache hits={monitor_run.MODEL_CACHE.hits})"
+    )
+
+
+if __name__ == "__main__":
+    main()
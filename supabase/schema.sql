@@ -49,11 +49,18 @@ create table if not exists monitor_runs (
   status text not null default 'queued' check (status in ('queued', 'processing', 'completed', 'failed')),
   drift_status text check (drift_status in ('green', 'yellow', 'red')),
   prediction_drift_score double precision,
+  score_sketch jsonb,
+  params jsonb,
   report_json jsonb,
   html_report_uri text,
   error_text text,
   started_at timestamptz,
   finished_at timestamptz,
+  lease_owner text,
+  lease_expires_at timestamptz,
+  attempt_count integer not null default 0,
+  lease_token uuid,
+  from_queue boolean not null default false,
   created_at timestamptz not null default now(),
   unique(domain_key, baseline_version, batch_id)
 );
@@ -67,7 +74,7 @@ create table if not exists feature_drift_metrics (
   p_value double precision,
   drifted boolean not null,
   severity text,
-  unique(run_id, feature_name, test_name)
+  segment text not null default ''
 );
 
 create table if not exists action_tickets (
@@ -83,6 +90,16 @@ create table if not exists action_tickets (
   created_at timestamptz not null default now()
 );
 
+create table if not exists rolling_drift_state (
+  id uuid primary key default gen_random_uuid(),
+  domain_id uuid not null references domains(id) on delete cascade,
+  baseline_version text not null,
+  state jsonb not null,
+  revision bigint not null default 0,
+  updated_at timestamptz not null default now(),
+  unique(domain_id, baseline_version)
+);
+
 create table if not exists nordea_seed_runs (
   id uuid primary key default gen_random_uuid(),
   profile text not null,
@@ -91,6 +108,239 @@ create table if not exists nordea_seed_runs (
   created_at timestamptz not null default now()
 );
 
+-- Run-history indexes, one per query shape used by the dashboard and the worker scripts.
+create index if not exists monitor_runs_created_at_idx on monitor_runs (created_at desc, id);
+create index if not exists monitor_runs_domain_created_at_idx on monitor_runs (domain_id, created_at desc);
+create index if not exists monitor_runs_processing_started_at_idx
+  on monitor_runs (started_at, id) where status = 'processing';
+create index if not exists monitor_runs_completed_history_idx
+  on monitor_runs (domain_key, baseline_version, created_at, id) where status = 'completed';
+create index if not exists monitor_runs_finished_day_idx on monitor_runs (domain_key, baseline_version, finished_at);
+create index if not exists feature_drift_metrics_run_score_idx on feature_drift_metrics (run_id, score desc nulls last);
+create unique index if not exists feature_drift_metrics_run_feature_test_segment_key
+  on feature_drift_metrics (run_id, feature_name, test_name, segment);
+create index if not exists feature_drift_metrics_run_segment_idx on feature_drift_metrics (run_id, segment) where segment <> '';
+create index if not exists action_tickets_run_created_at_idx on action_tickets (run_id, created_at desc);
+create index if not exists feature_batches_domain_created_at_idx on feature_batches (domain_id, created_at desc);
+
+create table if not exists drift_daily_summary (
+  domain_id uuid references domains(id) on delete cascade,
+  domain_key text not null,
+  baseline_version text not null,
+  day date not null,
+  run_count integer not null default 0,
+  completed_count integer not null default 0,
+  failed_count integer not null default 0,
+  green_count integer not null default 0,
+  yellow_count integer not null default 0,
+  red_count integer not null default 0,
+  mean_prediction_drift_score double precision,
+  max_prediction_drift_score double precision,
+  last_finished_at timestamptz,
+  updated_at timestamptz not null default now(),
+  primary key (domain_key, baseline_version, day)
+);
+
+-- Recomputes one (domain, baseline, UTC day) row from its finished runs. Run finalization calls
+-- this for the day it just touched, so the table stays current without rescanning history.
+create or replace function refresh_drift_daily_summary(p_domain_key text, p_baseline_version text, p_day date)
+returns void
+language sql
+as $$
+  insert into drift_daily_summary as summary (
+    domain_id, domain_key, baseline_version, day, run_count, completed_count, failed_count,
+    green_count, yellow_count, red_count, mean_prediction_drift_score, max_prediction_drift_score,
+    last_finished_at, updated_at
+  )
+  select
+    (select id from domains where key = p_domain_key),
+    p_domain_key,
+    p_baseline_version,
+    p_day,
+    count(*),
+    count(*) filter (where status = 'completed'),
+    count(*) filter (where status = 'failed'),
+    count(*) filter (where drift_status = 'green'),
+    count(*) filter (where drift_status = 'yellow'),
+    count(*) filter (where drift_status = 'red'),
+    avg(prediction_drift_score),
+    max(prediction_drift_score),
+    max(finished_at),
+    now()
+  from monitor_runs
+  where domain_key = p_domain_key
+    and baseline_version = p_baseline_version
+    and finished_at >= (p_day::timestamp at time zone 'UTC')
+    and finished_at < ((p_day + 1)::timestamp at time zone 'UTC')
+  on conflict (domain_key, baseline_version, day) do update set
+    domain_id = excluded.domain_id,
+    run_count = excluded.run_count,
+    completed_count = excluded.completed_count,
+    failed_count = excluded.failed_count,
+    green_count = excluded.green_count,
+    yellow_count = excluded.yellow_count,
+    red_count = excluded.red_count,
+    mean_prediction_drift_score = excluded.mean_prediction_drift_score,
+    max_prediction_drift_score = excluded.max_prediction_drift_score,
+    last_finished_at = excluded.last_finished_at,
+    updated_at = excluded.updated_at;
+$$;
+
+-- Resident worker queue: queued monitor runs carry their CLI options in params; sync, baseline and batch
+-- jobs live in worker_jobs. Claims use FOR UPDATE SKIP LOCKED, so concurrent workers never take the same row.
+create index if not exists monitor_runs_queued_idx on monitor_runs (created_at, id) where status = 'queued';
+
+create table if not exists worker_jobs (
+  id uuid primary key default gen_random_uuid(),
+  job_type text not null check (job_type in ('nordea_sync', 'baseline_refresh', 'generate_batch')),
+  args jsonb not null default '[]'::jsonb,
+  status text not null default 'queued' check (status in ('queued', 'processing', 'completed', 'failed')),
+  error_text text,
+  started_at timestamptz,
+  finished_at timestamptz,
+  lease_owner text,
+  lease_token uuid,
+  lease_expires_at timestamptz,
+  attempt_count integer not null default 0,
+  created_at timestamptz not null default now()
+);
+create index if not exists worker_jobs_queued_idx on worker_jobs (created_at, id) where status = 'queued';
+
+create or replace function claim_monitor_runs(p_owner text, p_lease_seconds integer default 120, p_limit integer default 1)
+returns setof monitor_runs
+language sql
+as $$
+  update monitor_runs
+  set
+    status = 'processing',
+    started_at = now(),
+    lease_owner = p_owner,
+    lease_token = gen_random_uuid(),
+    lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+    attempt_count = attempt_count + 1,
+    from_queue = true
+  where id in (
+    select id from monitor_runs
+    where status = 'queued'
+    order by created_at, id
+    limit p_limit
+    for update skip locked
+  )
+  returning *;
+$$;
+
+create or replace function claim_worker_jobs(p_owner text, p_lease_seconds integer default 120, p_limit integer default 1)
+returns setof worker_jobs
+language sql
+as $$
+  update worker_jobs
+  set
+    status = 'processing',
+    started_at = now(),
+    lease_owner = p_owner,
+    lease_token = gen_random_uuid(),
+    lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+    attempt_count = attempt_count + 1
+  where id in (
+    select id from worker_jobs
+    where status = 'queued'
+    order by created_at, id
+    limit p_limit
+    for update skip locked
+  )
+  returning *;
+$$;
+
+-- Lease-based run ownership: the executing process renews lease_expires_at while it works, and the
+-- sweeper reclaims expired leases in bulk, requeueing runs until attempt_count reaches the retry limit.
+create index if not exists monitor_runs_lease_expiry_idx on monitor_runs (lease_expires_at) where status = 'processing';
+
+drop function if exists renew_run_lease(uuid, text, integer);
+
+create or replace function renew_run_lease(p_run_id uuid, p_token uuid, p_lease_seconds integer default 120)
+returns boolean
+language sql
+as $$
+  with renewed as (
+    update monitor_runs
+    set lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    where id = p_run_id and lease_token = p_token and status = 'processing'
+    returning id
+  )
+  select exists (select 1 from renewed);
+$$;
+
+-- Requeues every processing run whose lease lapsed (or, for runs without a lease, that started more than
+-- p_legacy_timeout_minutes ago) in one statement. Runs already on their last attempt are failed instead, and
+-- so are runs a CLI inserted directly: nothing polls the queue for them, so requeueing would strand them.
+create or replace function reclaim_expired_leases(p_max_attempts integer default 3, p_legacy_timeout_minutes integer default 10)
+returns table (id uuid, status text, domain_key text, baseline_version text, attempt_count integer)
+language sql
+as $$
+  update monitor_runs as run
+  set
+    status = case when not run.from_queue or run.attempt_count >= p_max_attempts then 'failed' else 'queued' end,
+    error_text = case
+      when not run.from_queue then 'lease expired: direct run was not claimed from the queue'
+      when run.attempt_count >= p_max_attempts
+        then 'lease expired: gave up after ' || run.attempt_count || ' attempts'
+      else 'lease expired: requeued after attempt ' || run.attempt_count
+    end,
+    finished_at = case when not run.from_queue or run.attempt_count >= p_max_attempts then now() end,
+    lease_owner = null,
+    lease_token = null,
+    lease_expires_at = null
+  where run.status = 'processing'
+    and (
+      run.lease_expires_at < now()
+      or (run.lease_expires_at is null and run.started_at < now() - make_interval(mins => p_legacy_timeout_minutes))
+    )
+  returning run.id, run.status, run.domain_key, run.baseline_version, run.attempt_count;
+$$;
+
+-- Worker jobs hold the same per-claim leases as queued runs: the worker renews lease_expires_at while the job's
+-- script runs, and the sweeper requeues jobs whose worker died, failing them once attempt_count reaches the limit.
+create index if not exists worker_jobs_lease_expiry_idx on worker_jobs (lease_expires_at) where status = 'processing';
+
+create or replace function renew_job_lease(p_job_id uuid, p_token uuid, p_lease_seconds integer default 120)
+returns boolean
+language sql
+as $$
+  with renewed as (
+    update worker_jobs
+    set lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    where id = p_job_id and lease_token = p_token and status = 'processing'
+    returning id
+  )
+  select exists (select 1 from renewed);
+$$;
+
+-- Requeues every processing job whose lease lapsed (or, for jobs claimed without a lease, that started more
+-- than p_legacy_timeout_minutes ago); jobs already on their last attempt are failed instead.
+create or replace function reclaim_expired_jobs(p_max_attempts integer default 3, p_legacy_timeout_minutes integer default 10)
+returns table (id uuid, status text, job_type text, attempt_count integer)
+language sql
+as $$
+  update worker_jobs as job
+  set
+    status = case when job.attempt_count >= p_max_attempts then 'failed' else 'queued' end,
+    error_text = case
+      when job.attempt_count >= p_max_attempts
+        then 'lease expired: gave up after ' || job.attempt_count || ' attempts'
+      else 'lease expired: requeued after attempt ' || job.attempt_count
+    end,
+    finished_at = case when job.attempt_count >= p_max_attempts then now() end,
+    lease_owner = null,
+    lease_token = null,
+    lease_expires_at = null
+  where job.status = 'processing'
+    and (
+      job.lease_expires_at < now()
+      or (job.lease_expires_at is null and job.started_at < now() - make_interval(mins => p_legacy_timeout_minutes))
+    )
+  returning job.id, job.status, job.job_type, job.attempt_count;
+$$;
+
 alter table domains enable row level security;
 alter table baselines enable row level security;
 alter table feature_batches enable row level security;
@@ -98,6 +348,9 @@ alter table monitor_runs enable row level security;
 alter table feature_drift_metrics enable row level security;
 alter table action_tickets enable row level security;
 alter table nordea_seed_runs enable row level security;
+alter table rolling_drift_state enable row level security;
+alter table drift_daily_summary enable row level security;
+alter table worker_jobs enable row level security;
 
 do $$ begin
   create policy domains_public_read on domains for select to anon using (true);
@@ -134,6 +387,21 @@ do $$ begin
 exception when duplicate_object then null;
 end $$;
 
+do $$ begin
+  create policy rolling_drift_state_public_read on rolling_drift_state for select to anon using (true);
+exception when duplicate_object then null;
+end $$;
+
+do $$ begin
+  create policy drift_daily_summary_public_read on drift_daily_summary for select to anon using (true);
+exception when duplicate_object then null;
+end $$;
+
+do $$ begin
+  create policy worker_jobs_public_read on worker_jobs for select to anon using (true);
+exception when duplicate_object then null;
+end $$;
+
 insert into domains (key, name, enabled)
 values
   ('nordea', 'Nordea Sandbox', true),
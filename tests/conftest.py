@@ -1,7 +1,45 @@
 from pathlib import Path
 import sys
 
+import numpy as np
+import pandas as pd
+import requests
+
 ROOT = Path(__file__).resolve().parent.parent
 SCRIPTS_DIR = ROOT / "scripts"
 if str(SCRIPTS_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+class FakeStorage:
+    # In-memory object storage with the client's upload/download/HEAD surface; missing objects 404.
+    def __init__(self) -> None:
+        self.objects = {}
+        self.content_types = {}
+        self.downloads = []
+
+    def public_object_url(self, bucket, path):
+        return f"https://project.test/storage/v1/object/public/{bucket}/{path}"
+
+    def upload_stream(self, bucket, path, chunks, content_type):
+        self.objects[path] = b"".join(chunks)
+        self.content_types[path] = content_type
+        return self.public_object_url(bucket, path)
+
+    def download_public_bytes(self, bucket, path):
+        self.downloads.append(path)
+        if path not in self.objects:
+            raise requests.HTTPError(f"404 {path}")
+        return self.objects[path]
+
+    def object_etag(self, bucket, path):
+        return "etag" if path in self.objects else None
+
+
+def random_frame(seed: int, rows: int = 50, shift: float = 0.0, wide: bool = False) -> pd.DataFrame:
+    # Column "a" is normal around `shift`, "b" uniform; `wide` adds a wider normal column "c".
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({"a": rng.normal(shift, 1.0, rows), "b": rng.random(rows)})
+    if wide:
+        frame["c"] = rng.normal(0.0, 2.0, rows)
+    return frame
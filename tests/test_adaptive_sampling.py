@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from adaptive_sampling import bootstrap_psi, sampling_strata, sequential_sample, stratified_order
+from drift_stats import compute_psi
+from feature_drift import ReferenceColumns
+from tests.conftest import random_frame
+
+
+def test_every_prefix_of_the_order_is_proportionally_stratified() -> None:
+    strata = np.repeat([0, 1, 2], [500, 300, 200])
+    order = stratified_order(strata, np.random.default_rng(3))
+
+    assert sorted(order.tolist()) == list(range(1000))
+    for prefix in (10, 50, 137, 600):
+        counts = np.bincount(strata[order[:prefix]], minlength=3)
+        assert np.all(np.abs(counts - prefix * np.array([0.5, 0.3, 0.2])) <= 1)
+
+
+def test_strata_cross_time_blocks_with_segment_labels() -> None:
+    labels = pd.Series(["x", "y"] * 50)
+    strata = sampling_strata(100, labels, blocks=5)
+    assert len(np.unique(strata)) == 10
+    assert len(np.unique(sampling_strata(100, blocks=5))) == 5
+
+
+def test_bootstrap_psi_is_centred_on_the_observed_histogram() -> None:
+    expected = np.array([0.25, 0.25, 0.25, 0.25])
+    counts = np.array([[400, 300, 200, 100], [250, 250, 250, 250]])
+    replicates = bootstrap_psi(expected, counts, 500, np.random.default_rng(0))
+
+    assert replicates.shape == (500, 2)
+    point = compute_psi(expected, counts[0] / counts[0].sum())
+    assert abs(np.median(replicates[:, 0]) - point) < 0.02
+    assert replicates[:, 1].max() < 0.05
+
+
+def test_clear_decisions_settle_on_the_first_sample() -> None:
+    reference = ReferenceColumns(random_frame(0, 2000, wide=True))
+    steady = sequential_sample(reference, random_frame(1, 50000, wide=True), confidence=0.95, min_rows=1000, seed=1)
+    shifted_frame = random_frame(2, 50000, shift=2.0, wide=True).assign(c=lambda f: f["c"] + 5)
+    shifted = sequential_sample(reference, shifted_frame, 0.95, 1000, seed=1)
+
+    for rows, report in (steady, shifted):
+        assert report["proxy_settled"] and report["rows_used"] == 1000 and len(rows) == 1000
+        assert report["confidence"] == 0.95 and report["rows_total"] == 50000
+    assert steady[1]["proxy_status"] == "green"
+    assert shifted[1]["proxy_status"] == "red"
+
+
+def test_unsettled_decisions_grow_the_sample_and_small_batches_are_not_sampled() -> None:
+    reference = ReferenceColumns(random_frame(0, 2000, wide=True))
+    # A shift that leaves one column's PSI near the threshold is ambiguous on small samples.
+    current = random_frame(4, 8000, shift=0.35, wide=True)
+    rows, report = sequential_sample(reference, current, confidence=0.95, min_rows=500, seed=2)
+    assert [step["rows"] for step in report["steps"]][:3] == [500, 1000, 2000]
+    assert report["rows_used"] == report["steps"][-1]["rows"]
+    assert rows is None or len(np.unique(rows)) == report["rows_used"]
+
+    rows, report = sequential_sample(reference, random_frame(5, 800, wide=True), confidence=0.95, min_rows=1000)
+    assert rows is None and report["rows_used"] == 800 and not report["steps"]
@@ -0,0 +1,35 @@
+import io
+
+import pandas as pd
+import pytest
+
+from artifacts import artifact_codec, codec_for_path, upload_artifact
+from common import dataframe_csv_chunks
+from monitor_run import load_bytes_from_storage_uri
+from tests.conftest import FakeStorage
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd", None])
+def test_compressed_artifacts_round_trip_through_storage_uri(codec) -> None:
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    storage = FakeStorage()
+    frame = pd.DataFrame({"txn_count_1d": range(5000), "avg_amount_7d": [round(i * 0.37, 2) for i in range(5000)]})
+    plain = frame.to_csv(index=False).encode("utf-8")
+
+    uri = upload_artifact(storage, "bucket", "feature-batches/nordea/b1.csv", dataframe_csv_chunks(frame, 700), "text/csv", codec)
+    path = uri.split("/bucket/", 1)[1]
+
+    assert codec_for_path(path) == codec
+    assert load_bytes_from_storage_uri(storage, "bucket", uri) == plain
+    if codec:
+        assert len(storage.objects[path]) * 2 < len(plain)
+    assert pd.read_csv(io.BytesIO(load_bytes_from_storage_uri(storage, "bucket", uri))).equals(frame)
+
+
+def test_artifact_codec_reads_env(monkeypatch) -> None:
+    monkeypatch.setenv("DRIFTWATCH_ARTIFACT_CODEC", "none")
+    assert artifact_codec() is None
+    monkeypatch.setenv("DRIFTWATCH_ARTIFACT_CODEC", "brotli")
+    with pytest.raises(RuntimeError):
+        artifact_codec()
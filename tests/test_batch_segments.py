@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from batch_segments import SEGMENT_DAYS, read_segmented_batch, write_segmented_batch
+from nordea_sync import build_feature_batch, feature_anchor_days, generate_synthetic_transactions
+from tests.conftest import FakeStorage
+
+
+@pytest.mark.parametrize("codec", ["gzip", "none"])
+def test_consecutive_batches_only_write_new_rows(monkeypatch, codec) -> None:
+    monkeypatch.setenv("DRIFTWATCH_ARTIFACT_CODEC", codec)
+    storage = FakeStorage()
+    transactions = generate_synthetic_transactions("stable_salary", seed=5, days=120)
+    latest = max(tx["date"] for tx in transactions)
+    yesterday = [tx for tx in transactions if tx["date"] < latest]
+
+    first = build_feature_batch(yesterday, rows=40)
+    second = build_feature_batch(transactions, rows=40)
+    _, first_stats = write_segmented_batch(storage, "bucket", "nordea", "b1", first, feature_anchor_days(yesterday, 40))
+    uri, second_stats = write_segmented_batch(
+        storage, "bucket", "nordea", "b2", second, feature_anchor_days(transactions, 40), aliases=("current",)
+    )
+
+    assert first_stats["new_rows"] == 40
+    # Only the partial blocks at either end of the window are written again.
+    assert second_stats["new_rows"] <= 2 * SEGMENT_DAYS
+    assert second_stats["reused_rows"] == 40 - second_stats["new_rows"]
+    assert uri.endswith("feature-batches/nordea/b2.manifest.json")
+    assert storage.objects["feature-batches/nordea/current.manifest.json"] == storage.objects["feature-batches/nordea/b2.manifest.json"]
+
+    for batch_id, frame in (("b1", first), ("b2", second)):
+        manifest = storage.objects[f"feature-batches/nordea/{batch_id}.manifest.json"]
+        restored = read_segmented_batch(storage, "bucket", manifest)
+        # Planned feature dtypes survive the CSV segments, so the batch comes back exactly as built.
+        pd.testing.assert_frame_equal(restored, frame)
+
+    # No shared index is read; a batch reads one object per block of anchor days.
+    assert not any(path.endswith("index.json") for path in storage.objects)
+    storage.downloads.clear()
+    read_segmented_batch(storage, "bucket", storage.objects["feature-batches/nordea/b2.manifest.json"])
+    assert len(storage.downloads) == second_stats["segments"] <= 40 // SEGMENT_DAYS + 2
+
+
+def test_identical_rows_are_stored_once() -> None:
+    storage = FakeStorage()
+    frame = pd.DataFrame({"a": [1.5, 1.5, 2.0], "b": [0.0, 0.0, 1.0]})
+
+    _, stats = write_segmented_batch(storage, "bucket", "nordea", "b1", frame)
+    _, again = write_segmented_batch(storage, "bucket", "nordea", "b2", frame)
+
+    assert stats["new_rows"] == 2
+    assert again["new_rows"] == 0
+    restored = read_segmented_batch(storage, "bucket", storage.objects["feature-batches/nordea/b2.manifest.json"])
+    pd.testing.assert_frame_equal(restored, frame)
@@ -0,0 +1,142 @@
+import re
+
+import pandas as pd
+import requests
+
+from common import SupabaseClient, dataframe_csv_chunks, refresh_daily_summary
+
+
+class _Response:
+    def __init__(self, status_code: int = 200, headers: dict = None) -> None:
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"status={self.status_code}")
+
+
+class _FakeStorage:
+    # Minimal TUS server: accepts half of the first PATCH body and then drops the connection.
+    def __init__(self) -> None:
+        self.simple_posts = []
+        self.created = []
+        self.received = bytearray()
+        self.length = None
+        self.dropped = False
+
+    def post(self, url, headers=None, data=None, timeout=None):
+        if url.endswith("/upload/resumable"):
+            self.created.append(headers)
+            self.length = int(headers["Upload-Length"]) if "Upload-Length" in headers else None
+            return _Response(201, {"Location": "/storage/v1/upload/resumable/upload-1"})
+        self.simple_posts.append((url, data))
+        return _Response(200)
+
+    def head(self, url, headers=None, timeout=None):
+        return _Response(200, {"Upload-Offset": str(len(self.received))})
+
+    def patch(self, url, headers=None, data=None, timeout=None):
+        assert int(headers["Upload-Offset"]) == len(self.received)
+        if "Upload-Length" in headers:
+            self.length = int(headers["Upload-Length"])
+        if not self.dropped:
+            self.dropped = True
+            self.received.extend(data[: len(data) // 2])
+            raise requests.ConnectionError("connection reset")
+        self.received.extend(data)
+        return _Response(204, {"Upload-Offset": str(len(self.received))})
+
+
+def _client(monkeypatch, storage: _FakeStorage) -> SupabaseClient:
+    monkeypatch.setattr("requests.post", storage.post)
+    monkeypatch.setattr("requests.head", storage.head)
+    monkeypatch.setattr("requests.patch", storage.patch)
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    monkeypatch.setattr("common.RESUMABLE_CHUNK_BYTES", 1024)
+    monkeypatch.setenv("DRIFTWATCH_RESUMABLE_THRESHOLD_BYTES", "2048")
+    return SupabaseClient(url="https://project.test", service_key="key")
+
+
+def test_small_uploads_use_a_single_post(monkeypatch) -> None:
+    storage = _FakeStorage()
+    client = _client(monkeypatch, storage)
+
+    uri = client.upload_stream("bucket", "a/b.csv", [b"x,y\n", b"1,2\n"], "text/csv")
+
+    assert uri == "https://project.test/storage/v1/object/public/bucket/a/b.csv"
+    assert storage.simple_posts == [("https://project.test/storage/v1/object/bucket/a/b.csv", b"x,y\n1,2\n")]
+    assert storage.created == []
+
+
+def test_large_file_upload_resumes_a_dropped_chunk(monkeypatch, tmp_path) -> None:
+    storage = _FakeStorage()
+    client = _client(monkeypatch, storage)
+    content = bytes(range(256)) * 20
+    file_path = tmp_path / "report.html"
+    file_path.write_bytes(content)
+    progress = []
+
+    client.upload_file(
+        "bucket", "reports/r.html", str(file_path), "text/html", progress=lambda sent, total: progress.append((sent, total))
+    )
+
+    assert bytes(storage.received) == content
+    assert storage.created[0]["Upload-Length"] == str(len(content))
+    assert progress[-1] == (len(content), len(content))
+    assert [sent for sent, _ in progress] == [1024, 2048, 3072, 4096, 5120]
+
+
+def test_large_stream_defers_length_until_last_chunk(monkeypatch) -> None:
+    storage = _FakeStorage()
+    client = _client(monkeypatch, storage)
+    frame = pd.DataFrame({"a": range(2000), "b": [0.5] * 2000})
+
+    client.upload_stream("bucket", "batch.csv", dataframe_csv_chunks(frame, rows_per_chunk=300), "text/csv")
+
+    assert storage.created[0]["Upload-Defer-Length"] == "1"
+    assert storage.length == len(storage.received)
+    assert bytes(storage.received) == frame.to_csv(index=False).encode("utf-8")
+
+
+def test_select_iter_walks_pages_by_keyset(monkeypatch) -> None:
+    rows = [{"id": f"r{i:03d}", "created_at": f"2026-01-01T00:00:{i // 3:02d}+00:00", "status": "x"} for i in range(25)]
+    calls = []
+
+    def fake_select(self, table, select="*", filters=None, order=None, limit=None):
+        calls.append((select, dict(filters or {}), order, limit))
+        keyset = (filters or {}).get("and", "")
+        after = re.search(r'created_at\.gt\."([^"]*)",and\(created_at\.eq\."[^"]*",id\.gt\."([^"]*)"\)', keyset)
+        remaining = [row for row in rows if after is None or (row["created_at"], row["id"]) > after.groups()]
+        return [{key: row[key] for key in select.split(",")} for row in remaining[:limit]]
+
+    monkeypatch.setattr(SupabaseClient, "select", fake_select)
+    client = SupabaseClient(url="https://project.test", service_key="key")
+
+    seen = list(client.select_iter("monitor_runs", select="id", filters={"and": "(status.eq.x)"}, page_size=10))
+
+    assert [row["id"] for row in seen] == [row["id"] for row in rows]
+    assert len(calls) == 3
+    assert calls[0] == ("id,created_at", {"and": "(status.eq.x)"}, "created_at.asc,id.asc", 10)
+    assert calls[1][1]["and"].startswith("(status.eq.x,or(created_at.gt.")
+
+
+def test_refresh_daily_summary_calls_rpc_and_tolerates_missing_function(monkeypatch) -> None:
+    posts = []
+
+    def fake_post(url, headers=None, data=None, timeout=None):
+        posts.append((url, data))
+        response = _Response(404 if len(posts) > 1 else 204)
+        response.content = b""
+        return response
+
+    monkeypatch.setattr(requests, "post", fake_post)
+    client = SupabaseClient(url="https://project.test", service_key="key")
+
+    refresh_daily_summary(client, "nordea", "v1", day="2026-03-04")
+    refresh_daily_summary(client, "nordea", "v1", day="2026-03-05")
+
+    assert posts[0][0] == "https://project.test/rest/v1/rpc/refresh_drift_daily_summary"
+    assert '"p_day": "2026-03-04"' in posts[0][1]
+    assert len(posts) == 2
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from feature_drift import compute_feature_drift, select_stattest
+from monitor_run import extract_feature_rows, summarize_feature_drift
+
+
+def _frames(rows: int = 200):
+    rng = np.random.default_rng(11)
+    reference = pd.DataFrame(
+        {
+            "steady": rng.normal(0, 1, rows),
+            "shifted": rng.normal(0, 1, rows),
+            "flag": rng.integers(0, 2, rows).astype(float),
+            "bucket": rng.integers(0, 4, rows).astype(float),
+        }
+    )
+    current = pd.DataFrame(
+        {
+            "steady": rng.normal(0, 1, rows),
+            "shifted": rng.normal(2, 1, rows),
+            "flag": rng.integers(0, 2, rows).astype(float),
+            "bucket": rng.integers(0, 4, rows).astype(float),
+        }
+    )
+    return reference, current
+
+
+def test_select_stattest_follows_sample_size_and_cardinality() -> None:
+    small = np.arange(100, dtype=float)
+    large = np.arange(5000, dtype=float)
+    assert select_stattest(small, small) == "ks"
+    binary = np.array([0.0, 1.0] * 50)
+    assert select_stattest(binary, binary[:40]) == "z"
+    assert select_stattest(np.array([0.0, 1.0, 2.0] * 50), binary) == "chisquare"
+    assert select_stattest(large, large) == "wasserstein"
+    assert select_stattest(np.array([0.0, 1.0, 2.0] * 2000), binary) == "jensenshannon"
+
+
+def test_select_stattest_counts_unique_values_across_both_samples() -> None:
+    counts = np.array([0.0, 1.0, 2.0] * 50)
+    assert select_stattest(counts, np.array([3.0, 4.0, 5.0, 6.0])) == "ks"
+    assert select_stattest(np.array([0.0, 1.0, 2.0] * 2000), np.arange(10, dtype=float)) == "wasserstein"
+
+
+def test_parallel_results_match_serial_and_keep_column_order() -> None:
+    reference, current = _frames()
+
+    serial = compute_feature_drift(reference, current, workers=1)
+    threaded = compute_feature_drift(reference, current, workers=3)
+
+    assert list(threaded["drift_by_columns"]) == list(reference.columns)
+    assert threaded == serial
+    assert threaded["drift_by_columns"]["shifted"]["drift_detected"]
+    assert not threaded["drift_by_columns"]["steady"]["drift_detected"]
+
+
+def test_native_result_feeds_summary_and_metric_rows() -> None:
+    reference, current = _frames()
+    result = compute_feature_drift(reference, current, workers=2)
+
+    status, summary = summarize_feature_drift(result)
+    rows = extract_feature_rows("run-1", result)
+
+    assert summary["total_columns"] == 4
+    assert status in {"green", "yellow", "red"}
+    assert [row["feature_name"] for row in rows] == list(reference.columns)
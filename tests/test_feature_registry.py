@@ -0,0 +1,129 @@
+import io
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from feature_registry import (
+    AGGREGATES,
+    FEATURES,
+    Timeline,
+    compute_feature_rows,
+    compute_horizon_features,
+    horizon_columns,
+    parse_horizons,
+    plan_features,
+    resolve_horizons,
+)
+from feature_schema import compute_schema_hash, read_feature_csv
+from nordea_sync import (
+    FEATURE_COLUMNS,
+    build_feature_batch,
+    compute_features_for_anchor,
+    generate_synthetic_transactions,
+)
+
+
+def test_registry_order_matches_feature_columns() -> None:
+    assert list(FEATURES) == FEATURE_COLUMNS
+    assert plan_features().columns == FEATURE_COLUMNS
+
+
+def test_plan_computes_shared_aggregates_once_in_dependency_order() -> None:
+    plan = plan_features(["daily_spend_30d", "rent_ratio", "cashflow_ratio_30d"])
+    names = [aggregate.name for aggregate in plan.aggregates]
+
+    assert len(names) == len(set(names))
+    assert "total_spend" in names and "merchant_spend" not in names
+    for position, name in enumerate(names):
+        assert all(req in names[:position] or req in ("timeline", "anchor_day") for req in AGGREGATES[name].requires)
+
+
+def test_plan_rejects_unknown_features() -> None:
+    with pytest.raises(RuntimeError, match="Unknown features"):
+        plan_features(["daily_spend_30d", "not_a_feature"])
+
+
+def test_subset_matches_full_computation() -> None:
+    tx = generate_synthetic_transactions(scenario="subscription_spike", seed=3, days=90)
+    anchor = max(t["date"] for t in tx)
+    full = compute_features_for_anchor(tx, anchor)
+    subset = compute_feature_rows(tx, [anchor], ["top_merchant_share", "txn_count_7d"])[0]
+
+    assert subset == {name: full[name] for name in ("top_merchant_share", "txn_count_7d")}
+
+
+def test_unsorted_transactions_give_the_same_windows() -> None:
+    anchor = date(2026, 1, 30)
+    tx = [
+        {
+            "ts": datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(days=day),
+            "date": date(2026, 1, 1) + timedelta(days=day),
+            "amount": -10.0 * (day + 1),
+            "merchant": f"shop {day % 4}",
+        }
+        for day in range(40)
+    ]
+    assert compute_feature_rows(tx[::-1], [anchor]) == compute_feature_rows(tx, [anchor])
+
+
+def test_build_feature_batch_accepts_a_feature_subset() -> None:
+    tx = generate_synthetic_transactions(scenario="stable_salary", seed=5, days=60)
+    frame = build_feature_batch(tx, rows=10, features=["txn_count_7d", "rent_ratio"])
+    assert list(frame.columns) == ["txn_count_7d", "rent_ratio"]
+    assert str(frame["txn_count_7d"].dtype) == "uint16"
+
+
+def _brute_force_horizon(tx: list, anchor: date, days: int) -> dict:
+    window = [t for t in tx if anchor - timedelta(days=days - 1) <= t["date"] <= anchor]
+    spend = sum(-t["amount"] for t in window if t["amount"] < 0)
+    income = sum(t["amount"] for t in window if t["amount"] > 0)
+    return {
+        f"daily_spend_{days}d": spend / days,
+        f"daily_income_{days}d": income / days,
+        f"cashflow_ratio_{days}d": income / spend if spend > 0 else 0.0,
+        f"merchant_diversity_{days}d": len({t["merchant"].lower() for t in window}) / len(window) if window else 0.0,
+    }
+
+
+def test_horizon_features_match_per_window_sums() -> None:
+    tx = generate_synthetic_transactions(scenario="income_drop", seed=11, days=160)
+    anchors = sorted({t["date"] for t in tx})[-40:] + [date(2000, 1, 1)]
+    columns = compute_horizon_features(Timeline(tx), anchors, (7, 30, 90))
+
+    assert list(columns) == horizon_columns((7, 30, 90))
+    for position, anchor in enumerate(anchors):
+        for days in (7, 30, 90):
+            for name, expected in _brute_force_horizon(tx, anchor, days).items():
+                assert columns[name][position] == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+def test_thirty_day_horizon_agrees_with_registry_features() -> None:
+    tx = generate_synthetic_transactions(scenario="inflation_shift", seed=2, days=120)
+    anchors = sorted({t["date"] for t in tx})[-20:]
+    columns = compute_horizon_features(Timeline(tx), anchors, (30,))
+    rows = compute_feature_rows(tx, anchors)
+    for name in horizon_columns((30,)):
+        assert columns[name] == pytest.approx([row[name] for row in rows], rel=1e-9)
+
+
+def test_horizons_extend_the_batch_and_its_schema_hash() -> None:
+    tx = generate_synthetic_transactions(scenario="stable_salary", seed=4, days=200)
+    plain = build_feature_batch(tx, rows=30, horizons=())
+    extended = build_feature_batch(tx, rows=30, horizons=(7, 30, 90))
+
+    assert list(extended.columns) == FEATURE_COLUMNS + horizon_columns((7, 90))
+    assert extended[FEATURE_COLUMNS].equals(plain)
+    assert all(str(extended[c].dtype) == "float32" for c in horizon_columns((7, 90)))
+    assert compute_schema_hash(extended) != compute_schema_hash(plain)
+    assert compute_schema_hash(read_feature_csv(io.StringIO(extended.to_csv(index=False)))) == compute_schema_hash(
+        extended
+    )
+
+
+def test_parse_horizons_and_env_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert parse_horizons("90, 7,30 7") == (7, 30, 90)
+    with pytest.raises(RuntimeError, match="Invalid feature horizon"):
+        parse_horizons("7,0")
+    monkeypatch.setenv("DRIFTWATCH_FEATURE_HORIZONS", "90")
+    assert resolve_horizons(None) == (90,)
+    assert resolve_horizons("") == ()
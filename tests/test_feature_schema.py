@@ -0,0 +1,35 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import FEATURE_DTYPES, apply_feature_dtypes, read_feature_csv
+from nordea_sync import FEATURE_COLUMNS, build_feature_batch, generate_synthetic_transactions
+
+
+def test_feature_batches_use_the_declared_dtypes() -> None:
+    frame = build_feature_batch(generate_synthetic_transactions("stable_salary", seed=3, days=150), rows=60)
+
+    assert set(FEATURE_DTYPES) == set(FEATURE_COLUMNS)
+    assert {column: str(dtype) for column, dtype in frame.dtypes.items()} == FEATURE_DTYPES
+    assert frame.memory_usage(index=False).sum() <= 60 * len(FEATURE_COLUMNS) * 8 / 2
+
+
+def test_csv_round_trip_preserves_values_and_dtypes() -> None:
+    frame = build_feature_batch(generate_synthetic_transactions("subscription_spike", seed=9, days=150), rows=40)
+
+    restored = read_feature_csv(io.BytesIO(frame.to_csv(index=False).encode("utf-8")))
+
+    pd.testing.assert_frame_equal(restored, frame)
+
+
+def test_legacy_float_counts_are_narrowed() -> None:
+    legacy = "subscription_count,txn_count_7d,rent_ratio,note\n3.0,18.124,0.25,a\n-1,70000,0.5,b\n"
+
+    restored = read_feature_csv(io.StringIO(legacy))
+
+    assert restored["subscription_count"].tolist() == [3, 0]
+    assert restored["txn_count_7d"].tolist() == [18, np.iinfo(np.uint16).max]
+    assert restored["rent_ratio"].dtype == np.float32
+    assert restored["note"].tolist() == ["a", "b"]
+    assert apply_feature_dtypes(restored) is restored
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from json_stream import JsonArrayStream, JsonPathNotFound
+
+
+PAYLOAD = {
+    "group_header": {"message_identification": "m-1", "nested": [1, {"x": "}]"}]},
+    "response": {
+        "_links": [{"rel": "next", "href": "/v5/accounts/a/transactions?page=2"}],
+        "transactions": [{"amount": "-1.5e2", "text": "café \"quoted\""}, {"amount": "3"}, {}],
+        "continuation_key": "k2",
+    },
+}
+
+
+def _chunks(payload, size):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return [body[start : start + size] for start in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_stream_yields_array_items_and_pagination_skeleton(size) -> None:
+    stream = JsonArrayStream(_chunks(PAYLOAD, size), ["response", "transactions"])
+
+    assert list(stream) == PAYLOAD["response"]["transactions"]
+    assert stream.skeleton == {
+        "response": {"_links": PAYLOAD["response"]["_links"], "continuation_key": "k2"},
+    }
+
+
+def test_stream_follows_list_indexes() -> None:
+    stream = JsonArrayStream(_chunks([{"skip": [9]}, {"items": [1, 2.5, None]}], 5), [1, "items"])
+    assert list(stream) == [1, 2.5, None]
+
+
+def test_stream_raises_when_path_is_missing() -> None:
+    with pytest.raises(JsonPathNotFound):
+        list(JsonArrayStream(_chunks(PAYLOAD, 11), ["response", "booked"]))
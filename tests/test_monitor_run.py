@@ -1,9 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from artifacts import upload_artifact
+from common import dataframe_csv_chunks
+from feature_drift import ReferenceColumns
+from feature_schema import compute_schema_hash
 from monitor_run import (
+    RunInputs,
+    batched_histogram,
+    build_parser,
     combine_status,
+    compute_model_comparison,
+    execute_run,
     extract_feature_rows,
+    html_report_enabled,
+    insert_owned_run,
+    load_baseline_dataframe,
+    parse_version_list,
+    prediction_drift_from_counts,
     prediction_status_from_psi,
+    split_compatible_challengers,
     summarize_feature_drift,
 )
+from nordea_sync import build_feature_batch, generate_synthetic_transactions
+from tests.conftest import FakeStorage, random_frame
+from train_model import BaselineSpec, build_training_frames, train_baseline
 
 
 def _drift_payload(drifted: int, total: int = 10):
@@ -44,3 +66,208 @@ def test_extract_feature_rows_includes_severity() -> None:
     rows = extract_feature_rows("run-1", _drift_payload(drifted=2, total=3))
     assert len(rows) == 3
     assert {row["severity"] for row in rows if row["drifted"]} == {"high"}
+
+
+def test_batched_histogram_matches_numpy_per_row() -> None:
+    rng = np.random.default_rng(7)
+    scores = rng.random((3, 250))
+    scores[0, 0] = 1.0
+    edges = np.linspace(0.0, 1.0, 11)
+
+    counts = batched_histogram(scores, edges)
+
+    for row in range(scores.shape[0]):
+        expected, _ = np.histogram(scores[row], bins=edges)
+        assert counts[row].tolist() == expected.tolist()
+
+
+def test_prediction_drift_from_counts_identical_distribution_is_green() -> None:
+    expected = np.full(10, 0.1)
+    result = prediction_drift_from_counts(expected, np.full(10, 20), np.full(200, 0.5), baseline_mean=0.5)
+
+    assert result["psi"] == 0.0
+    assert result["status"] == "green"
+    assert result["current_distribution"] == expected.tolist()
+
+
+def test_parse_version_list_dedupes_and_strips() -> None:
+    assert parse_version_list(" v2, v3 ,v2,,") == ["v2", "v3"]
+
+
+def test_prediction_drift_within_resampling_noise_is_gated_to_green() -> None:
+    expected = np.full(10, 0.1)
+    counts = np.array([20, 4, 10, 10, 10, 10, 10, 10, 8, 8])
+    noisy = {"p_value": 0.4, "ci_low": 0.05, "ci_high": 0.4}
+
+    reported = prediction_drift_from_counts(expected, counts, np.full(100, 0.5), 0.5, significance=noisy)
+    gated = prediction_drift_from_counts(expected, counts, np.full(100, 0.5), 0.5, significance=noisy, alpha=0.05)
+    significant = prediction_drift_from_counts(
+        expected, counts, np.full(100, 0.5), 0.5, significance={**noisy, "p_value": 0.01}, alpha=0.05
+    )
+
+    assert reported["status"] == "yellow" and reported["psi_p_value"] == 0.4 and reported["psi_ci"] == [0.05, 0.4]
+    assert gated["status"] == "green" and gated["gated_by_psi"]
+    assert significant["status"] == "yellow" and "gated_by_psi" not in significant
+
+
+class _ConstantModel:
+    def __init__(self, score: float) -> None:
+        self.score = score
+
+    def predict_proba(self, features):
+        return np.column_stack([1 - np.full(len(features), self.score), np.full(len(features), self.score)])
+
+
+def test_model_comparison_sketches_only_the_requested_versions() -> None:
+    histogram = {"bins": np.linspace(0, 1, 11).tolist(), "distribution": [0.1] * 10, "mean": 0.5}
+    baselines = [
+        {"baseline_version": version, "model_uri": f"models/{version}", "baseline_predictions_json": histogram}
+        for version in ("v1", "v2")
+    ]
+    current = pd.DataFrame({"daily_spend_30d": np.linspace(0, 1, 50)})
+
+    results = compute_model_comparison(
+        None, baselines, current, models={"v1": _ConstantModel(0.3), "v2": _ConstantModel(0.7)}, sketch_versions=("v1",)
+    )
+
+    assert "score_sketch" in results["v1"]
+    assert "score_sketch" not in results["v2"]
+
+
+def test_challengers_with_another_schema_are_split_out() -> None:
+    challengers = [{"baseline_version": "v2", "schema_hash": "abc"}, {"baseline_version": "v3", "schema_hash": "old"}]
+
+    compatible, incompatible = split_compatible_challengers(challengers, "abc")
+
+    assert [item["baseline_version"] for item in compatible] == ["v2"]
+    assert incompatible == {"v3": "old"}
+
+
+def test_native_engine_skips_the_html_report_unless_requested(monkeypatch) -> None:
+    monkeypatch.delenv("DRIFTWATCH_UPLOAD_HTML", raising=False)
+    assert html_report_enabled("evidently")
+    assert not html_report_enabled("native")
+
+    monkeypatch.setenv("DRIFTWATCH_UPLOAD_HTML", "true")
+    assert html_report_enabled("native")
+
+
+def test_direct_runs_hold_their_own_lease_token() -> None:
+    class _Inserts:
+        def __init__(self) -> None:
+            self.rows = []
+
+        def insert(self, table, rows):
+            self.rows.extend(rows)
+            return rows
+
+    supabase = _Inserts()
+    first = insert_owned_run(supabase, {"id": "run-1"})
+    second = insert_owned_run(supabase, {"id": "run-2"})
+
+    assert first.owner == second.owner
+    assert first.token != second.token
+    assert supabase.rows[0]["lease_token"] == first.token
+    assert "from_queue" not in supabase.rows[0]
+    assert first.lease_filter == {"lease_token": f"eq.{first.token}"}
+
+
+class _BaselineStore(FakeStorage):
+    def __init__(self, baseline_row=None) -> None:
+        super().__init__()
+        self.baseline_rows = [baseline_row] if baseline_row else []
+        self.upserts = []
+
+    def select(self, table, select="*", filters=None, order=None, limit=None):
+        return self.baseline_rows
+
+    def upsert(self, table, rows, on_conflict):
+        self.upserts.extend(rows)
+        return rows
+
+
+def test_baseline_falls_back_to_the_compressed_default_path(monkeypatch) -> None:
+    monkeypatch.setenv("DRIFTWATCH_ARTIFACT_CODEC", "gzip")
+    supabase = _BaselineStore({"storage_uri": "https://project.test/storage/v1/object/public/other/missing.csv"})
+    frame = random_frame(0, 40)
+    chunks = dataframe_csv_chunks(frame)
+    upload_artifact(supabase, "driftwatch-artifacts", "baselines/fallback/v1.csv", chunks, "text/csv", "gzip")
+
+    upserted, reference, source = load_baseline_dataframe(supabase, "d1", "fallback", "v1")
+
+    assert source == "default_baseline_path"
+    assert reference.frame[["a", "b"]].round(6).equals(frame.round(6))
+    assert upserted["storage_uri"].endswith("/driftwatch-artifacts/baselines/fallback/v1.csv.gz")
+
+
+def test_registered_baseline_that_cannot_load_is_not_replaced_by_demo_data(monkeypatch) -> None:
+    monkeypatch.setenv("DRIFTWATCH_ARTIFACT_CODEC", "gzip")
+    gone = "https://project.test/storage/v1/object/public/driftwatch-artifacts/gone.csv"
+    registered = _BaselineStore({"storage_uri": gone})
+
+    with pytest.raises(RuntimeError, match="registered but could not be loaded"):
+        load_baseline_dataframe(registered, "d1", "registered", "v1")
+    assert registered.objects == {} and registered.upserts == []
+
+    fresh = _BaselineStore()
+    _, _, source = load_baseline_dataframe(fresh, "d1", "fresh", "v1")
+    assert source.startswith("demo_fallback")
+    assert list(fresh.objects) == ["baselines/fresh/v1.csv.gz"]
+
+
+class _RunTable:
+    def __init__(self) -> None:
+        self.updates = []
+
+    def select(self, table, select="*", filters=None, order=None, limit=None):
+        return []
+
+    def upsert(self, table, rows, on_conflict):
+        return rows
+
+    def insert(self, table, rows):
+        return rows
+
+    def update(self, table, filters, data):
+        self.updates.append(data)
+        return [data]
+
+    def rpc(self, function, params=None):
+        return None
+
+    def report(self):
+        return [data for data in self.updates if "report_json" in data][-1]["report_json"]
+
+
+def test_sampling_report_marks_the_psi_proxy_next_to_the_run_status(monkeypatch) -> None:
+    monkeypatch.setenv("DRIFTWATCH_UPLOAD_HTML", "false")
+    spec = BaselineSpec("v1", "stable_salary", 42, 600)
+    trained = train_baseline(spec, build_training_frames("stable_salary", 42, [600])[600])
+    current = build_feature_batch(generate_synthetic_transactions("stable_salary", seed=7, days=5100), rows=5000)
+    baseline = {
+        "id": "baseline-1",
+        "baseline_version": "v1",
+        "schema_hash": compute_schema_hash(trained.baseline_df),
+        "model_uri": "unused",
+        "baseline_predictions_json": trained.prediction_hist,
+    }
+    inputs = RunInputs(
+        baseline=baseline,
+        reference=ReferenceColumns(trained.baseline_df),
+        baseline_source="test",
+        current_df=current,
+        current_source="test",
+        models={"v1": trained.model},
+    )
+    args = build_parser().parse_args(
+        ["--drift-engine", "native", "--sampling", "sequential", "--sample-min-rows", "800", "--psi-resamples", "0"]
+    )
+
+    supabase = _RunTable()
+    status = execute_run(supabase, "run-1", "d1", args, inputs=inputs)
+    sampling = supabase.report()["sampling"]
+
+    assert sampling["rows_used"] < 5000 and sampling["proxy_status"] in {"green", "yellow", "red"}
+    assert "proxy_rule" in sampling and "status" not in sampling and "settled" not in sampling
+    assert sampling["drift_status"] == status
+    assert sampling["proxy_agrees"] == (sampling["proxy_status"] == status)
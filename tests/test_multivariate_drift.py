@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from feature_drift import ReferenceColumns
+from multivariate_drift import block_sums, compute_multivariate_drift
+from nordea_sync import build_feature_batch, generate_synthetic_transactions
+
+
+def _joint(seed: int, rows: int, rho: float) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    income = rng.normal(size=rows)
+    frame = pd.DataFrame(
+        {
+            "daily_income_30d": income,
+            "cashflow_ratio_30d": rho * income + np.sqrt(1 - rho**2) * rng.normal(size=rows),
+        }
+    )
+    for index in range(6):
+        frame[f"other_{index}"] = rng.normal(size=rows)
+    return frame
+
+
+def test_relationship_shift_with_unchanged_marginals_is_detected() -> None:
+    reference = ReferenceColumns(_joint(0, 2000, rho=0.8))
+
+    steady = compute_multivariate_drift(reference, _joint(1, 600, rho=0.8), budget_seconds=5.0, seed=1)
+    flipped = compute_multivariate_drift(reference, _joint(2, 600, rho=-0.8), budget_seconds=5.0, seed=1)
+
+    assert not steady["drift_detected"] and steady["p_value"] > 0.05
+    assert flipped["drift_detected"] and flipped["p_value"] < 0.01
+    assert flipped["statistic"] > steady["statistic"]
+    assert flipped["permutations"] == 200 and not flipped["budget_exhausted"]
+
+
+def test_large_batches_are_capped_and_the_budget_stops_permutations() -> None:
+    reference = ReferenceColumns(_joint(0, 2000, rho=0.8))
+
+    exhausted = compute_multivariate_drift(
+        reference, _joint(3, 20000, rho=-0.8), budget_seconds=0.0, seed=1, max_rows=3000
+    )
+    capped = compute_multivariate_drift(reference, _joint(3, 20000, rho=-0.8), budget_seconds=5.0, seed=1, max_rows=3000)
+
+    assert exhausted["current_rows"] == 3000 and exhausted["current_rows_total"] == 20000
+    assert exhausted["budget_exhausted"] and exhausted["permutations"] == 0
+    assert exhausted["p_value"] is None and not exhausted["drift_detected"]
+    assert capped["drift_detected"] and not capped["budget_exhausted"]
+
+
+def test_block_sums_cut_wrapping_blocks_of_equal_size() -> None:
+    features = np.arange(50, dtype=float)[:, None] * np.ones((1, 3))
+
+    sums = block_sums(features, size=20, phase=7)
+
+    assert sums.shape == (3, 3)
+    assert sums[2].tolist() == [float(((7 + np.arange(40, 60)) % 50).sum())] * 3
+
+
+def test_a_later_window_of_the_same_population_is_not_flagged() -> None:
+    # Overlapping 30-day windows make consecutive rows nearly equal; relabelling single rows flagged every
+    # one of these no-drift windows.
+    flagged = 0
+    for seed in range(8):
+        tx = generate_synthetic_transactions("stable_salary", seed=seed, days=600)
+        frame = build_feature_batch(tx, rows=540, horizons=())
+        reference = ReferenceColumns(frame.iloc[:360].reset_index(drop=True))
+        current = frame.iloc[420:].reset_index(drop=True)
+        result = compute_multivariate_drift(reference, current, budget_seconds=5.0, seed=seed, block_rows=30)
+        flagged += result["drift_detected"]
+
+    assert flagged <= 2
+
+
+def test_results_are_reproducible_and_missing_columns_skip_the_test() -> None:
+    reference = ReferenceColumns(_joint(0, 500, rho=0.8))
+    current = _joint(4, 200, rho=0.8)
+
+    first = compute_multivariate_drift(reference, current, budget_seconds=5.0, seed=7)
+    second = compute_multivariate_drift(reference, current, budget_seconds=5.0, seed=7)
+
+    assert first["p_value"] == second["p_value"] and first["bandwidth"] == second["bandwidth"]
+    assert compute_multivariate_drift(reference, current.drop(columns=["other_0"]), budget_seconds=5.0) is None
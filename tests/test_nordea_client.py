@@ -0,0 +1,79 @@
+import threading
+import time
+
+import nordea_client
+from nordea_client import NordeaConfig, fetch_access_token, read_token_cache
+
+
+class _Response:
+    def __init__(self, status_code: int, payload: dict) -> None:
+        self.status_code = status_code
+        self._payload = payload
+        self.text = str(payload)
+        self.headers = {"Content-Type": "application/json"}
+
+    def json(self) -> dict:
+        return self._payload
+
+
+def _config() -> NordeaConfig:
+    return NordeaConfig(
+        env="sandbox",
+        bypass_signature=False,
+        token_url="https://example.test/token",
+        api_base_url="https://example.test",
+        client_id="client",
+        client_secret="secret",
+    )
+
+
+def _install_token_endpoint(monkeypatch, tmp_path, accept_basic_only: bool = False, expires_in: int = 3600):
+    calls = []
+
+    def fake_post(url, headers, data, auth, timeout):
+        calls.append(auth)
+        time.sleep(0.01)
+        if accept_basic_only and auth is None:
+            return _Response(401, {"error": "unauthorized"})
+        return _Response(200, {"access_token": f"token-{len(calls)}", "expires_in": expires_in})
+
+    monkeypatch.setenv("NORDEA_TOKEN_CACHE_PATH", str(tmp_path / "token.json"))
+    monkeypatch.setattr(nordea_client.requests, "post", fake_post)
+    return calls
+
+
+def test_cached_token_is_reused_until_expiry(monkeypatch, tmp_path) -> None:
+    calls = _install_token_endpoint(monkeypatch, tmp_path)
+
+    first = fetch_access_token(_config())
+    second = fetch_access_token(_config())
+
+    assert first == second == "token-1"
+    assert len(calls) == 1
+
+
+def test_refresh_uses_remembered_auth_style_in_one_request(monkeypatch, tmp_path) -> None:
+    calls = _install_token_endpoint(monkeypatch, tmp_path, accept_basic_only=True, expires_in=30)
+
+    fetch_access_token(_config())
+    assert calls == [None, ("client", "secret")]
+
+    # expires_in is inside the refresh margin, so the next call refreshes.
+    fetch_access_token(_config())
+    assert calls[2:] == [("client", "secret")]
+    entry = next(iter(read_token_cache(tmp_path / "token.json").values()))
+    assert entry["auth_style"] == "basic_auth"
+
+
+def test_concurrent_callers_share_one_refresh(monkeypatch, tmp_path) -> None:
+    calls = _install_token_endpoint(monkeypatch, tmp_path)
+    tokens = []
+
+    threads = [threading.Thread(target=lambda: tokens.append(fetch_access_token(_config()))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert set(tokens) == {"token-1"}
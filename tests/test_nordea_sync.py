@@ -0,0 +1,241 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from nordea_sync import (
+    BULK_NORMALIZE_MIN_RECORDS,
+    TokenBucket,
+    TransactionPathCache,
+    collect_sync_batch,
+    fetch_accounts_concurrently,
+    next_page_request,
+    normalize_transaction,
+    normalize_transactions,
+)
+from transaction_store import TransactionStore, transaction_id
+
+
+class _Response:
+    def __init__(self, payload: dict) -> None:
+        self.status_code = 200
+        self._payload = payload
+        self.text = ""
+        self.headers = {"Content-Type": "application/json"}
+
+    def json(self) -> dict:
+        return self._payload
+
+    def iter_content(self, chunk_size: int = 1):
+        body = json.dumps(self._payload).encode("utf-8")
+        for start in range(0, len(body), 16):
+            yield body[start : start + 16]
+
+    def close(self) -> None:
+        pass
+
+
+def _tx(day: str, amount: str) -> dict:
+    return {"bookingDate": day, "amount": amount, "creditDebitIndicator": "DBIT", "merchantName": "ICA"}
+
+
+PAGES = {
+    ("acc-1", None): {"response": {"transactions": [_tx("2026-01-10", "10")], "continuation_key": "k2"}},
+    ("acc-1", "k2"): {
+        "response": {
+            "transactions": [_tx("2026-01-11", "11")],
+            "_links": [{"rel": "next", "href": "/v5/accounts/acc-1/transactions?page=3"}],
+        }
+    },
+    ("acc-1", "page3"): {"response": {"transactions": [_tx("2026-01-12", "12")]}},
+    ("acc-2", None): {"response": {"transactions": [_tx("2026-01-09", "9")]}},
+}
+
+
+def _fake_get(self, url, headers=None, params=None, timeout=None, stream=False):
+    account_id = url.split("/accounts/")[1].split("/")[0]
+    if url.endswith("page=3"):
+        return _Response(PAGES[(account_id, "page3")])
+    return _Response(PAGES[(account_id, (params or {}).get("continuation_key"))])
+
+
+def test_next_page_request_reads_links_and_continuation_keys() -> None:
+    url = "https://api.test/v5/accounts/a/transactions"
+    assert next_page_request({"continuation_key": "abc"}, url) == (url, {"continuation_key": "abc"})
+    assert next_page_request({"_links": [{"rel": "next", "href": "/v5/x?p=2"}]}, url) == ("https://api.test/v5/x?p=2", None)
+    assert next_page_request({"response": {"transactions": []}}, url) is None
+
+
+def test_fetch_accounts_follows_pages_for_every_account(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr("requests.Session.get", _fake_get)
+    monkeypatch.setenv("NORDEA_PATH_CACHE_PATH", str(tmp_path / "paths.json"))
+
+    from_dates = {"acc-1": date(2026, 1, 1), "acc-2": date(2026, 1, 1)}
+    results = fetch_accounts_concurrently("https://api.test/v5", ["acc-1", "acc-2"], {}, from_dates, date(2026, 1, 31))
+
+    assert [result["account_id"] for result in results] == ["acc-1", "acc-2"]
+    assert results[0]["pages"] == 3
+    assert [tx["amount"] for tx in results[0]["normalized"]] == [-10.0, -11.0, -12.0]
+    assert results[1]["records"] == 1
+    assert all(result["seconds"] >= 0 for result in results)
+
+
+def test_fetch_streams_pages_once_the_transaction_path_is_known(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr("requests.Session.get", _fake_get)
+    monkeypatch.setenv("NORDEA_PATH_CACHE_PATH", str(tmp_path / "paths.json"))
+    api_base = "https://stream.test/v5"
+    cache_file = tmp_path / "paths.json"
+    window = ({"acc-1": date(2026, 1, 1)}, date(2026, 1, 31))
+
+    first = fetch_accounts_concurrently(api_base, ["acc-1"], {}, *window, TransactionPathCache(cache_file))
+    endpoint = f"{api_base}/accounts/{{account_id}}/transactions"
+    assert TransactionPathCache(cache_file).get(endpoint) == ["response", "transactions"]
+
+    # A fresh cache reads the persisted path, so the second sync streams every page.
+    second = fetch_accounts_concurrently(api_base, ["acc-1"], {}, *window, TransactionPathCache(cache_file))
+    assert second[0]["pages"] == 3
+    assert [tx["amount"] for tx in second[0]["normalized"]] == [tx["amount"] for tx in first[0]["normalized"]]
+    # Streamed pages keep their transactions, so the raw bundle matches the unstreamed one.
+    assert second[0]["payloads"] == first[0]["payloads"]
+    assert second[0]["payloads"][0] == PAGES[("acc-1", None)]
+    assert TransactionPathCache(tmp_path / "other.json").get(endpoint) is None
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_limits_burst() -> None:
+    clock = _FakeClock()
+    bucket = TokenBucket(rate_per_second=4, capacity=2, clock=clock, sleep=clock.sleep)
+    acquired_at = []
+    for _ in range(10):
+        bucket.acquire()
+        acquired_at.append(clock.now)
+
+    # The first two requests use the burst capacity; each later one waits a quarter second for a token.
+    assert acquired_at[:2] == [0.0, 0.0]
+    assert clock.sleeps == pytest.approx([0.25] * 8)
+    assert acquired_at[-1] == pytest.approx(2.0)
+    assert (len(acquired_at) - 2) / acquired_at[-1] == pytest.approx(4.0)
+
+
+def _normalized(day: date, tx_id: str, amount: float) -> dict:
+    ts = datetime(day.year, day.month, day.day, 12, 0, tzinfo=timezone.utc)
+    return {"ts": ts, "date": day, "amount": amount, "merchant": "ICA", "raw": {"transactionId": tx_id}}
+
+
+def test_transaction_store_dedupes_and_advances_watermark(tmp_path) -> None:
+    store = TransactionStore(root=tmp_path)
+    first = [_normalized(date(2026, 1, 10), "t1", -10.0), _normalized(date(2026, 1, 11), "t2", -11.0)]
+    second = [_normalized(date(2026, 1, 11), "t2", -11.0), _normalized(date(2026, 1, 12), "t3", -12.0)]
+
+    assert len(store.append("acc-1", first)) == 2
+    assert store.watermark_date("acc-1") == date(2026, 1, 11)
+    assert [tx["raw"]["transactionId"] for tx in store.append("acc-1", second)] == ["t3"]
+    assert store.watermark_date("acc-1") == date(2026, 1, 12)
+
+    loaded = store.load_transactions(["acc-1"], since=date(2026, 1, 11), until=date(2026, 1, 31))
+    assert [tx["amount"] for tx in loaded] == [-11.0, -12.0]
+    assert loaded[0]["date"] == date(2026, 1, 11)
+
+
+def test_transaction_id_falls_back_to_content_hash() -> None:
+    assert transaction_id({"entryReference": "e-1"}) == "e-1"
+    assert transaction_id({"amount": "1", "bookingDate": "2026-01-01"}) == transaction_id(
+        {"bookingDate": "2026-01-01", "amount": "1"}
+    )
+    assert transaction_id({"amount": "1"}, occurrence=1) != transaction_id({"amount": "1"})
+
+
+def test_transaction_store_keeps_identical_transactions_without_ids(tmp_path) -> None:
+    store = TransactionStore(root=tmp_path)
+    ts = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+    coffee = {"ts": ts, "date": ts.date(), "amount": -3.5, "merchant": "Cafe", "raw": {"amount": "-3.5"}}
+
+    assert len(store.append("acc-1", [coffee, dict(coffee)])) == 2
+    # A re-fetch of the same day dedupes both, and a third identical purchase is still new.
+    assert store.append("acc-1", [coffee, dict(coffee)]) == []
+    assert len(store.append("acc-1", [coffee, dict(coffee), dict(coffee)])) == 1
+    assert len(store.read_partition("acc-1", ts.date())) == 3
+    assert store.read_watermark("acc-1") == {"last_booked_date": "2026-01-10"}
+
+
+def test_bulk_normalizer_matches_per_record_path() -> None:
+    odd = [
+        {"bookingDateTime": "2026-01-05T10:15:00Z", "amount": " 12,50 ", "creditDebitIndicator": "DBIT"},
+        {"bookingDateTime": "2026-01-05T10:15:00+02:00", "transactionAmount": {"amount": "7.25"}, "type": "credit"},
+        {"bookingDateTime": "not a date", "valueDate": "2026-01-06", "amount": -3, "creditDebitIndicator": "CRDT"},
+        {"bookingDate": "2026-1-7", "amount": "4"},
+        {"bookingDate": datetime(2026, 1, 8, 9, 30), "amount": 5.5},
+        {"bookingDate": "1500-01-01", "amount": "1"},
+        {"bookingDate": "2026-01-09", "amount": "n/a"},
+        {"bookingDate": "2025-12-31", "amount": "2"},
+        {"date": "2026-01-10T08:00:00", "transactionAmount": {"value": "9"}, "merchantName": " Coop "},
+        {"amount": "3"},
+    ]
+    records = [_tx(f"2026-01-{day:02d}", str(day)) for day in range(1, 29)] + odd
+    from_date = date(2026, 1, 1)
+
+    bulk = normalize_transactions(records, from_date)
+    slow = [item for item in (normalize_transaction(tx, from_date) for tx in records) if item is not None]
+
+    assert len(records) >= BULK_NORMALIZE_MIN_RECORDS
+    assert [(tx["ts"], tx["amount"], tx["merchant"]) for tx in bulk] == [
+        (tx["ts"], tx["amount"], tx["merchant"]) for tx in slow
+    ]
+    assert all(tx["ts"].tzinfo == timezone.utc for tx in bulk)
+
+
+def test_live_sync_fetches_enough_history_for_the_longest_horizon(monkeypatch, tmp_path) -> None:
+    today = datetime.now(timezone.utc).date()
+    requested = []
+
+    def daily_transactions(self, url, headers=None, params=None, timeout=None, stream=False):
+        requested.append(date.fromisoformat(params["fromDate"]))
+        day, records = requested[-1], []
+        while day <= today:
+            records.append(_tx(day.isoformat(), "25"))
+            day += timedelta(days=1)
+        return _Response({"response": {"transactions": records}})
+
+    def accounts_or_transactions(url, headers, params=None, session=None):
+        if url.endswith("/accounts"):
+            return {"accounts": [{"accountId": "acc-1"}]}
+        return daily_transactions(session, url, params=params).json()
+
+    monkeypatch.setattr("requests.Session.get", daily_transactions)
+    monkeypatch.setattr("nordea_sync.http_get_json", accounts_or_transactions)
+    monkeypatch.setenv("NORDEA_LIVE_READ", "true")
+    monkeypatch.setenv("NORDEA_ACCESS_TOKEN", "token")
+    monkeypatch.setenv("NORDEA_PATH_CACHE_PATH", str(tmp_path / "paths.json"))
+    monkeypatch.setenv("NORDEA_TX_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.delenv("NORDEA_SYNC_LOOKBACK_DAYS", raising=False)
+    # rows + longest window - 1 = 10 + 90 - 1 days of transactions back from today.
+    history_start = today - timedelta(days=99)
+
+    monkeypatch.setenv("NORDEA_INCREMENTAL_SYNC", "false")
+    batch = collect_sync_batch("nordea", "b1", "stable_salary", rows=10, seed=1, horizons=(7, 30, 90))
+    assert batch["source_mode"] == "live" and requested == [history_start]
+
+    # A store filled by a shorter earlier sync is backfilled once, then resumes from its watermark.
+    monkeypatch.setenv("NORDEA_INCREMENTAL_SYNC", "true")
+    store = TransactionStore(root=tmp_path / "store" / "nordea")
+    store.append("acc-1", [_normalized(today - timedelta(days=1), "t1", -5.0)])
+    store.record_fetch("acc-1", today - timedelta(days=30))
+    requested.clear()
+    for batch_id in ("b2", "b3"):
+        batch = collect_sync_batch("nordea", batch_id, "stable_salary", rows=10, seed=1, horizons=(7, 30, 90))
+        assert batch["source_mode"] == "live"
+    assert requested == [history_start, today]
+    assert store.fetched_since("acc-1") == history_start
+    assert batch["frame"]["daily_spend_90d"].notna().all()
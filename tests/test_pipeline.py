@@ -0,0 +1,70 @@
+import threading
+
+import monitor_run
+import pipeline
+from tests.conftest import FakeStorage
+
+
+class _FakeSupabase(FakeStorage):
+    def __init__(self) -> None:
+        super().__init__()
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.run_updates = []
+
+    def select(self, table, select="*", filters=None, order=None, limit=None):
+        if table == "domains":
+            return [{"id": "domain-1", "key": "nordea"}]
+        return []
+
+    def upsert(self, table, rows, on_conflict):
+        with self.lock:
+            stored = [{**row, "id": f"{table}-{len(self.rows.get(table, [])) + 1}"} for row in rows]
+            self.rows.setdefault(table, []).extend(stored)
+            return stored
+
+    def insert(self, table, rows):
+        self.rows.setdefault(table, []).extend(rows)
+        return rows
+
+    def update(self, table, filters, data):
+        if table == "monitor_runs":
+            self.run_updates.append((filters, data))
+        return [data]
+
+    def rpc(self, function, params=None):
+        return True
+
+    def upload_stream(self, bucket, path, chunks, content_type):
+        with self.lock:
+            return super().upload_stream(bucket, path, chunks, content_type)
+
+    def upload_file(self, bucket, path, file_path, content_type):
+        with open(file_path, "rb") as handle:
+            return self.upload_stream(bucket, path, [handle.read()], content_type)
+
+
+def test_pipeline_monitors_in_memory_and_persists_in_background(monkeypatch) -> None:
+    monkeypatch.setenv("DRIFTWATCH_UPLOAD_HTML", "false")
+    supabase = _FakeSupabase()
+    argv = ["--batch-id", "b-1", "--rows", "60", "--seed", "7", "--refresh-baseline", "--baseline-rows", "120"]
+    args, monitor_argv = pipeline.build_parser().parse_known_args([*argv, "--drift-engine", "native"])
+    monitor_args = monitor_run.build_parser().parse_args(
+        [*monitor_argv, "--domain", args.domain, "--baseline-version", args.baseline_version, "--batch-id", args.batch_id]
+    )
+
+    result = pipeline.run_pipeline(supabase, args, monitor_args)
+
+    assert result["drift_status"] in {"green", "yellow", "red"}
+    assert monitor_args.drift_engine == "native"
+    # Nothing the pipeline produced is read back from Storage.
+    assert supabase.downloads == []
+    assert "models/nordea/v1/model.joblib" in supabase.objects
+    assert any(path.startswith("feature-batches/nordea/b-1") for path in supabase.objects)
+
+    completed = supabase.run_updates[-1][1]
+    assert completed["status"] == "completed"
+    assert completed["feature_batch_id"] == "feature_batches-1"
+    assert completed["baseline_id"] == "baselines-1"
+    assert completed["prediction_drift_score"] is not None
+    assert completed["report_json"]["source"]["baseline"] == "pipeline.trained"
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from feature_drift import ReferenceColumns
+from nordea_sync import build_feature_batch, generate_synthetic_transactions
+from psi_significance import (
+    block_histograms,
+    feature_psi_significance,
+    gate_feature_drift,
+    prediction_psi_significance,
+    psi_significance,
+)
+
+
+def test_block_histograms_cut_wrapping_blocks_of_equal_size() -> None:
+    rng = np.random.default_rng(0)
+    bins = rng.integers(0, 4, size=(50, 3))
+
+    counts = block_histograms(bins, 4, size=20, phase=7)
+
+    assert counts.shape == (3, 3, 4)
+    assert counts.sum(axis=2).tolist() == [[20] * 3] * 3
+    rows = (7 + np.arange(40, 60)) % 50
+    for column in range(3):
+        assert counts[2, column].tolist() == np.bincount(bins[rows, column], minlength=4).tolist()
+
+
+def test_small_batch_noise_is_not_significant_but_a_real_shift_is() -> None:
+    rng = np.random.default_rng(1)
+    reference = rng.integers(0, 10, size=(2000, 1))
+    steady = psi_significance(reference, rng.integers(0, 10, size=(100, 1)), 10, 500, rng)
+    shifted = psi_significance(reference, rng.integers(3, 10, size=(100, 1)), 10, 500, rng)
+
+    assert steady["p_value"][0] > 0.05
+    assert shifted["p_value"][0] < 0.01
+    assert shifted["ci_low"][0] > steady["ci_high"][0]
+
+
+def test_null_p_values_are_roughly_uniform_across_columns() -> None:
+    rng = np.random.default_rng(2)
+    frame = pd.DataFrame(rng.normal(size=(3000, 40)), columns=[f"c{index}" for index in range(40)])
+    reference = ReferenceColumns(frame.iloc[:2000])
+
+    significance = feature_psi_significance(reference, frame.iloc[2000:2200], 400, rng)
+    p_values = np.array([values["p_value"] for values in significance.values()])
+
+    assert len(p_values) == 40
+    assert (p_values < 0.05).mean() <= 0.15
+    assert 0.3 < np.median(p_values) < 0.7
+
+
+def test_a_later_window_of_the_same_population_is_not_significant() -> None:
+    # Overlapping 30-day windows make consecutive rows nearly equal; row-level resampling read that as
+    # far less noise than the series has and flagged most of these no-drift features.
+    p_values = []
+    for seed in range(3):
+        tx = generate_synthetic_transactions("stable_salary", seed=seed, days=600)
+        frame = build_feature_batch(tx, rows=540, horizons=())
+        reference = ReferenceColumns(frame.iloc[:360].reset_index(drop=True))
+        current = frame.iloc[420:].reset_index(drop=True)
+        significance = feature_psi_significance(reference, current, 400, np.random.default_rng(seed), block_rows=30)
+        p_values += [values["p_value"] for values in significance.values()]
+
+    assert len(p_values) >= 12
+    assert (np.array(p_values) < 0.05).mean() <= 0.2
+
+
+def test_large_batches_stay_consistent() -> None:
+    rng = np.random.default_rng(3)
+    edges = np.linspace(0.0, 1.0, 11)
+    expected = np.full(10, 0.1)
+
+    small = prediction_psi_significance(expected, edges, rng.random(500), 400, 300, rng)
+    large = prediction_psi_significance(expected, edges, rng.beta(2, 2, 50000), 400, 300, rng)
+
+    assert small["p_value"] > 0.05
+    assert large["p_value"] < 0.01 and large["ci_low"] <= large["psi"] <= large["ci_high"] + 1e-9
+
+
+def test_gate_feature_drift_drops_columns_within_noise() -> None:
+    drift_result = {
+        "number_of_columns": 3,
+        "drift_by_columns": {
+            "a": {"drift_detected": True, "drift_score": 0.3},
+            "b": {"drift_detected": True, "drift_score": 0.5},
+            "c": {"drift_detected": False, "drift_score": 0.01},
+        },
+    }
+    significance = {
+        "a": {"psi": 0.1, "p_value": 0.3, "ci_low": 0.0, "ci_high": 0.2},
+        "b": {"psi": 0.5, "p_value": 0.001, "ci_low": 0.3, "ci_high": 0.7},
+    }
+
+    assert gate_feature_drift(drift_result, significance, alpha=0.05) == 1
+    assert drift_result["drift_by_columns"]["a"] == {
+        "drift_detected": False,
+        "drift_score": 0.3,
+        "psi_p_value": 0.3,
+        "gated_by_psi": True,
+    }
+    assert drift_result["drift_by_columns"]["b"]["drift_detected"]
+    assert drift_result["number_of_drifted_columns"] == 1 and not drift_result["dataset_drift"]
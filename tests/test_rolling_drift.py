@@ -0,0 +1,115 @@
+import pandas as pd
+
+from rolling_drift import (
+    commit_rolling_drift,
+    evaluate_rolling_state,
+    frame_aggregates,
+    init_rolling_state,
+    prepare_rolling_drift,
+    update_rolling_state,
+)
+from tests.conftest import random_frame
+
+
+def test_window_totals_match_recomputed_aggregates_after_eviction() -> None:
+    state = init_rolling_state(random_frame(0, rows=400), "hash", "baseline-1")
+    batches = [random_frame(seed) for seed in range(1, 6)]
+    for index, batch in enumerate(batches):
+        state = update_rolling_state(state, batch, f"b{index}", max_batches=3)
+
+    recomputed = frame_aggregates(pd.concat(batches[-3:]), state["edges"])
+
+    assert [entry["batch_id"] for entry in state["batches"]] == ["b2", "b3", "b4"]
+    for column in ("a", "b"):
+        assert state["window"][column]["counts"] == recomputed[column]["counts"]
+        assert abs(state["window"][column]["sum"] - recomputed[column]["sum"]) < 1e-9
+
+
+def test_day_window_evicts_old_batches() -> None:
+    state = init_rolling_state(random_frame(0, rows=400), "hash", "baseline-1")
+    state = update_rolling_state(state, random_frame(1), "old", max_days=7, recorded_at="2026-10-01T00:00:00Z")
+    state = update_rolling_state(state, random_frame(2), "new", max_days=7, recorded_at="2026-10-10T00:00:00Z")
+
+    assert [entry["batch_id"] for entry in state["batches"]] == ["new"]
+    assert state["window"]["a"]["n"] == 50
+
+
+def test_slow_shift_flags_drift_against_baseline() -> None:
+    state = init_rolling_state(random_frame(0, rows=400), "hash", "baseline-1")
+    for index in range(4):
+        state = update_rolling_state(state, random_frame(10 + index, shift=1.5), f"b{index}", max_batches=4)
+
+    result = evaluate_rolling_state(state)
+
+    assert result["features"]["a"]["drifted"]
+    assert not result["features"]["b"]["drifted"]
+    assert result["features"]["a"]["psi_vs_previous_window"] is None
+    assert result["window_batches"] == 4
+
+
+def test_previous_window_is_the_disjoint_window_before_the_current_one() -> None:
+    state = init_rolling_state(random_frame(0, rows=400), "hash", "baseline-1")
+    batches = [random_frame(seed, shift=0.0 if seed < 4 else 1.5) for seed in range(8)]
+    for index, batch in enumerate(batches):
+        state = update_rolling_state(state, batch, f"b{index}", max_batches=3)
+
+    assert [entry["batch_id"] for entry in state["previous_batches"]] == ["b2", "b3", "b4"]
+    recomputed = frame_aggregates(pd.concat(batches[2:5]), state["edges"])
+    assert state["previous_window"]["a"]["counts"] == recomputed["a"]["counts"]
+    assert evaluate_rolling_state(state)["features"]["a"]["psi_vs_previous_window"] > 0.2
+
+
+def test_a_batch_already_in_the_window_is_not_counted_again() -> None:
+    state = init_rolling_state(random_frame(0, rows=400), "hash", "baseline-1")
+    state = update_rolling_state(state, random_frame(1), "b1", max_batches=3)
+
+    again = update_rolling_state(state, random_frame(1), "b1", max_batches=3)
+
+    assert again is state
+    assert again["window"]["a"]["n"] == 50
+
+
+class _StateTable:
+    def __init__(self) -> None:
+        self.row = None
+        self.interleave = None
+
+    def select(self, table, select, filters, limit):
+        return [dict(self.row)] if self.row else []
+
+    def insert(self, table, rows):
+        self.row = dict(rows[0])
+        return rows
+
+    def update(self, table, filters, data):
+        if self.interleave is not None:
+            # Another worker commits its own batch between this worker's load and save.
+            interleave, self.interleave = self.interleave, None
+            commit_rolling_drift(self, interleave)
+        if self.row is None or f"eq.{self.row['revision']}" != filters["revision"]:
+            return []
+        self.row.update(data)
+        return [self.row]
+
+
+def _prepare(table, batch_id: str, seed: int):
+    baseline, current = random_frame(0, rows=400), random_frame(seed)
+    return prepare_rolling_drift(table, "d1", "v1", "baseline-1", baseline, "hash", current, batch_id, 5, None)
+
+
+def test_state_is_committed_separately_and_concurrent_commits_are_rebased() -> None:
+    table = _StateTable()
+    result, pending = _prepare(table, "b1", 1)
+    assert table.row is None and result["window_batches"] == 1
+
+    assert commit_rolling_drift(table, pending)
+    _, first = _prepare(table, "b2", 2)
+    _, second = _prepare(table, "b3", 3)
+    table.interleave = second
+    assert commit_rolling_drift(table, first)
+
+    assert [entry["batch_id"] for entry in table.row["state"]["batches"]] == ["b1", "b3", "b2"]
+    assert table.row["revision"] == 3
+
+    retried, _ = _prepare(table, "b2", 2)
+    assert retried["batch_already_counted"] and retried["window_batches"] == 3
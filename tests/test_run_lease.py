@@ -0,0 +1,53 @@
+import time
+
+import pytest
+import requests
+
+from run_lease import JobLease, LeaseLost, RunLease
+
+
+class _FakeLeases:
+    def __init__(self, answers) -> None:
+        self.answers = list(answers)
+        self.calls = []
+
+    def rpc(self, function, params=None):
+        self.calls.append((function, params))
+        answer = self.answers.pop(0) if self.answers else True
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def test_lease_renews_in_background_until_stopped() -> None:
+    leases = _FakeLeases([True, True])
+    with RunLease(leases, "run-1", "worker-a", "token-1", lease_seconds=0.06) as lease:
+        time.sleep(0.2)
+        lease.ensure_held()
+
+    renewals = len(leases.calls)
+    assert renewals >= 2
+    assert leases.calls[0] == ("renew_run_lease", {"p_run_id": "run-1", "p_token": "token-1", "p_lease_seconds": 0.06})
+    time.sleep(0.1)
+    assert len(leases.calls) == renewals
+
+
+def test_transient_errors_keep_the_lease_but_a_refusal_loses_it() -> None:
+    leases = _FakeLeases([requests.ConnectionError("reset"), False])
+    lease = RunLease(leases, "run-1", "worker-a", "token-1", lease_seconds=60)
+
+    assert lease.renew() is True
+    lease.ensure_held()
+    assert lease.renew() is False
+    with pytest.raises(LeaseLost):
+        lease.ensure_held()
+
+
+def test_job_leases_renew_the_worker_job_row() -> None:
+    leases = _FakeLeases([False])
+    lease = JobLease(leases, "job-1", "worker-a", "token-1", lease_seconds=60)
+
+    assert lease.renew() is False
+    assert leases.calls == [("renew_job_lease", {"p_job_id": "job-1", "p_token": "token-1", "p_lease_seconds": 60})]
+    with pytest.raises(LeaseLost, match="Job job-1"):
+        lease.ensure_held()
@@ -0,0 +1,76 @@
+import numpy as np
+
+from score_sketch import (
+    build_score_sketch,
+    merge_score_sketches,
+    score_trend,
+    sketch_distribution,
+    sketch_mean,
+    sketch_quantile,
+)
+
+
+def test_merged_sketch_matches_sketch_of_concatenated_scores() -> None:
+    rng = np.random.default_rng(3)
+    a, b = rng.random(400), rng.beta(2, 5, 300)
+
+    merged = merge_score_sketches([build_score_sketch(a), build_score_sketch(b)])
+    direct = build_score_sketch(np.concatenate([a, b]))
+
+    assert merged["counts"] == direct["counts"]
+    assert merged["n"] == 700
+    assert abs(sketch_mean(merged) - float(np.concatenate([a, b]).mean())) < 1e-9
+
+
+def test_sketch_quantile_close_to_exact_quantile() -> None:
+    scores = np.random.default_rng(5).random(5000)
+    sketch = build_score_sketch(scores)
+
+    assert abs(sketch_quantile(sketch, 0.5) - float(np.quantile(scores, 0.5))) < 0.01
+    assert abs(sketch_quantile(sketch, 0.9) - float(np.quantile(scores, 0.9))) < 0.01
+
+
+def test_sketch_distribution_coarsens_to_baseline_bins() -> None:
+    scores = np.random.default_rng(9).random(1000)
+    edges = np.linspace(0.0, 1.0, 11)
+    expected, _ = np.histogram(scores, bins=edges)
+
+    coarse = sketch_distribution(build_score_sketch(scores), edges)
+
+    assert np.allclose(coarse, expected / expected.sum())
+
+
+def test_score_trend_groups_runs_by_day() -> None:
+    sketch = build_score_sketch(np.full(100, 0.5))
+    runs = [
+        {"finished_at": "2026-10-01T03:00:00Z", "score_sketch": sketch},
+        {"finished_at": "2026-10-01T09:00:00+00:00", "score_sketch": sketch},
+        {"finished_at": "2026-10-02T03:00:00Z", "score_sketch": sketch},
+        {"finished_at": "2026-10-02T04:00:00Z", "score_sketch": None},
+    ]
+    baseline_pred = {"bins": np.linspace(0.0, 1.0, 11).tolist(), "distribution": [0.1] * 10}
+
+    trend = score_trend(runs, bucket="day", baseline_pred=baseline_pred)
+
+    assert [period["period"] for period in trend["periods"]] == ["2026-10-01", "2026-10-02"]
+    assert trend["periods"][0]["n_samples"] == 200
+    assert trend["overall"]["n_samples"] == 300
+    assert trend["overall"]["psi"] > 0.25
+
+
+def test_score_trend_counts_only_sketches_that_merge() -> None:
+    sketch = build_score_sketch(np.full(100, 0.5))
+    coarse = build_score_sketch(np.full(100, 0.5), bins=50)
+    runs = [
+        {"finished_at": "2026-10-01T03:00:00Z", "score_sketch": sketch},
+        {"finished_at": "2026-10-01T04:00:00Z", "score_sketch": coarse},
+        {"finished_at": "2026-10-01T05:00:00Z", "score_sketch": {**sketch, "counts": []}},
+        {"finished_at": "2026-10-02T03:00:00Z", "score_sketch": coarse},
+    ]
+
+    trend = score_trend(runs, bucket="day")
+
+    assert [(period["period"], period["batches"], period["skipped"]) for period in trend["periods"]] == [
+        ("2026-10-01", 1, 2)
+    ]
+    assert trend["skipped"] == 3 and trend["overall"]["n_samples"] == 100
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from drift_stats import compute_psi, compute_psi_matrix
+from feature_drift import ReferenceColumns
+from feature_schema import compute_schema_hash, split_segment_columns
+from monitor_run import extract_segment_rows
+from nordea_sync import FEATURE_COLUMNS, build_segmented_synthetic_batch
+from segment_drift import compute_segment_drift, grouped_histograms, summarize_segment_drift
+from tests.conftest import random_frame
+
+
+def test_psi_matrix_matches_scalar_psi_per_row() -> None:
+    rng = np.random.default_rng(0)
+    expected = rng.dirichlet(np.ones(6), size=(3, 4))
+    current = rng.dirichlet(np.ones(6), size=(3, 4))
+    matrix = compute_psi_matrix(expected, current)
+    for index in np.ndindex(3, 4):
+        assert np.isclose(matrix[index], compute_psi(expected[index], current[index]))
+
+
+def test_psi_matrix_ignores_padded_bins() -> None:
+    expected = np.array([0.5, 0.5, 0.0, 0.0])
+    current = np.array([0.2, 0.8, 0.0, 0.0])
+    valid = np.array([True, True, False, False])
+    assert np.isclose(compute_psi_matrix(expected, current, valid), compute_psi(expected[:2], current[:2]))
+
+
+def test_grouped_histograms_match_per_group_counts() -> None:
+    rng = np.random.default_rng(1)
+    bins = rng.integers(0, 5, size=(200, 3))
+    codes = rng.integers(0, 4, size=200)
+    counts = grouped_histograms(bins, codes, 4, 4)
+    for group in range(4):
+        for column in range(3):
+            expected = np.bincount(bins[codes == group, column], minlength=5)[:4]
+            assert counts[group, column].tolist() == expected.tolist()
+
+
+def test_only_the_shifted_segment_drifts_and_small_segments_are_skipped() -> None:
+    reference = ReferenceColumns(random_frame(0, 1000))
+    current = pd.concat([random_frame(1, 300), random_frame(2, 300, shift=1.5), random_frame(3, 5)], ignore_index=True)
+    labels = pd.Series(["steady"] * 300 + ["shifted"] * 300 + ["tiny"] * 5)
+
+    result = compute_segment_drift(reference, current, labels, "segment", min_rows=30)
+
+    assert result["skipped"] == {"tiny": 5}
+    assert not result["segments"]["steady"]["drift_by_columns"]["a"]["drift_detected"]
+    assert result["segments"]["shifted"]["drift_by_columns"]["a"]["drift_detected"]
+    assert not result["segments"]["shifted"]["drift_by_columns"]["b"]["drift_detected"]
+    assert summarize_segment_drift(result)["segments"]["shifted"]["top_features"] == ["a"]
+
+
+def test_segments_use_their_own_baseline_sketch_when_the_baseline_has_one() -> None:
+    baseline = pd.concat(
+        [random_frame(0, 400).assign(segment="low"), random_frame(1, 400, shift=3.0).assign(segment="high")]
+    )
+    reference = ReferenceColumns(*split_segment_columns(baseline.reset_index(drop=True)))
+    current = random_frame(2, 200, shift=3.0)
+
+    own = compute_segment_drift(reference, current, pd.Series(["high"] * 200), "segment", min_rows=30)
+    fallback = compute_segment_drift(reference, current, pd.Series(["new"] * 200), "segment", min_rows=30)
+
+    assert own["segments"]["high"]["baseline"] == "segment"
+    assert not own["segments"]["high"]["drift_by_columns"]["a"]["drift_detected"]
+    assert fallback["segments"]["new"]["baseline"] == "overall"
+    assert fallback["segments"]["new"]["drift_by_columns"]["a"]["drift_detected"]
+
+
+def test_segment_labels_stay_out_of_the_schema_hash_and_metric_rows_are_keyed() -> None:
+    frame, anchor_days = build_segmented_synthetic_batch(["stable_salary", "income_drop"], rows=40, seed=7, horizons=())
+    features, labels = split_segment_columns(frame)
+
+    assert list(features.columns) == FEATURE_COLUMNS
+    assert labels["segment"].unique().tolist() == ["stable_salary", "income_drop"]
+    assert len(anchor_days) == len(frame) == 80
+    assert compute_schema_hash(frame) == compute_schema_hash(features)
+
+    result = compute_segment_drift(ReferenceColumns(features), features, labels["segment"], "segment", min_rows=10)
+    rows = extract_segment_rows("run-1", result)
+    assert {row["segment"] for row in rows} == {"segment=stable_salary", "segment=income_drop"}
+    assert len(rows) == 2 * len(FEATURE_COLUMNS)
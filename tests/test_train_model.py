@@ -1,5 +1,19 @@
+import pytest
+
+from feature_schema import compute_schema_hash
 from nordea_sync import build_feature_batch, generate_synthetic_transactions
-from train_model import create_training_target, train_model
+from train_model import (
+    BaselineSpec,
+    build_baseline_frame,
+    build_training_frames,
+    create_training_target,
+    group_specs_by_data,
+    parse_baseline_matrix,
+    synthetic_days_for_rows,
+    train_baseline,
+    train_baseline_matrix,
+    train_model,
+)
 
 
 def _baseline_df(rows: int = 120):
@@ -24,3 +38,60 @@ def test_train_model_returns_pipeline_predictions_and_metrics() -> None:
     assert 0.0 <= metrics["accuracy"] <= 1.0
     assert metrics["n_samples"] == len(df)
     assert metrics["n_features"] == len(df.columns)
+
+
+def test_parse_baseline_matrix_reads_specs() -> None:
+    specs = parse_baseline_matrix("v2:stable_salary:42:200, v3:income_drop:none:120")
+
+    assert [spec.baseline_version for spec in specs] == ["v2", "v3"]
+    assert specs[0].seed == 42 and specs[0].rows == 200
+    assert specs[1].seed is None and specs[1].scenario == "income_drop"
+
+
+def test_parse_baseline_matrix_rejects_duplicates_and_bad_entries() -> None:
+    with pytest.raises(RuntimeError):
+        parse_baseline_matrix("v2:stable_salary:42:200,v2:income_drop:1:100")
+    with pytest.raises(RuntimeError):
+        parse_baseline_matrix("v2:stable_salary:42")
+
+
+def test_group_specs_shares_seeded_data_only() -> None:
+    specs = parse_baseline_matrix(
+        "a:stable_salary:42:200,b:stable_salary:42:120,c:stable_salary:none:120,d:stable_salary:none:120"
+    )
+    groups = group_specs_by_data(specs)
+
+    assert [len(group) for _, _, group in groups] == [2, 1, 1]
+
+
+def test_train_baseline_matrix_matches_shared_frames() -> None:
+    specs = parse_baseline_matrix("a:stable_salary:42:140,b:stable_salary:42:120")
+    trained = train_baseline_matrix(specs, max_workers=1)
+    # What `--rows 120 --seed 42` builds on its own, independent of the other matrix members.
+    standalone = build_feature_batch(
+        generate_synthetic_transactions("stable_salary", seed=42, days=synthetic_days_for_rows(120, ())),
+        rows=120,
+        horizons=(),
+    )
+
+    assert [item.spec.baseline_version for item in trained] == ["a", "b"]
+    assert trained[1].baseline_df.equals(standalone)
+    assert build_training_frames("stable_salary", 42, [140, 120], ())[120].equals(standalone)
+
+
+def test_labelled_baseline_carries_segments_outside_the_schema() -> None:
+    labelled = build_baseline_frame("stable_salary", 7, 60, (), segment_scenarios=["stable_salary", "income_drop"])
+    spec = BaselineSpec(baseline_version="v1", scenario="stable_salary+income_drop", seed=7, rows=60)
+    trained = train_baseline(spec, labelled)
+    plain = build_baseline_frame("stable_salary", 7, 60, ())
+
+    assert labelled["segment"].value_counts().to_dict() == {"stable_salary": 60, "income_drop": 60}
+    assert trained.schema_hash == compute_schema_hash(plain)
+    assert trained.metrics["n_samples"] == 120
+
+
+def test_baseline_refresh_rejects_segments_with_a_matrix() -> None:
+    import baseline_refresh
+
+    with pytest.raises(RuntimeError, match="segment-scenarios"):
+        baseline_refresh.main(["--matrix", "v1:stable_salary:1:50", "--segment-scenarios", "stable_salary,income_drop"])
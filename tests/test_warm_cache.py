@@ -0,0 +1,32 @@
+from warm_cache import WarmCache
+
+
+def test_entries_are_reused_until_the_token_changes() -> None:
+    cache = WarmCache(max_entries=2)
+    loads = []
+
+    def load(value):
+        def loader():
+            loads.append(value)
+            return value
+
+        return loader
+
+    assert cache.get("model", "etag-1", load("a")) == "a"
+    assert cache.get("model", "etag-1", load("b")) == "a"
+    assert cache.get("model", "etag-2", load("c")) == "c"
+    assert cache.get("model", None, load("d")) == "d"
+    assert cache.get("model", "etag-2", load("e")) == "e"
+    assert loads == ["a", "c", "d", "e"]
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = WarmCache(max_entries=2)
+    cache.get("a", "1", lambda: "a")
+    cache.get("b", "1", lambda: "b")
+    cache.get("a", "1", lambda: "unused")
+    cache.get("c", "1", lambda: "c")
+
+    assert cache.get("a", "1", lambda: "reloaded-a") == "a"
+    assert cache.get("b", "1", lambda: "reloaded-b") == "reloaded-b"
@@ -0,0 +1,123 @@
+import sys
+import threading
+import types
+
+import sweeper
+import worker
+
+
+class _FakeQueue:
+    # Stands in for the claim RPCs: every queued row is handed out exactly once.
+    def __init__(self, runs, jobs) -> None:
+        self.runs = list(runs)
+        self.jobs = list(jobs)
+        self.updates = []
+        self.lock = threading.Lock()
+
+    def rpc(self, function, params=None):
+        if function in ("renew_run_lease", "renew_job_lease"):
+            return True
+        with self.lock:
+            source = self.runs if function == "claim_monitor_runs" else self.jobs
+            claimed, source[:] = source[: params["p_limit"]], source[params["p_limit"] :]
+            return [{**row, "lease_owner": params["p_owner"], "lease_token": f"token-{row['id']}"} for row in claimed]
+
+    def update(self, table, filters, data):
+        if table == "worker_jobs":
+            assert filters["lease_token"] == filters["id"].replace("eq.", "eq.token-")
+        self.updates.append((table, filters["id"], data["status"]))
+        return []
+
+
+def test_worker_drains_runs_and_jobs_with_bounded_concurrency(monkeypatch) -> None:
+    runs = [
+        {"id": f"run-{i}", "domain_id": "d1", "domain_key": "nordea", "baseline_version": "v1", "batch_id": f"b{i}"}
+        for i in range(5)
+    ]
+    runs[0]["params"] = {"drift_engine": "native", "rolling_batches": 3, "unknown": "ignored"}
+    jobs = [
+        {"id": "job-ok", "job_type": "generate_batch", "args": ["--scenario", "stable_salary"]},
+        {"id": "job-bad", "job_type": "generate_batch", "args": ["--fail"]},
+    ]
+    queue = _FakeQueue(runs, jobs)
+
+    active = []
+    peak = []
+    executed = {}
+    lock = threading.Lock()
+
+    def fake_execute_run(supabase, run_id, domain_id, args, lease=None):
+        assert lease.owner == "worker-a"
+        assert lease.lease_filter == {"lease_token": f"eq.token-{run_id}"}
+        with lock:
+            active.append(run_id)
+            peak.append(len(active))
+        executed[run_id] = args
+        with lock:
+            active.remove(run_id)
+        return "green"
+
+    job_calls = []
+
+    def fake_job_main(argv):
+        job_calls.append(argv)
+        if "--fail" in argv:
+            raise SystemExit(2)
+
+    monkeypatch.setattr(worker.monitor_run, "execute_run", fake_execute_run)
+    monkeypatch.setitem(sys.modules, "fake_generate_batch", types.SimpleNamespace(main=fake_job_main))
+    monkeypatch.setitem(worker.JOB_ENTRYPOINTS, "generate_batch", "fake_generate_batch")
+
+    processed = worker.run_worker(queue, concurrency=2, poll_seconds=0.01, once=True, owner="worker-a")
+
+    assert processed == 7
+    assert sorted(executed) == [run["id"] for run in runs]
+    assert max(peak) <= 2
+    assert executed["run-0"].drift_engine == "native"
+    assert executed["run-0"].rolling_batches == 3
+    assert executed["run-3"].batch_id == "b3"
+    assert sorted(job_calls) == [["--fail"], ["--scenario", "stable_salary"]]
+    assert ("worker_jobs", "eq.job-ok", "completed") in queue.updates
+    assert ("worker_jobs", "eq.job-bad", "failed") in queue.updates
+
+
+def test_baseline_refresh_jobs_accept_matrix_args(monkeypatch) -> None:
+    import baseline_refresh
+
+    trained = []
+
+    def fake_matrix(domain, specs, max_workers=None, horizons=None):
+        trained.append((domain, [spec.baseline_version for spec in specs]))
+        return [{"schema_hash": "h"} for _ in specs]
+
+    monkeypatch.setattr(baseline_refresh, "run_training_matrix", fake_matrix)
+    job = {"id": "job-m", "job_type": "baseline_refresh", "args": ["--matrix", "v1:stable_salary:1:50,v2:income_drop:2:50"]}
+    queue = _FakeQueue([], [])
+
+    worker.process_job(queue, {**job, "lease_owner": "worker-a", "lease_token": "token-job-m"}, lease_seconds=60)
+
+    assert trained == [("nordea", ["v1", "v2"])]
+    assert queue.updates == [("worker_jobs", "eq.job-m", "completed")]
+
+
+def test_sweeper_requeues_or_fails_jobs_whose_lease_expired(monkeypatch) -> None:
+    calls = []
+    reclaimed_jobs = [
+        {"id": "job-1", "status": "queued", "job_type": "nordea_sync", "attempt_count": 1},
+        {"id": "job-2", "status": "failed", "job_type": "baseline_refresh", "attempt_count": 3},
+    ]
+
+    class _Database:
+        def rpc(self, function, params=None):
+            calls.append((function, params))
+            return reclaimed_jobs if function == "reclaim_expired_jobs" else []
+
+    logged = []
+    monkeypatch.setattr(sweeper, "get_supabase", _Database)
+    monkeypatch.setattr(sweeper, "log", logged.append)
+
+    sweeper.main(["--max-attempts", "3", "--timeout-minutes", "15"])
+
+    params = {"p_max_attempts": 3, "p_legacy_timeout_minutes": 15}
+    assert calls == [("reclaim_expired_leases", params), ("reclaim_expired_jobs", params)]
+    assert "sweeper requeued 1 and failed 1 worker jobs with expired leases" in logged